@@ -57,6 +57,7 @@ class AgentConfig(BaseModel):
     # Context settings
     use_rag: bool = True
     max_context_chunks: int = 10
+    max_context_tokens: int = 8000
 
     # Collaboration
     depth_level: int = 0  # 0=root, max 3
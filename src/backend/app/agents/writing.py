@@ -19,6 +19,7 @@ from app.agents.base import (
     AgentType,
     AgentStatus,
 )
+from app.services.budget import ContextBudget, tokens_for_words
 from app.services.chat import ChatService
 from app.services.search import SearchService
 from app.services.embeddings import EmbeddingService
@@ -238,12 +239,21 @@ researcher should add rather than making up information.
             if not results:
                 return ""
 
-            # Format context
-            context_parts = []
-            for i, result in enumerate(results, 1):
-                context_parts.append(f"[Source {i}]\n{result['content']}\n")
+            # Format context, trimmed to what fits next to the prompt and draft
+            context_parts = [
+                f"[Source {i}]\n{result.content}\n"
+                for i, result in enumerate(results, 1)
+            ]
 
-            return "\n".join(context_parts)
+            budget = ContextBudget(
+                self.config.model,
+                max_output_tokens=tokens_for_words(input.max_words),
+                max_context_tokens=self.config.max_context_tokens,
+            )
+            budget.reserve("system", self.get_system_prompt())
+            budget.reserve("prompt", self._build_prompt(input, ""))
+
+            return budget.fit_context(context_parts, separator="\n")
 
         except Exception as e:
             logger.warning(f"Context retrieval failed: {e}")
@@ -337,7 +347,7 @@ researcher should add rather than making up information.
                 ],
                 model=self.config.model,
                 temperature=self.config.temperature,
-                max_tokens=input.max_words * 2,  # Rough token estimate
+                max_tokens=tokens_for_words(input.max_words),
             )
 
             # Track tokens
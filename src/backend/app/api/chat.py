@@ -2,6 +2,7 @@
 Chat API endpoints
 """
 
+import logging
 from typing import Optional, List
 from uuid import UUID
 
@@ -13,9 +14,15 @@ from pydantic import BaseModel
 from app.db.database import get_db
 from app.services.chat import ChatService
 from app.services.search import SearchService
+from app.services.streaming import coalesce_tokens, sse_event
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Sources returned with a non-streaming answer
+RESPONSE_SOURCE_LIMIT = 3
+
 
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
@@ -67,45 +74,77 @@ async def chat(
     if request.history:
         history = [{"role": m.role, "content": m.content} for m in request.history]
 
-    if request.stream:
-        # Return streaming response
-        async def generate():
-            async for chunk in chat_service.chat_stream(
-                request.message,
-                project_id=request.project_id,
-                history=history,
-            ):
-                yield chunk
+    # Retrieve once: the same results are the LLM context and the sources
+    search_results = await chat_service.retrieve(
+        request.message, project_id=request.project_id
+    )
 
-        return StreamingResponse(generate(), media_type="text/plain")
+    if request.stream:
+        return StreamingResponse(
+            stream_chat_events(chat_service, request, history, search_results),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
     # Non-streaming response
     response = await chat_service.chat(
         request.message,
         project_id=request.project_id,
         history=history,
+        search_results=search_results,
     )
 
-    # Get sources used
-    search_service = SearchService(db)
-    search_results = await search_service.search(
-        request.message,
-        project_id=request.project_id,
-        limit=3,
-    )
-
-    sources = [r.to_dict() for r in search_results] if search_results else None
+    sources = [r.to_dict() for r in search_results[:RESPONSE_SOURCE_LIMIT]] or None
 
     return ChatResponse(response=response, sources=sources)
 
 
+async def stream_chat_events(
+    chat_service: ChatService,
+    request: ChatRequest,
+    history: Optional[List[dict]],
+    search_results: list,
+):
+    """
+    Server-Sent Events for a streamed chat answer.
+
+    Events, in order:
+        sources: {"sources": [...]} - retrieval results used as context
+        delta:   {"text": "..."}    - coalesced response text
+        usage:   {"model", "prompt_tokens", "completion_tokens", "cost"}
+        error:   {"message": "..."} - sent instead of usage if the LLM call fails
+    """
+    yield sse_event("sources", {"sources": [r.to_dict() for r in search_results]})
+
+    usage: dict = {}
+    try:
+        tokens = chat_service.chat_stream(
+            request.message,
+            project_id=request.project_id,
+            history=history,
+            search_results=search_results,
+            usage=usage,
+        )
+        async for frame in coalesce_tokens(tokens):
+            yield sse_event("delta", {"text": frame})
+    except Exception as e:
+        logger.error(f"Chat stream failed: {e}")
+        yield sse_event("error", {"message": str(e)})
+        return
+
+    yield sse_event("usage", usage)
+
+
 @router.post("/stream")
 async def chat_stream(
     request: ChatRequest,
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Stream chat response.
+    Stream chat response as Server-Sent Events.
+
+    Sends the retrieval sources first, then coalesced text deltas, then a
+    usage event with token counts and cost. See stream_chat_events().
     """
     chat_service = ChatService(db)
 
@@ -119,15 +158,15 @@ async def chat_stream(
     if request.history:
         history = [{"role": m.role, "content": m.content} for m in request.history]
 
-    async def generate():
-        async for chunk in chat_service.chat_stream(
-            request.message,
-            project_id=request.project_id,
-            history=history,
-        ):
-            yield chunk
+    search_results = await chat_service.retrieve(
+        request.message, project_id=request.project_id
+    )
 
-    return StreamingResponse(generate(), media_type="text/plain")
+    return StreamingResponse(
+        stream_chat_events(chat_service, request, history, search_results),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/search", response_model=SearchResponse)
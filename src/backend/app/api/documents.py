@@ -5,18 +5,34 @@ Based on Section 8: API Contracts
 
 import os
 import uuid
-from typing import List, Optional
+import zipfile
+from typing import AsyncIterator, Dict, List, Optional
 from uuid import UUID
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+from datetime import datetime, timezone
+from celery import group
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select
 from pydantic import BaseModel
 
+from app.celery_app import QUEUE_BULK
 from app.db.database import get_db
-from app.db.models import Document, DocumentType, ProcessingStatus
+from app.db.models import Document, DocumentType, IngestBatch, ProcessingStatus
 from app.config import get_settings
-from app.tasks.document_tasks import process_document_task
+from app.services.dedup import clone_processed_document, find_processed_duplicate
+from app.services.near_duplicates import promote_duplicates
+from app.services.storage import reference_blob, release_blob, stage_blob
+from app.services.text_store import page_range, read_range, text_length
+from app.services.uploads import (
+    ALLOWED_EXTENSIONS,
+    StoredFile,
+    UploadError,
+    iter_upload,
+    iter_zip_entry,
+    store_upload,
+)
+from app.tasks.document_tasks import enqueue_document, process_document_task
+from app.tasks.scheduling import queue_for_upload
 
 router = APIRouter()
 settings = get_settings()
@@ -29,6 +45,7 @@ class DocumentResponse(BaseModel):
     filename: str
     original_filename: str
     file_size: int
+    file_hash: Optional[str] = None
     mime_type: str
     document_type: DocumentType
     document_type_confidence: Optional[float]
@@ -37,6 +54,7 @@ class DocumentResponse(BaseModel):
     page_count: Optional[int]
     word_count: Optional[int]
     version: int
+    parent_id: Optional[UUID] = None
     created_at: datetime
     updated_at: datetime
 
@@ -44,28 +62,50 @@ class DocumentResponse(BaseModel):
         from_attributes = True
 
 
+class DocumentContentResponse(BaseModel):
+    id: UUID
+    content: str
+    offset: int
+    length: int
+    total_length: int
+    next_offset: Optional[int]  # None once the end of the text is reached
+    page: Optional[int] = None
+    page_count: Optional[int]
+    word_count: Optional[int]
+
+
 class DocumentListResponse(BaseModel):
     items: List[DocumentResponse]
     total: int
 
 
-# Allowed file types
-ALLOWED_EXTENSIONS = {
-    ".pdf": "application/pdf",
-    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-    ".doc": "application/msword",
-    ".txt": "text/plain",
-}
+class BatchResponse(BaseModel):
+    batch_id: UUID
+    documents: List[DocumentResponse]
+    skipped: List[Dict[str, str]]
 
 
-def validate_file(file: UploadFile) -> tuple[str, str]:
-    """Validate uploaded file and return extension and mime type"""
-    if not file.filename:
+class BatchProgressResponse(BaseModel):
+    batch_id: UUID
+    total: int
+    done: int
+    failed: int
+    processing: int
+    pending: int
+    skipped: int
+    docs_per_second: Optional[float]
+    eta_seconds: Optional[float]
+    elapsed_seconds: float
+
+
+def validate_filename(filename: Optional[str]) -> tuple[str, str]:
+    """Validate a file name and return extension and mime type"""
+    if not filename:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Filename is required"
         )
 
-    ext = os.path.splitext(file.filename)[1].lower()
+    ext = os.path.splitext(filename)[1].lower()
     if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -75,68 +115,248 @@ def validate_file(file: UploadFile) -> tuple[str, str]:
     return ext, ALLOWED_EXTENSIONS[ext]
 
 
+def validate_file(file: UploadFile) -> tuple[str, str]:
+    """Validate uploaded file and return extension and mime type"""
+    return validate_filename(file.filename)
+
+
+async def create_document(
+    db: AsyncSession,
+    stored: StoredFile,
+    original_filename: str,
+    mime_type: str,
+    project_id: Optional[UUID],
+    document_type: DocumentType,
+    parent: Optional[Document] = None,
+) -> tuple[Document, bool]:
+    """
+    Create the document row for a received upload, storing its content as
+    a blob (shared with any document that has the same hash).
+
+    An identical file that was already processed has its chunks and
+    embeddings cloned instead.
+
+    Returns:
+        The document, and whether it still needs processing
+    """
+    # The blob is written under its own committed row, so if this
+    # transaction rolls back the reaper still finds and deletes it
+    file_path = await stage_blob(stored.temp_path, stored.file_hash, stored.file_size)
+    await reference_blob(db, stored.file_hash, stored.file_size)
+
+    document = Document(
+        project_id=project_id,
+        filename=stored.filename,
+        original_filename=original_filename,
+        file_path=file_path,
+        file_size=stored.file_size,
+        file_hash=stored.file_hash,
+        mime_type=mime_type,
+        document_type=document_type,
+        processing_status=ProcessingStatus.PENDING,
+        version=parent.version + 1 if parent else 1,
+        parent_id=parent.id if parent else None,
+    )
+
+    db.add(document)
+    await db.flush()
+
+    # Identical file already processed: reuse its chunks and embeddings
+    duplicate = await find_processed_duplicate(db, stored.file_hash)
+    if duplicate and duplicate.id != document.id:
+        await clone_processed_document(db, duplicate, document)
+        await db.refresh(document)
+        return document, False
+
+    await db.refresh(document)
+    return document, True
+
+
 @router.post("", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
 async def upload_document(
     file: UploadFile = File(...),
     project_id: Optional[UUID] = Form(None),
     document_type: DocumentType = Form(DocumentType.OTHER),
+    parent_id: Optional[UUID] = Form(None),
     db: AsyncSession = Depends(get_db),
 ):
-    """Upload a new document"""
+    """
+    Upload a new document.
+
+    Pass parent_id to upload a new version of an existing document; its
+    unchanged chunks reuse the parent's embeddings during processing.
+    """
     # Validate file
     ext, mime_type = validate_file(file)
 
-    # Generate unique filename
-    unique_id = uuid.uuid4()
-    filename = f"{unique_id}{ext}"
-    file_path = os.path.join(settings.upload_dir, filename)
-
-    # Ensure upload directory exists
-    os.makedirs(settings.upload_dir, exist_ok=True)
+    parent = None
+    if parent_id:
+        result = await db.execute(select(Document).where(Document.id == parent_id))
+        parent = result.scalar_one_or_none()
+        if not parent:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Parent document not found"
+            )
+        project_id = project_id or parent.project_id
 
-    # Save file
     try:
-        content = await file.read()
-        file_size = len(content)
+        stored = await store_upload(iter_upload(file), ext)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    document, needs_processing = await create_document(
+        db, stored, file.filename, mime_type, project_id, document_type, parent
+    )
+
+    if needs_processing:
+        # Commit first so the worker can see the row
+        await db.commit()
+
+        # Trigger async processing task; large files go to the bulk queue
+        enqueue_document(str(document.id), document.file_path, queue_for_upload(stored.file_size))
+
+    return DocumentResponse.model_validate(document)
+
 
-        # Check file size
-        max_size = settings.max_upload_size_mb * 1024 * 1024
-        if file_size > max_size:
+@router.post("/batch", response_model=BatchResponse, status_code=status.HTTP_201_CREATED)
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    project_id: Optional[UUID] = Form(None),
+    document_type: DocumentType = Form(DocumentType.OTHER),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Upload many documents at once.
+
+    Files may be documents or .zip archives, whose supported entries are
+    streamed to disk one by one. All documents are created in one
+    transaction and dispatched to the bulk queue as one Celery group, whose
+    id is the batch id for GET /batch/{batch_id}. Unsupported or oversized
+    entries are skipped and listed in the response.
+    """
+    entries: List[tuple[str, AsyncIterator[bytes]]] = []
+    skipped: List[dict] = []
+    archives: List[zipfile.ZipFile] = []
+
+    try:
+        for file in files:
+            if file.filename and file.filename.lower().endswith(".zip"):
+                try:
+                    archive = zipfile.ZipFile(file.file)
+                except zipfile.BadZipFile:
+                    skipped.append({"filename": file.filename, "reason": "Invalid zip archive"})
+                    continue
+                archives.append(archive)
+                for info in archive.infolist():
+                    name = os.path.basename(info.filename)
+                    # Skip folders and OS metadata (.DS_Store, __MACOSX/)
+                    hidden = name.startswith(".") or "__MACOSX" in info.filename
+                    if info.is_dir() or not name or hidden:
+                        continue
+                    entries.append((name, iter_zip_entry(archive, info)))
+            else:
+                entries.append((file.filename, iter_upload(file)))
+
+        if len(entries) > settings.batch_max_files:
             raise HTTPException(
                 status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"File too large. Max size: {settings.max_upload_size_mb}MB",
+                detail=f"Too many files. Max per batch: {settings.batch_max_files}",
             )
 
-        with open(file_path, "wb") as f:
-            f.write(content)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to save file: {str(e)}",
-        )
-
-    # Create document record
-    document = Document(
+        documents: List[Document] = []
+        pending: List[Document] = []
+        for name, chunks in entries:
+            try:
+                ext, mime_type = validate_filename(name)
+                stored = await store_upload(chunks, ext)
+            except (HTTPException, UploadError) as e:
+                skipped.append({"filename": name, "reason": e.detail})
+                continue
+
+            document, needs_processing = await create_document(
+                db, stored, name, mime_type, project_id, document_type
+            )
+            documents.append(document)
+            if needs_processing:
+                pending.append(document)
+    finally:
+        for archive in archives:
+            archive.close()
+
+    batch = IngestBatch(
+        id=uuid.uuid4(),
         project_id=project_id,
-        filename=filename,
-        original_filename=file.filename,
-        file_path=file_path,
-        file_size=file_size,
-        mime_type=mime_type,
-        document_type=document_type,
-        processing_status=ProcessingStatus.PENDING,
+        document_ids=[str(d.id) for d in documents],
+        skipped_json=skipped,
     )
+    db.add(batch)
 
-    db.add(document)
-    await db.flush()
-    await db.refresh(document)
+    # Commit first so workers can see the rows
+    await db.commit()
 
-    # Trigger async processing task
-    process_document_task.delay(str(document.id), file_path)
+    if pending:
+        group(
+            process_document_task.s(str(d.id), d.file_path, queue=QUEUE_BULK).set(queue=QUEUE_BULK)
+            for d in pending
+        ).apply_async(task_id=str(batch.id))
 
-    return DocumentResponse.model_validate(document)
+    return BatchResponse(
+        batch_id=batch.id,
+        documents=[DocumentResponse.model_validate(d) for d in documents],
+        skipped=skipped,
+    )
+
+
+@router.get("/batch/{batch_id}", response_model=BatchProgressResponse)
+async def get_batch_progress(
+    batch_id: UUID,
+    db: AsyncSession = Depends(get_db),
+):
+    """Aggregate processing progress of a batch upload"""
+    batch = await db.get(IngestBatch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch not found")
+
+    counts = {status_value: 0 for status_value in ProcessingStatus}
+    last_finished = None
+    if batch.document_ids:
+        result = await db.execute(
+            select(
+                Document.processing_status,
+                func.count(),
+                func.max(Document.updated_at),
+            )
+            .where(Document.id.in_([UUID(i) for i in batch.document_ids]))
+            .group_by(Document.processing_status)
+        )
+        for processing_status, count, updated_at in result:
+            counts[processing_status] = count
+            if processing_status in (ProcessingStatus.COMPLETED, ProcessingStatus.FAILED):
+                last_finished = max(filter(None, [last_finished, updated_at]), default=None)
+
+    total = len(batch.document_ids)
+    done = counts[ProcessingStatus.COMPLETED]
+    failed = counts[ProcessingStatus.FAILED]
+    remaining = total - done - failed
+
+    # Throughput over the time the batch has been running (or ran, once finished)
+    end = last_finished if remaining == 0 and last_finished else datetime.now(timezone.utc)
+    elapsed = max((end - batch.created_at).total_seconds(), 0.0)
+    throughput = (done + failed) / elapsed if elapsed and done + failed else None
+    eta = remaining / throughput if throughput and remaining else (0.0 if not remaining else None)
+
+    return BatchProgressResponse(
+        batch_id=batch.id,
+        total=total,
+        done=done,
+        failed=failed,
+        processing=counts[ProcessingStatus.PROCESSING],
+        pending=counts[ProcessingStatus.PENDING],
+        skipped=len(batch.skipped_json or []),
+        docs_per_second=round(throughput, 4) if throughput else None,
+        eta_seconds=round(eta, 1) if eta is not None else None,
+        elapsed_seconds=round(elapsed, 1),
+    )
 
 
 @router.get("", response_model=DocumentListResponse)
@@ -195,23 +415,32 @@ async def delete_document(
             status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
         )
 
-    # Delete file from disk
-    try:
-        if os.path.exists(document.file_path):
-            os.remove(document.file_path)
-    except Exception:
-        pass  # Log but don't fail
+    # The blob is deleted by the reaper once no document references it
+    await release_blob(db, document.file_hash, document.file_path)
+
+    # Near-duplicates elsewhere would otherwise lose their canonical chunk
+    await promote_duplicates(db, document.id)
 
     await db.delete(document)
     return None
 
 
-@router.get("/{document_id}/content")
+@router.get("/{document_id}/content", response_model=DocumentContentResponse)
 async def get_document_content(
     document_id: UUID,
+    offset: int = Query(0, ge=0, description="First character to return"),
+    length: Optional[int] = Query(
+        None, ge=1, le=settings.content_max_chars, description="Characters to return"
+    ),
+    page: Optional[int] = Query(None, ge=1, description="Return one page (overrides offset)"),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get extracted text content of a document"""
+    """
+    Get a range or page of a document's extracted text.
+
+    Only the compressed frames overlapping the range are read and
+    decompressed. Follow next_offset to page through the whole text.
+    """
     result = await db.execute(select(Document).where(Document.id == document_id))
     document = result.scalar_one_or_none()
 
@@ -226,9 +455,39 @@ async def get_document_content(
             detail=f"Document processing status: {document.processing_status.value}",
         )
 
-    return {
-        "id": document.id,
-        "content": document.extracted_text,
-        "page_count": document.page_count,
-        "word_count": document.word_count,
-    }
+    total = await text_length(db, document.id)
+    legacy_text = None
+    if total is None:
+        # Processed before the frame store existed
+        legacy_text = document.extracted_text or ""
+        total = len(legacy_text)
+
+    if page is not None:
+        page_offsets = (document.metadata_json or {}).get("ingest", {}).get("page_offsets") or []
+        bounds = page_range(page_offsets, total, page)
+        if bounds is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"Page {page} not found"
+            )
+        offset, length = bounds
+    else:
+        offset = min(offset, total)
+        length = length or settings.content_max_chars
+
+    if legacy_text is not None:
+        content = legacy_text[offset:offset + length]
+    else:
+        content = await read_range(db, document.id, offset, length)
+
+    end = offset + len(content)
+    return DocumentContentResponse(
+        id=document.id,
+        content=content,
+        offset=offset,
+        length=len(content),
+        total_length=total,
+        next_offset=end if end < total else None,
+        page=page,
+        page_count=document.page_count,
+        word_count=document.word_count,
+    )
@@ -9,6 +9,7 @@ from sqlalchemy import text
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 
+from app.celery_app import QUEUES
 from app.db.database import get_db
 from app.config import get_settings
 from app.services.embeddings import get_embedding_service
@@ -58,6 +59,18 @@ async def redis_health():
         return {"status": "unhealthy", "redis": "disconnected", "error": str(e)}
 
 
+@router.get("/health/queues")
+async def queues_health():
+    """Pending messages per ingest queue"""
+    try:
+        client = redis.from_url(settings.redis_url)
+        depths = {name: await client.llen(name) for name in QUEUES}
+        await client.close()
+        return {"status": "healthy", "queues": depths}
+    except Exception as e:
+        return {"status": "unhealthy", "queues": None, "error": str(e)}
+
+
 @router.get("/health/embeddings")
 async def embeddings_health():
     """Embedding service health check"""
@@ -110,6 +123,10 @@ async def llm_health():
             result["openai"] = "configured"
             result["status"] = "healthy"
 
+        if chat_service.fake_llm:
+            result["fake"] = "configured"
+            result["status"] = "healthy"
+
         if result["status"] == "unconfigured":
             result["message"] = "No LLM API keys configured. Set ANTHROPIC_API_KEY or OPENAI_API_KEY."
 
@@ -163,7 +180,7 @@ async def full_health_check(db: AsyncSession = Depends(get_db)):
     if embedding_service.is_available():
         services["embeddings"] = ServiceStatus(
             status="healthy",
-            message=f"OpenAI {embedding_service.model}",
+            message=embedding_service.model,
             details={"dimensions": embedding_service.dimensions}
         )
     else:
@@ -173,21 +190,25 @@ async def full_health_check(db: AsyncSession = Depends(get_db)):
         )
 
     # LLM check
-    anthropic_configured = bool(settings.anthropic_api_key)
-    openai_configured = bool(settings.openai_api_key)
+    fake_configured = settings.llm_provider == "fake"
+    anthropic_configured = bool(settings.anthropic_api_key) and not fake_configured
+    openai_configured = bool(settings.openai_api_key) and not fake_configured
 
-    if anthropic_configured or openai_configured:
+    if anthropic_configured or openai_configured or fake_configured:
         llm_providers = []
         if anthropic_configured:
             llm_providers.append("Claude")
         if openai_configured:
             llm_providers.append("OpenAI")
+        if fake_configured:
+            llm_providers.append("Fake (offline)")
         services["llm"] = ServiceStatus(
             status="healthy",
             message=", ".join(llm_providers),
             details={
                 "anthropic": anthropic_configured,
-                "openai": openai_configured
+                "openai": openai_configured,
+                "fake": fake_configured,
             }
         )
     else:
@@ -6,22 +6,109 @@ Handles:
 - Message routing
 - Heartbeat ping-pong
 - Event subscriptions
+- Streaming chat over the socket
 """
 
+import asyncio
 import json
 import logging
-from typing import Optional
+from typing import Optional, Set
+from uuid import UUID
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from pydantic import ValidationError
 
+from app.db.database import async_session_maker
+from app.services.chat import ChatService
+from app.services.streaming import coalesce_tokens
 from app.websocket.manager import manager
-from app.websocket.events import EventType, WebSocketEvent
+from app.websocket.events import ChatStreamEvent, EventType, WebSocketEvent
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+async def handle_chat_message(client_id: str, message: dict):
+    """
+    Answer a chat message over the WebSocket.
+
+    Retrieves sources once, streams coalesced chat_stream frames, then sends
+    chat_complete with the sources and usage. If the stream fails, an error
+    notification is followed by a chat_complete carrying the error, so the
+    client always sees the response end.
+    """
+    try:
+        text = message["message"]
+        project_id = UUID(message["project_id"]) if message.get("project_id") else None
+        conversation_id = (
+            UUID(message["conversation_id"]) if message.get("conversation_id") else None
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        await manager.send_to_client(
+            client_id,
+            WebSocketEvent(
+                type=EventType.NOTIFICATION,
+                payload={
+                    "level": "error",
+                    "title": "Invalid Chat Message",
+                    "message": f"Could not parse chat message: {e}",
+                },
+            ),
+        )
+        return
+
+    history = [
+        {"role": m["role"], "content": m["content"]}
+        for m in message.get("history") or []
+    ]
+
+    try:
+        async with async_session_maker() as db:
+            chat_service = ChatService(db)
+
+            if not chat_service.is_available():
+                raise RuntimeError("No LLM API key configured.")
+
+            results = await chat_service.retrieve(text, project_id=project_id)
+            usage: dict = {}
+            tokens = chat_service.chat_stream(
+                text,
+                project_id=project_id,
+                history=history or None,
+                search_results=results,
+                usage=usage,
+            )
+
+            await manager.stream_chat(
+                client_id,
+                coalesce_tokens(tokens),
+                sources=[r.to_dict() for r in results],
+                conversation_id=conversation_id,
+                usage=usage,
+            )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Chat stream error for {client_id}: {e}")
+        await manager.send_to_client(
+            client_id,
+            WebSocketEvent(
+                type=EventType.NOTIFICATION,
+                payload={
+                    "level": "error",
+                    "title": "Chat Failed",
+                    "message": str(e),
+                },
+            ),
+        )
+        await manager.send_to_client(
+            client_id,
+            ChatStreamEvent(
+                conversation_id=conversation_id, chunk="", is_final=True, error=str(e)
+            ).to_event(),
+        )
+
+
 @router.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -37,19 +124,23 @@ async def websocket_endpoint(
         - {"type": "heartbeat"} - Keep connection alive
         - {"type": "subscribe", "events": ["agent_status", "task_progress"]}
         - {"type": "unsubscribe", "events": ["agent_status"]}
+        - {"type": "chat", "message": "...", "project_id": "...", "history": [...],
+           "conversation_id": "..."} - Stream a chat answer back
 
     Events sent to client:
         - connected: Connection confirmation with client_id
         - heartbeat: Response to heartbeat
         - agent_status: Agent state changes
         - task_progress: Task progress updates
-        - chat_stream: Streaming chat tokens
+        - chat_stream: Streaming chat tokens (coalesced into frames)
+        - chat_complete: End of a chat response, with sources
         - notification: User notifications
         - document_processing: Document processing status
         - cost_update: Cost tracking updates
     """
     # Accept connection
     assigned_client_id = await manager.connect(websocket, client_id)
+    chat_tasks: Set[asyncio.Task] = set()
 
     try:
         while True:
@@ -105,6 +196,12 @@ async def websocket_endpoint(
                 except Exception as e:
                     logger.error(f"Unsubscribe error: {e}")
 
+            elif msg_type == "chat":
+                # Stream in the background so heartbeats keep flowing
+                task = asyncio.create_task(handle_chat_message(assigned_client_id, message))
+                chat_tasks.add(task)
+                task.add_done_callback(chat_tasks.discard)
+
             elif msg_type == "ping":
                 # Simple ping-pong for connection testing
                 await manager.send_to_client(
@@ -126,6 +223,10 @@ async def websocket_endpoint(
         logger.error(f"WebSocket error for {assigned_client_id}: {e}")
         await manager.disconnect(assigned_client_id)
 
+    finally:
+        for task in list(chat_tasks):
+            task.cancel()
+
 
 @router.get("/ws/stats")
 async def websocket_stats():
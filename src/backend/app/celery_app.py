@@ -3,15 +3,27 @@ Celery Application Configuration
 """
 
 from celery import Celery
+from kombu import Queue
 from app.config import get_settings
 
 settings = get_settings()
 
+# Priority classes. Each queue has its own workers (celery -A
+# app.celery_app worker -Q interactive, see docker-compose.yml) so single
+# uploads keep their SLA while bulk and maintenance workers are busy:
+#   interactive: single uploads up to interactive_max_upload_mb
+#   bulk: batch imports and large files
+#   maintenance: re-embedding and other background jobs
+QUEUE_INTERACTIVE = "interactive"
+QUEUE_BULK = "bulk"
+QUEUE_MAINTENANCE = "maintenance"
+QUEUES = (QUEUE_INTERACTIVE, QUEUE_BULK, QUEUE_MAINTENANCE)
+
 celery_app = Celery(
     "grantpilot",
     broker=settings.redis_url,
     backend=settings.redis_url,
-    include=["app.tasks.document_tasks"],
+    include=["app.tasks.document_tasks", "app.tasks.maintenance_tasks"],
 )
 
 celery_app.conf.update(
@@ -23,4 +35,20 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=600,  # 10 minutes max per task
     worker_prefetch_multiplier=1,  # Process one task at a time
+    task_queues=[Queue(name) for name in QUEUES],
+    task_default_queue=QUEUE_INTERACTIVE,
+    task_routes={
+        "app.tasks.maintenance_tasks.*": {"queue": QUEUE_MAINTENANCE},
+        "app.tasks.document_tasks.reembed_document_task": {"queue": QUEUE_MAINTENANCE},
+    },
+    beat_schedule={
+        "reap-blobs": {
+            "task": "app.tasks.maintenance_tasks.reap_blobs_task",
+            "schedule": settings.blob_reap_interval_seconds,
+        },
+        "resume-deferred-bulk": {
+            "task": "app.tasks.maintenance_tasks.resume_deferred_task",
+            "schedule": settings.bulk_resume_interval_seconds,
+        },
+    },
 )
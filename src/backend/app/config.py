@@ -32,9 +32,59 @@ class Settings(BaseSettings):
     anthropic_api_key: Optional[str] = None
     openai_api_key: Optional[str] = None
 
+    # Providers: "auto" uses the configured API keys, "fake" uses offline stand-ins
+    llm_provider: str = "auto"
+    embedding_provider: str = "auto"
+
+    # Fake provider behaviour (load testing)
+    fake_seed: int = 0
+    fake_llm_ttft_ms: int = 300  # Time to first token
+    fake_llm_tokens_per_sec: float = 50.0  # 0 streams without pacing
+    fake_embedding_latency_ms: int = 50  # Per batch request
+    fake_rate_limit_rate: float = 0.0  # Fraction of requests failing with 429
+    fake_timeout_rate: float = 0.0  # Fraction of requests timing out
+    fake_timeout_seconds: float = 30.0
+
     # File Storage
     upload_dir: str = "/app/uploads"
     max_upload_size_mb: int = 50
+    max_batch_upload_mb: int = 2048  # Whole request body for batch uploads
+
+    # Blob storage
+    storage_backend: str = "local"  # local, s3
+    s3_bucket: str = ""
+    s3_prefix: str = "blobs"
+    s3_endpoint_url: str = ""  # Set for MinIO and other S3-compatible stores
+    s3_region: str = ""
+    blob_reap_grace_seconds: int = 3600  # Unreferenced blobs are kept this long before deletion
+    blob_reap_interval_seconds: int = 600
+
+    # Document processing
+    extractor_overrides: dict[str, str] = {}  # File type -> extractor name, e.g. {"pdf": "pypdfium2"}
+    pdf_parallel_page_threshold: int = 40  # Extract serially below this many pages
+    pdf_max_workers: int = 4  # Processes used for parallel PDF extraction
+    pdf_pages_per_task: int = 20  # Pages each worker extracts per task
+    ingest_batch_size: int = 64  # Chunks embedded and inserted per batch
+    content_max_chars: int = 128 * 1024  # Largest text range one content request returns
+    chunk_storage: str = "inline"  # inline: chunks store their text; offsets: only start/end chars
+    chunk_text_cache_size: int = 4096  # Materialized offset-chunk texts kept per process
+    near_duplicate_detection: bool = True  # Reuse embeddings of near-identical chunks in a project
+    near_duplicate_threshold: float = 0.9  # Estimated Jaccard similarity of word shingles
+
+    # Ingest queues
+    interactive_max_upload_mb: int = 10  # Larger uploads go to the bulk queue
+    bulk_max_inflight_per_project: int = 2  # Bulk documents processed at once per project
+    bulk_resume_interval_seconds: int = 60  # Sweep that re-queues parked bulk documents with free slots
+    batch_max_files: int = 500  # Files (including zip entries) per batch upload
+
+    # Celery worker runtime
+    worker_db_pool_size: int = 2  # Connections kept open per worker process
+    worker_db_max_overflow: int = 2
+    worker_http_max_connections: int = 20  # Shared HTTP client pool per worker process
+
+    # Chat streaming
+    chat_stream_flush_ms: int = 30  # Max time between streamed frames
+    chat_stream_flush_chars: int = 256  # Flush a frame once it holds this many chars
 
     # Security
     secret_key: str = "dev-secret-key-change-in-production"
@@ -0,0 +1,110 @@
+"""
+Bulk chunk writes
+Inserts chunks with COPY and sets embeddings with one batched UPDATE,
+bypassing ORM objects and the identity map. Used from sync (psycopg2)
+sessions in Celery workers.
+"""
+
+import io
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from psycopg2.extras import execute_values
+from sqlalchemy.orm import Session
+
+# Columns written by copy_chunks, in COPY order
+CHUNK_COLUMNS = (
+    "id", "document_id", "chunk_index", "content", "start_char", "end_char",
+    "word_count", "token_count", "content_hash", "embedding", "page_number",
+    "section", "metadata_json", "duplicate_of", "created_at",
+)
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def vector_literal(embedding: Optional[Sequence[float]]) -> Optional[str]:
+    """pgvector text representation, e.g. [0.1,0.2]"""
+    if embedding is None:
+        return None
+    return "[" + ",".join(str(float(x)) for x in embedding) + "]"
+
+
+def _copy_field(value) -> str:
+    """Encode one value for COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, dict):
+        value = json.dumps(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def copy_chunks(db: Session, chunks: Iterable[dict]) -> int:
+    """
+    Insert chunk rows with a single COPY in the session's transaction.
+
+    Each dict uses DocumentChunk column names; missing columns are NULL,
+    and id/created_at are generated when absent.
+
+    Returns:
+        Number of rows written
+    """
+    now = datetime.now(timezone.utc)
+    buffer = io.StringIO()
+    count = 0
+
+    for chunk in chunks:
+        row = dict(chunk)
+        row.setdefault("id", uuid.uuid4())
+        row.setdefault("created_at", now)
+        row["embedding"] = vector_literal(row.get("embedding"))
+        buffer.write("\t".join(_copy_field(row.get(column)) for column in CHUNK_COLUMNS))
+        buffer.write("\n")
+        count += 1
+
+    if not count:
+        return 0
+
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY document_chunks ({', '.join(CHUNK_COLUMNS)}) FROM STDIN", buffer
+        )
+    finally:
+        cursor.close()
+    return count
+
+
+def update_embeddings(db: Session, embeddings: List[Tuple[uuid.UUID, Sequence[float]]]) -> int:
+    """
+    Set embeddings for many chunks with one UPDATE ... FROM (VALUES ...).
+
+    Args:
+        embeddings: (chunk id, embedding) pairs
+
+    Returns:
+        Number of rows updated
+    """
+    if not embeddings:
+        return 0
+
+    cursor = db.connection().connection.cursor()
+    try:
+        execute_values(
+            cursor,
+            """
+            UPDATE document_chunks AS c
+            SET embedding = v.embedding::vector
+            FROM (VALUES %s) AS v (id, embedding)
+            WHERE c.id = v.id::uuid
+            """,
+            [(str(chunk_id), vector_literal(embedding)) for chunk_id, embedding in embeddings],
+            page_size=len(embeddings),
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
@@ -10,11 +10,14 @@ from sqlalchemy import (
     String,
     Text,
     Integer,
+    BigInteger,
     Float,
     Boolean,
     DateTime,
     ForeignKey,
+    Index,
     JSON,
+    LargeBinary,
     Enum as SQLEnum,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -119,6 +122,7 @@ class Document(Base):
     original_filename: Mapped[str] = mapped_column(String(255), nullable=False)
     file_path: Mapped[str] = mapped_column(String(500), nullable=False)
     file_size: Mapped[int] = mapped_column(Integer)
+    file_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)  # SHA-256 hex
     mime_type: Mapped[str] = mapped_column(String(100))
     document_type: Mapped[DocumentType] = mapped_column(
         SQLEnum(DocumentType), default=DocumentType.OTHER
@@ -158,6 +162,9 @@ class Document(Base):
     chunks: Mapped[List["DocumentChunk"]] = relationship(
         "DocumentChunk", back_populates="document", cascade="all, delete-orphan"
     )
+    text_frames: Mapped[List["DocumentTextFrame"]] = relationship(
+        "DocumentTextFrame", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class DocumentChunk(Base):
@@ -172,11 +179,17 @@ class DocumentChunk(Base):
         UUID(as_uuid=True), ForeignKey("documents.id"), nullable=False
     )
     chunk_index: Mapped[int] = mapped_column(Integer, nullable=False)
-    content: Mapped[str] = mapped_column(Text, nullable=False)
+    content: Mapped[Optional[str]] = mapped_column(Text)  # None for offset-referenced chunks
     start_char: Mapped[Optional[int]] = mapped_column(Integer)
     end_char: Mapped[Optional[int]] = mapped_column(Integer)
     word_count: Mapped[Optional[int]] = mapped_column(Integer)
     token_count: Mapped[Optional[int]] = mapped_column(Integer)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)  # SHA-256 of content
+    duplicate_of: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("document_chunks.id", ondelete="SET NULL"),
+        index=True,
+    )  # Canonical chunk this one near-duplicates; collapsed in search
 
     # Vector embeddings (768-dim for PubMedBERT, 1536 for OpenAI)
     embedding: Mapped[Optional[List[float]]] = mapped_column(Vector(768))
@@ -194,6 +207,77 @@ class DocumentChunk(Base):
     document: Mapped["Document"] = relationship("Document", back_populates="chunks")
 
 
+class ChunkSignature(Base):
+    """MinHash signature of a canonical chunk, indexed by project-scoped LSH band keys"""
+
+    __tablename__ = "chunk_signatures"
+    __table_args__ = (
+        Index("ix_chunk_signatures_band_keys", "band_keys", postgresql_using="gin"),
+    )
+
+    chunk_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("document_chunks.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    minhash: Mapped[List[int]] = mapped_column(ARRAY(BigInteger), nullable=False)
+    band_keys: Mapped[List[int]] = mapped_column(ARRAY(BigInteger), nullable=False)
+
+
+class DocumentTextFrame(Base):
+    """A zstd-compressed, independently readable slice of a document's extracted text"""
+
+    __tablename__ = "document_text_frames"
+
+    document_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    frame_index: Mapped[int] = mapped_column(Integer, primary_key=True)
+    start_char: Mapped[int] = mapped_column(Integer, nullable=False)
+    end_char: Mapped[int] = mapped_column(Integer, nullable=False)  # Exclusive
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # UTF-8, zstd frame
+
+
+class Blob(Base):
+    """Stored file content, shared by every document with the same hash"""
+
+    __tablename__ = "blobs"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # SHA-256 hex
+    location: Mapped[str] = mapped_column(String(500), nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger)
+    refcount: Mapped[int] = mapped_column(Integer, default=0)  # Documents referencing this blob
+    orphaned_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), index=True
+    )  # When refcount last dropped to zero; the reaper deletes it after a grace period
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow
+    )
+
+
+class IngestBatch(Base):
+    """A batch of documents uploaded together and processed as a Celery group"""
+
+    __tablename__ = "ingest_batches"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )  # Also the Celery group id
+    project_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("projects.id"), nullable=True
+    )
+    document_ids: Mapped[List[str]] = mapped_column(JSON, default=list)
+    skipped_json: Mapped[Optional[list]] = mapped_column(JSON)  # Entries not ingested, with reasons
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow
+    )
+
+
 class RFA(Base):
     """Request for Applications"""
 
@@ -10,6 +10,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.config import get_settings
 from app.db.database import engine, Base
 from app.api import projects, documents, health, chat, websocket, agents
+from app.services.uploads import UploadSizeLimitMiddleware, upload_size_limits
+from app.websocket import event_bridge
 
 
 settings = get_settings()
@@ -27,10 +29,14 @@ async def lifespan(app: FastAPI):
             await conn.run_sync(Base.metadata.create_all)
         print("✓ Database tables created/verified")
 
+    # Relay worker events (document progress) to this process's WebSocket clients
+    await event_bridge.start()
+
     yield
 
     # Shutdown
     print(f"👋 Shutting down {settings.app_name}...")
+    await event_bridge.stop()
     await engine.dispose()
 
 
@@ -50,6 +56,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads before their bodies are read
+app.add_middleware(UploadSizeLimitMiddleware, limits=upload_size_limits())
+
 # Include routers
 app.include_router(health.router, tags=["Health"])
 app.include_router(projects.router, prefix="/api/projects", tags=["Projects"])
@@ -0,0 +1,257 @@
+"""
+Extractor Benchmark Harness
+Runs every registered extractor over a local corpus and reports throughput,
+peak memory and text agreement with a reference extractor.
+
+Usage:
+    python -m app.processors.benchmark /path/to/corpus
+    python -m app.processors.benchmark /path/to/corpus --type pdf --reference pypdf --json
+"""
+
+import argparse
+import json
+import multiprocessing
+import queue as queue_module
+import resource
+import sys
+import time
+from dataclasses import asdict, dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.processors.document_processor import DocumentProcessor
+from app.processors.extractors import registry
+
+# Seconds one extraction may run before it is killed and reported as failed
+DEFAULT_RUN_TIMEOUT = 600.0
+
+# How often the parent checks whether a silent child has died
+_POLL_SECONDS = 0.5
+
+
+@dataclass
+class RunResult:
+    """One extractor run over one file"""
+    file: str
+    file_type: str
+    extractor: str
+    seconds: float
+    pages: Optional[int]
+    chars: int
+    peak_rss_mb: float
+    similarity: Optional[float] = None  # Word-level agreement with the reference
+    error: Optional[str] = None
+
+    @property
+    def pages_per_sec(self) -> Optional[float]:
+        if not self.pages or not self.seconds:
+            return None
+        return self.pages / self.seconds
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_extractor(file_path: str, extractor_name: str, queue):
+    """Child process body: extract once and report timing, memory and text"""
+    try:
+        processor = DocumentProcessor(file_path)
+        baseline = _peak_rss_mb()
+        started = time.perf_counter()
+        text = "".join(t for _, t in processor.iter_segments(extractor_name))
+        elapsed = time.perf_counter() - started
+        queue.put({
+            "seconds": elapsed,
+            "pages": processor.page_count,
+            "text": text,
+            "peak_rss_mb": max(_peak_rss_mb() - baseline, 0.0),
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_isolated(
+    file_path: str, extractor_name: str, timeout: float = DEFAULT_RUN_TIMEOUT
+) -> dict:
+    """Run one extraction in a fresh process so peak RSS is per run"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_extractor, args=(file_path, extractor_name, queue))
+    process.start()
+    return wait_for_result(process, queue, timeout)
+
+
+def wait_for_result(process, queue, timeout: float) -> dict:
+    """
+    Collect a child's result without hanging on a crashed or stuck child.
+
+    A child that dies without reporting (segfault, OOM kill), exits
+    non-zero, or runs past the timeout is reported as a failed run.
+    """
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None:
+        try:
+            # Read before joining: a child can't exit while its result is unread
+            result = queue.get(timeout=_POLL_SECONDS)
+        except queue_module.Empty:
+            if not process.is_alive():
+                try:
+                    result = queue.get(timeout=_POLL_SECONDS)
+                except queue_module.Empty:
+                    break
+            elif time.monotonic() > deadline:
+                process.kill()
+                process.join()
+                return {"error": f"Timed out after {timeout:g}s"}
+
+    process.join(timeout=_POLL_SECONDS * 10)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+    if process.exitcode:
+        reason = (
+            f"killed by signal {-process.exitcode}" if process.exitcode < 0
+            else f"exit code {process.exitcode}"
+        )
+        return {"error": f"Extractor process failed ({reason})"}
+    if result is None:
+        return {"error": "Extractor process exited without a result"}
+    return result
+
+
+def similarity(reference: str, candidate: str) -> float:
+    """Word sequence similarity in [0, 1]"""
+    return SequenceMatcher(None, reference.split(), candidate.split()).ratio()
+
+
+def benchmark_corpus(
+    corpus: Path,
+    file_type: Optional[str] = None,
+    reference: Optional[Dict[str, str]] = None,
+    timeout: float = DEFAULT_RUN_TIMEOUT,
+) -> List[RunResult]:
+    """
+    Benchmark all available extractors on every supported file in a corpus.
+
+    Args:
+        corpus: Directory searched recursively
+        file_type: Only benchmark this file type (pdf, docx, doc, txt)
+        reference: File type -> extractor used as the quality reference;
+            defaults to the highest-priority extractor
+        timeout: Seconds per extraction before it counts as failed
+    """
+    reference = reference or {}
+    results: List[RunResult] = []
+
+    for path in sorted(p for p in corpus.rglob("*") if p.is_file()):
+        try:
+            detected = DocumentProcessor.SUPPORTED_TYPES.get(DocumentProcessor(str(path)).mime_type)
+        except Exception:
+            continue
+        if detected is None or (file_type and detected != file_type):
+            continue
+
+        extractors = registry.for_type(detected)
+        if not extractors:
+            continue
+        reference_name = reference.get(detected, extractors[0].name)
+
+        texts: Dict[str, str] = {}
+        file_results: List[RunResult] = []
+        for extractor in extractors:
+            run = run_isolated(str(path), extractor.name, timeout)
+            texts[extractor.name] = run.get("text", "")
+            file_results.append(RunResult(
+                file=str(path.relative_to(corpus)),
+                file_type=detected,
+                extractor=extractor.name,
+                seconds=run.get("seconds", 0.0),
+                pages=run.get("pages"),
+                chars=len(run.get("text", "")),
+                peak_rss_mb=run.get("peak_rss_mb", 0.0),
+                error=run.get("error"),
+            ))
+
+        if reference_name in texts:
+            for result in file_results:
+                if result.error is None:
+                    result.similarity = similarity(texts[reference_name], texts[result.extractor])
+
+        results.extend(file_results)
+
+    return results
+
+
+def summarize(results: List[RunResult]) -> List[dict]:
+    """Aggregate results per (file type, extractor)"""
+    groups: Dict[tuple, List[RunResult]] = {}
+    for result in results:
+        groups.setdefault((result.file_type, result.extractor), []).append(result)
+
+    summary = []
+    for (file_type, extractor), runs in sorted(groups.items()):
+        ok = [r for r in runs if r.error is None]
+        seconds = sum(r.seconds for r in ok)
+        pages = sum(r.pages or 0 for r in ok)
+        similarities = [r.similarity for r in ok if r.similarity is not None]
+        summary.append({
+            "file_type": file_type,
+            "extractor": extractor,
+            "files": len(runs),
+            "errors": len(runs) - len(ok),
+            "pages_per_sec": round(pages / seconds, 2) if pages and seconds else None,
+            "chars_per_sec": round(sum(r.chars for r in ok) / seconds) if seconds else None,
+            "max_peak_rss_mb": round(max((r.peak_rss_mb for r in ok), default=0.0), 1),
+            "mean_similarity": (
+                round(sum(similarities) / len(similarities), 4) if similarities else None
+            ),
+        })
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark document text extractors")
+    parser.add_argument("corpus", type=Path, help="Directory of sample documents")
+    parser.add_argument("--type", dest="file_type", help="Only this file type (pdf, docx, doc, txt)")
+    parser.add_argument(
+        "--reference", action="append", default=[], metavar="TYPE=EXTRACTOR",
+        help="Quality reference per file type, e.g. pdf=pypdf",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=DEFAULT_RUN_TIMEOUT,
+        help="Seconds per extraction before it is killed and counted as an error",
+    )
+    parser.add_argument("--json", action="store_true", help="Print per-run results as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.corpus.is_dir():
+        parser.error(f"{args.corpus} is not a directory")
+
+    reference = dict(item.split("=", 1) for item in args.reference)
+    results = benchmark_corpus(args.corpus, args.file_type, reference, args.timeout)
+
+    if args.json:
+        print(json.dumps(
+            {"runs": [asdict(r) for r in results], "summary": summarize(results)}, indent=2
+        ))
+        return 0
+
+    columns = [
+        "file_type", "extractor", "files", "errors", "pages_per_sec",
+        "chars_per_sec", "max_peak_rss_mb", "mean_similarity",
+    ]
+    rows = [[str(row[c]) if row[c] is not None else "-" for c in columns] for row in summarize(results)]
+    widths = [max(len(c), *(len(r[i]) for r in rows)) if rows else len(c) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""
+Text Chunking
+Token-sized, boundary-aware chunking with NIH section detection
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.services.budget import count_tokens
+
+# A text segment: (1-based page number or None, text). Concatenating the
+# segments of a document gives its full extracted text.
+Segment = Tuple[Optional[int], str]
+
+# Boundary strengths, strongest first
+PARAGRAPH, LINE, SENTENCE, WORD = 3, 2, 1, 0
+
+# Paragraph break, line break, or whitespace after sentence punctuation.
+# "C. Approach" style outline labels are not sentence ends.
+BOUNDARY_RE = re.compile(r"\n[ \t]*\n\s*|\n\s*|(?<=[a-z0-9)\]][.!?])[ \t]+(?=\S)")
+
+# Stop waiting for a boundary once this much text has no break in it
+MAX_PENDING_CHARS = 20_000
+
+NIH_SECTIONS = {
+    "specific aims": "specific_aims",
+    "research strategy": "research_strategy",
+    "significance": "significance",
+    "innovation": "innovation",
+    "approach": "approach",
+    "preliminary data": "preliminary_data",
+    "preliminary studies": "preliminary_data",
+    "background": "background",
+    "rigor and reproducibility": "rigor",
+    "rigor of the prior research": "rigor",
+    "timeline": "timeline",
+    "future directions": "future_directions",
+    "human subjects": "human_subjects",
+    "vertebrate animals": "vertebrate_animals",
+    "budget justification": "budget_justification",
+    "budget": "budget",
+    "facilities and other resources": "facilities",
+    "facilities": "facilities",
+    "equipment": "equipment",
+    "biographical sketch": "biosketch",
+    "personal statement": "personal_statement",
+    "bibliography and references cited": "bibliography",
+    "bibliography": "bibliography",
+    "references cited": "bibliography",
+    "references": "bibliography",
+    "letters of support": "letters_of_support",
+}
+
+# A heading is a short line: optional outline label ("A.", "2.", "II."),
+# a known section name, optional trailing colon
+HEADING_RE = re.compile(
+    r"^(?:(?:[A-Z]|\d+(?:\.\d+)*|[IVX]+)[.)]\s*)?("
+    + "|".join(re.escape(name) for name in sorted(NIH_SECTIONS, key=len, reverse=True))
+    + r")\s*:?$",
+    re.IGNORECASE,
+)
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of chunk text, used to match chunks across versions"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def detect_section(line: str) -> Optional[str]:
+    """Return the section key if a line is an NIH section heading"""
+    if len(line) > 80:
+        return None
+    match = HEADING_RE.match(line.strip())
+    return NIH_SECTIONS[match.group(1).lower()] if match else None
+
+
+@dataclass
+class _Unit:
+    """A span of text between boundaries"""
+    start: int
+    end: int
+    tokens: int
+    strength: int  # Strength of the boundary that ends this unit
+    section: Optional[str]
+    is_heading: bool = False
+
+
+class TextChunker:
+    """
+    Splits text into chunks for embedding and retrieval.
+
+    Boundaries (paragraph, line, sentence) are found once with a single regex
+    pass, and each span between them is token-counted once. Chunks are packed
+    from whole spans up to chunk_size tokens, preferring to end on a
+    paragraph, and overlap by whole trailing spans up to chunk_overlap
+    tokens. Each chunk always adds new text, so overlap can't re-emit the
+    same chunk. Section headings start a new chunk and set its section.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 256,
+        chunk_overlap: int = 48,
+        min_fill: float = 0.8,
+    ):
+        self.chunk_size = chunk_size  # Tokens
+        self.chunk_overlap = chunk_overlap  # Tokens
+        self.min_fill = min_fill  # Fraction of chunk_size before a weaker boundary may be preferred
+
+    def split(self, text: str, extraction=None) -> list[dict]:
+        """
+        Split text into overlapping chunks with metadata.
+
+        When the extraction result is given, each chunk also gets the page
+        number its text starts on.
+        """
+        chunks = list(self.iter_chunks([(None, text)]))
+        if extraction:
+            for chunk in chunks:
+                chunk["page_number"] = extraction.page_for_offset(chunk["start_char"])
+        return chunks
+
+    def iter_chunks(self, segments: Iterable[Segment]) -> Iterator[dict]:
+        """
+        Chunk a stream of text segments incrementally.
+
+        Only text belonging to the chunk being built is buffered, so memory
+        is independent of document length. Chunks may span segment
+        boundaries and carry the page their text starts on.
+        """
+        state = _ChunkState()
+        current: List[_Unit] = []
+        current_tokens = 0
+        carried = 0  # Leading units of current that were already emitted
+
+        for unit in self._iter_units(segments, state):
+            if unit.is_heading:
+                # A heading starts a new chunk, unless only headings precede it
+                if not all(u.is_heading for u in current[carried:]):
+                    yield state.make_chunk(current)
+                    current = []
+                current = current[carried:]
+                current_tokens = sum(u.tokens for u in current)
+                carried = 0
+
+            if current and current_tokens + unit.tokens > self.chunk_size:
+                if len(current) > carried:
+                    cut = self._choose_cut(current, carried)
+                    yield state.make_chunk(current[:cut])
+                    overlap = self._overlap(current[:cut])
+                    current = current[cut - len(overlap):]
+                    current_tokens = sum(u.tokens for u in current)
+                    carried = len(overlap)
+                # Drop overlap if the unit still doesn't fit beside it
+                while carried and current_tokens + unit.tokens > self.chunk_size:
+                    current_tokens -= current.pop(0).tokens
+                    carried -= 1
+
+            current.append(unit)
+            current_tokens += unit.tokens
+            state.release(current[0].start)
+
+        if len(current) > carried:
+            yield state.make_chunk(current)
+
+    def _choose_cut(self, units: List[_Unit], carried: int) -> int:
+        """Number of units to emit, ending on the strongest late boundary"""
+        total = sum(u.tokens for u in units)
+        best, best_strength = len(units), units[-1].strength
+        running = total
+        for i in range(len(units) - 1, carried, -1):
+            running -= units[i].tokens
+            if running < self.chunk_size * self.min_fill:
+                break
+            if units[i - 1].strength > best_strength:
+                best, best_strength = i, units[i - 1].strength
+        return best
+
+    def _overlap(self, units: List[_Unit]) -> List[_Unit]:
+        """Trailing whole units totalling at most chunk_overlap tokens"""
+        overlap: List[_Unit] = []
+        tokens = 0
+        for unit in reversed(units[1:]):
+            if unit.is_heading or tokens + unit.tokens > self.chunk_overlap:
+                break
+            overlap.insert(0, unit)
+            tokens += unit.tokens
+        return overlap
+
+    def _iter_units(self, segments: Iterable[Segment], state: "_ChunkState") -> Iterator[_Unit]:
+        """Turn segments into units, scanning each character for boundaries once"""
+        section: Optional[str] = None
+        line_start = True  # Whether the next unit begins a line
+        scan_from = 0  # Absolute offset where the next unit starts
+
+        for page_number, text in segments:
+            state.append(page_number, text)
+            pending = state.buffer_from(scan_from)
+
+            last_end = 0
+            for match in BOUNDARY_RE.finditer(pending):
+                if match.end() == len(pending):
+                    break  # The boundary may continue into the next segment
+                strength = self._strength(match.group())
+                for unit in self._make_units(
+                    scan_from + last_end, scan_from + match.start(), strength,
+                    section, line_start, state,
+                ):
+                    section = unit.section
+                    yield unit
+                line_start = strength >= LINE
+                last_end = match.end()
+
+            if len(pending) - last_end > MAX_PENDING_CHARS:
+                # No boundary for a long stretch: break at the last space, or
+                # anywhere if there is none, so the buffer stays bounded
+                space = pending.rfind(" ", last_end)
+                cut = space if space > last_end else len(pending)
+                for unit in self._make_units(
+                    scan_from + last_end, scan_from + cut, WORD,
+                    section, line_start, state,
+                ):
+                    section = unit.section
+                    yield unit
+                line_start = False
+                last_end = cut + 1 if cut == space else cut
+
+            scan_from += last_end
+
+        yield from self._make_units(scan_from, state.total, PARAGRAPH, section, line_start, state)
+
+    @staticmethod
+    def _strength(boundary: str) -> int:
+        newlines = boundary.count("\n")
+        if newlines >= 2:
+            return PARAGRAPH
+        if newlines == 1:
+            return LINE
+        return SENTENCE
+
+    def _make_units(
+        self,
+        start: int,
+        end: int,
+        strength: int,
+        section: Optional[str],
+        line_start: bool,
+        state: "_ChunkState",
+    ) -> Iterator[_Unit]:
+        """Build units for one span, splitting spans longer than a chunk at spaces"""
+        raw = state.text(start, end)
+        stripped = raw.strip()
+        if not stripped:
+            return
+        start += len(raw) - len(raw.lstrip())
+        end = start + len(stripped)
+
+        # Headings sit alone on their line
+        heading = detect_section(stripped) if line_start and strength >= LINE else None
+        if heading:
+            yield _Unit(start, end, count_tokens(stripped), strength, heading, is_heading=True)
+            return
+
+        tokens = count_tokens(stripped)
+        if tokens <= self.chunk_size:
+            yield _Unit(start, end, tokens, strength, section)
+            return
+
+        # Oversized span: pack words into pieces of at most chunk_size tokens
+        piece_start = None
+        piece_end = start
+        piece_tokens = 0
+        for word in re.finditer(r"\S+", stripped):
+            word_tokens = count_tokens(" " + word.group())
+            if piece_start is not None and piece_tokens + word_tokens > self.chunk_size:
+                yield _Unit(piece_start, piece_end, piece_tokens, WORD, section)
+                piece_start, piece_tokens = None, 0
+            if word_tokens > self.chunk_size:
+                # A single "word" longer than a chunk (base64, URLs, no-space
+                # scripts) is cut at character offsets
+                word_start = start + word.start()
+                for piece_from, piece_to, tokens in self._split_word(word.group()):
+                    yield _Unit(word_start + piece_from, word_start + piece_to, tokens, WORD, section)
+                continue
+            if piece_start is None:
+                piece_start = start + word.start()
+            piece_end = start + word.end()
+            piece_tokens += word_tokens
+        if piece_start is not None:
+            yield _Unit(piece_start, piece_end, piece_tokens, strength, section)
+
+    def _split_word(self, word: str) -> Iterator[Tuple[int, int, int]]:
+        """(start, end, tokens) pieces of a word, each at most chunk_size tokens"""
+        position = 0
+        while position < len(word):
+            size = self.chunk_size * 4  # ~4 chars per token; shrunk below if denser
+            while True:
+                piece = word[position:position + size]
+                tokens = count_tokens(piece)
+                if tokens <= self.chunk_size or size == 1:
+                    break
+                size = max(1, min(size - 1, size * self.chunk_size // tokens))
+            yield position, position + len(piece), tokens
+            position += len(piece)
+
+
+class _ChunkState:
+    """Sliding text buffer with absolute offsets and page markers"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.buffer_start = 0
+        self.total = 0
+        self.pages: List[Tuple[int, int]] = []  # (start offset, page number)
+        self.index = 0
+
+    def append(self, page_number: Optional[int], text: str):
+        if page_number is not None:
+            self.pages.append((self.total, page_number))
+        self.buffer += text
+        self.total += len(text)
+
+    def text(self, start: int, end: int) -> str:
+        return self.buffer[start - self.buffer_start:end - self.buffer_start]
+
+    def buffer_from(self, start: int) -> str:
+        return self.buffer[start - self.buffer_start:]
+
+    def release(self, offset: int):
+        """Forget text before offset once enough has accumulated"""
+        if offset - self.buffer_start > 4096:
+            self.buffer = self.buffer[offset - self.buffer_start:]
+            self.buffer_start = offset
+            while len(self.pages) > 1 and self.pages[1][0] <= offset:
+                self.pages.pop(0)
+
+    def page_at(self, offset: int) -> Optional[int]:
+        page_number = None
+        for start, number in self.pages:
+            if start > offset:
+                break
+            page_number = number
+        return page_number
+
+    def make_chunk(self, units: List[_Unit]) -> dict:
+        start, end = units[0].start, units[-1].end
+        text = self.text(start, end)
+        chunk = {
+            "index": self.index,
+            "text": text,
+            "start_char": start,
+            "end_char": end,
+            "word_count": len(text.split()),
+            "token_count": sum(u.tokens for u in units),
+            "content_hash": content_hash(text),
+            "page_number": self.page_at(start),
+            "section": units[-1].section,
+        }
+        self.index += 1
+        return chunk
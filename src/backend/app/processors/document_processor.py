@@ -3,13 +3,84 @@ Document Processing Service
 Extracts text from PDF, DOCX, DOC, and TXT files
 """
 
-import os
+from bisect import bisect_right
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, List, Optional
 import magic
 
-from pypdf import PdfReader
-from docx import Document as DocxDocument
+from app.config import get_settings
+from app.processors.chunking import Segment, TextChunker
+from app.processors.extractors import registry
+
+settings = get_settings()
+
+
+@dataclass
+class ExtractionResult:
+    """Extracted text plus the char offset where each page starts"""
+    text: str
+    page_offsets: List[int] = field(default_factory=list)
+
+    @property
+    def page_count(self) -> Optional[int]:
+        """Number of pages, or None for formats without pages"""
+        return len(self.page_offsets) or None
+
+    def page_for_offset(self, offset: int) -> Optional[int]:
+        """1-based page number containing a char offset"""
+        if not self.page_offsets:
+            return None
+        return max(bisect_right(self.page_offsets, offset), 1)
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Segment]) -> "ExtractionResult":
+        """Join text segments, recording where each page starts"""
+        parts = []
+        page_offsets = []
+        position = 0
+
+        for page_number, text in segments:
+            if page_number is not None:
+                page_offsets.append(position)
+            parts.append(text)
+            position += len(text)
+
+        return cls(text="".join(parts), page_offsets=page_offsets)
+
+    def iter_segments(self) -> Iterator[Segment]:
+        """Split the text back into per-page segments, the inverse of from_segments"""
+        if not self.page_offsets:
+            yield None, self.text
+            return
+
+        bounds = self.page_offsets + [len(self.text)]
+        if bounds[0] > 0:
+            yield None, self.text[:bounds[0]]
+        for number, (start, end) in enumerate(zip(bounds, bounds[1:]), 1):
+            yield number, self.text[start:end]
+
+
+class WordCounter:
+    """
+    Counts whitespace-separated words in text fed piece by piece.
+
+    A word cut by a piece boundary (e.g. a TXT block split mid-word) is
+    counted once, so the total matches len(whole_text.split()).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._in_word = False  # Previous piece ended inside a word
+
+    def add(self, text: str):
+        if not text:
+            return
+        words = len(text.split())
+        if words and self._in_word and not text[0].isspace():
+            words -= 1
+        self.count += words
+        self._in_word = not text[-1].isspace()
 
 
 class DocumentProcessor:
@@ -25,144 +96,113 @@ class DocumentProcessor:
     def __init__(self, file_path: str):
         self.file_path = Path(file_path)
         self.mime_type = self._detect_mime_type()
+        self.page_count: Optional[int] = None  # Set as pages are extracted
+        self.extractor_name: Optional[str] = None
+        self._result: Optional[ExtractionResult] = None
 
     def _detect_mime_type(self) -> str:
         """Detect file MIME type using libmagic"""
         mime = magic.Magic(mime=True)
         return mime.from_file(str(self.file_path))
 
+    def extract(self) -> ExtractionResult:
+        """Extract text and page boundaries based on file type, parsing the file once"""
+        if self._result is None:
+            self._result = ExtractionResult.from_segments(self.iter_segments())
+        return self._result
+
     def extract_text(self) -> str:
         """Extract text based on file type"""
-        file_type = self.SUPPORTED_TYPES.get(self.mime_type)
+        return self.extract().text
+
+    def iter_segments(self, extractor_name: Optional[str] = None) -> Iterator[Segment]:
+        """
+        Stream extracted text as segments without holding the whole document.
+
+        Paged formats yield one segment per page (empty pages included, so
+        page numbers stay aligned); separators between units are part of the
+        segment text.
 
-        if file_type == "pdf":
-            return self._extract_pdf()
-        elif file_type == "docx":
-            return self._extract_docx()
-        elif file_type == "doc":
-            return self._extract_doc()
-        elif file_type == "txt":
-            return self._extract_txt()
-        else:
+        Args:
+            extractor_name: Registered engine to use instead of the default
+        """
+        file_type = self.SUPPORTED_TYPES.get(self.mime_type)
+        if file_type is None:
             raise ValueError(f"Unsupported file type: {self.mime_type}")
 
-    def _extract_pdf(self) -> str:
-        """Extract text from PDF"""
-        reader = PdfReader(str(self.file_path))
-        text_parts = []
-
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_parts.append(text)
-
-        return "\n\n".join(text_parts)
-
-    def _extract_docx(self) -> str:
-        """Extract text from DOCX"""
-        doc = DocxDocument(str(self.file_path))
-        paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-        return "\n\n".join(paragraphs)
-
-    def _extract_doc(self) -> str:
-        """Extract text from legacy DOC format"""
-        # For now, treat as plain text - would need antiword or similar for full support
-        # Most modern DOC files are actually DOCX
-        try:
-            return self._extract_docx()
-        except Exception:
-            return self._extract_txt()
-
-    def _extract_txt(self) -> str:
-        """Extract text from plain text file"""
-        with open(self.file_path, "r", encoding="utf-8", errors="replace") as f:
-            return f.read()
+        extractor = registry.get(file_type, extractor_name)
+        self.extractor_name = extractor.name
+        has_text = False
+
+        for page_number, text in extractor.extract(str(self.file_path)):
+            if page_number is not None:
+                self.page_count = page_number
+            if text and has_text:
+                text = extractor.separator + text
+            has_text = has_text or bool(text)
+            yield page_number, text
 
     def get_page_count(self) -> Optional[int]:
-        """Get page count for PDF files"""
-        if self.SUPPORTED_TYPES.get(self.mime_type) == "pdf":
-            reader = PdfReader(str(self.file_path))
-            return len(reader.pages)
-        return None
+        """Get page count for paged formats, from the same parse as the text"""
+        return self.extract().page_count
 
     def get_word_count(self, text: str) -> int:
         """Count words in extracted text"""
         return len(text.split())
 
 
-class TextChunker:
-    """Splits text into chunks for embedding and retrieval"""
-
-    def __init__(
-        self,
-        chunk_size: int = 1000,
-        chunk_overlap: int = 200,
-        separators: list[str] = None,
-    ):
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
-        self.separators = separators or ["\n\n", "\n", ". ", " "]
-
-    def split(self, text: str) -> list[dict]:
-        """Split text into overlapping chunks with metadata"""
-        chunks = []
-        current_pos = 0
-        chunk_index = 0
-
-        while current_pos < len(text):
-            # Find the end of this chunk
-            end_pos = min(current_pos + self.chunk_size, len(text))
-
-            # Try to break at a natural boundary
-            if end_pos < len(text):
-                for sep in self.separators:
-                    # Look for separator near the end of chunk
-                    search_start = max(current_pos + self.chunk_size - 100, current_pos)
-                    sep_pos = text.rfind(sep, search_start, end_pos + 50)
-                    if sep_pos > current_pos:
-                        end_pos = sep_pos + len(sep)
-                        break
-
-            chunk_text = text[current_pos:end_pos].strip()
-
-            if chunk_text:
-                chunks.append({
-                    "index": chunk_index,
-                    "text": chunk_text,
-                    "start_char": current_pos,
-                    "end_char": end_pos,
-                    "word_count": len(chunk_text.split()),
-                })
-                chunk_index += 1
-
-            # Move position with overlap
-            current_pos = end_pos - self.chunk_overlap
-            if current_pos <= chunks[-1]["start_char"] if chunks else 0:
-                current_pos = end_pos  # Prevent infinite loop
-
-        return chunks
-
-
-def process_document(file_path: str) -> dict:
+class DocumentPipeline:
     """
-    Process a document file and return extracted data.
+    Streams a document through extract -> chunk in fixed-size batches.
 
-    Returns:
-        dict with keys: text, chunks, page_count, word_count, mime_type
+    Iterating yields lists of chunk dicts. Document statistics are filled in
+    as extraction progresses and are final once iteration ends.
     """
-    processor = DocumentProcessor(file_path)
-    text = processor.extract_text()
-    page_count = processor.get_page_count()
-    word_count = processor.get_word_count(text)
-
-    chunker = TextChunker()
-    chunks = chunker.split(text)
-
-    return {
-        "text": text,
-        "chunks": chunks,
-        "page_count": page_count,
-        "word_count": word_count,
-        "mime_type": processor.mime_type,
-        "chunk_count": len(chunks),
-    }
+
+    def __init__(self, file_path: str, batch_size: Optional[int] = None):
+        self.processor = DocumentProcessor(file_path)
+        self.chunker = TextChunker()
+        self.batch_size = batch_size or settings.ingest_batch_size
+        self.mime_type = self.processor.mime_type
+        self.chunk_count = 0
+        self._words = WordCounter()
+
+    @property
+    def page_count(self) -> Optional[int]:
+        return self.processor.page_count
+
+    @property
+    def word_count(self) -> int:
+        return self._words.count
+
+    def _count_words(self, segments: Iterable[Segment]) -> Iterator[Segment]:
+        for page_number, text in segments:
+            self._words.add(text)
+            yield page_number, text
+
+    def __iter__(self) -> Iterator[List[dict]]:
+        batch = []
+        segments = self._count_words(self.processor.iter_segments())
+
+        for chunk in self.chunker.iter_chunks(segments):
+            batch.append(chunk)
+            self.chunk_count += 1
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+
+def process_document(file_path: str, batch_size: Optional[int] = None) -> DocumentPipeline:
+    """
+    Process a document file as a stream of chunk batches.
+
+    Usage:
+        pipeline = process_document(path)
+        for batch in pipeline:
+            ...  # embed and store the batch
+        pipeline.page_count, pipeline.word_count, pipeline.chunk_count
+    """
+    return DocumentPipeline(file_path, batch_size=batch_size)
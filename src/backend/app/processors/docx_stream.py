@@ -0,0 +1,125 @@
+"""
+Streaming DOCX Extraction
+Reads text blocks out of a .docx zip with lxml iterparse, without building
+the full document tree. Emits paragraphs, table rows, headers and footers.
+"""
+
+import re
+import zipfile
+from typing import IO, Iterator, List
+
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W_P = f"{{{W_NS}}}p"
+W_T = f"{{{W_NS}}}t"
+W_TAB = f"{{{W_NS}}}tab"
+W_BR = f"{{{W_NS}}}br"
+W_CR = f"{{{W_NS}}}cr"
+W_TC = f"{{{W_NS}}}tc"
+W_TR = f"{{{W_NS}}}tr"
+W_TBL = f"{{{W_NS}}}tbl"
+
+HEADER_RE = re.compile(r"^word/header\d*\.xml$")
+FOOTER_RE = re.compile(r"^word/footer\d*\.xml$")
+
+# Separator between cells when a table row is emitted as one line
+CELL_SEPARATOR = " | "
+
+
+def _paragraph_text(paragraph) -> str:
+    """Text of a w:p, with tabs and breaks kept"""
+    parts = []
+    for node in paragraph.iter(W_T, W_TAB, W_BR, W_CR):
+        if node.tag == W_T:
+            parts.append(node.text or "")
+        elif node.tag == W_TAB:
+            parts.append("\t")
+        else:
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _iter_part_blocks(stream: IO[bytes]) -> Iterator[str]:
+    """
+    Stream text blocks from one WordprocessingML part in document order.
+
+    Paragraphs outside tables are emitted on their own. Table rows are
+    emitted as one line with cells separated by CELL_SEPARATOR, and
+    paragraphs inside a cell are joined with a space. Elements are cleared
+    once emitted, so memory stays proportional to the largest table row.
+    """
+    # One entry per open table: the cells of its current row. Nested tables
+    # emit their rows as separate lines before the enclosing row.
+    rows: List[List[List[str]]] = []
+
+    for event, elem in etree.iterparse(stream, events=("start", "end"), tag=(W_P, W_TC, W_TR, W_TBL)):
+        if event == "start":
+            if elem.tag == W_TBL:
+                rows.append([])
+            elif elem.tag == W_TR:
+                rows[-1] = []
+            elif elem.tag == W_TC:
+                rows[-1].append([])
+            continue
+
+        if elem.tag == W_P:
+            text = _paragraph_text(elem)
+            if rows:
+                if rows[-1] and text.strip():
+                    rows[-1][-1].append(text.strip())
+            else:
+                if text.strip():
+                    yield text
+                elem.clear()
+                _drop_previous_siblings(elem)
+        elif elem.tag == W_TR:
+            row = [" ".join(cell) for cell in rows[-1]]
+            if any(row):
+                yield CELL_SEPARATOR.join(row)
+            rows[-1] = []
+            elem.clear()
+        elif elem.tag == W_TBL:
+            rows.pop()
+            elem.clear()
+            if not rows:
+                _drop_previous_siblings(elem)
+
+
+def _drop_previous_siblings(elem):
+    """Free already-processed top-level elements"""
+    parent = elem.getparent()
+    if parent is None:
+        return
+    while elem.getprevious() is not None:
+        del parent[0]
+
+
+def iter_docx_blocks(file_path: str) -> Iterator[str]:
+    """
+    Stream text blocks from a .docx file.
+
+    Headers come first, then the body, then footers. Header and footer
+    parts with identical text (repeated per section) are emitted once.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        names = archive.namelist()
+        headers = sorted(n for n in names if HEADER_RE.match(n))
+        footers = sorted(n for n in names if FOOTER_RE.match(n))
+
+        seen = set()
+
+        def iter_unique(parts: List[str]) -> Iterator[str]:
+            for name in parts:
+                with archive.open(name) as stream:
+                    text = "\n".join(_iter_part_blocks(stream))
+                if text and text not in seen:
+                    seen.add(text)
+                    yield text
+
+        yield from iter_unique(headers)
+
+        with archive.open("word/document.xml") as stream:
+            yield from _iter_part_blocks(stream)
+
+        yield from iter_unique(footers)
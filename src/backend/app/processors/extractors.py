@@ -0,0 +1,277 @@
+"""
+Text Extractor Registry
+Pluggable extraction engines per file type, with capability and priority
+metadata. DocumentProcessor picks the highest-priority available engine
+unless settings.extractor_overrides names one for the file type.
+"""
+
+import zipfile
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+import billiard
+from pypdf import PdfReader
+
+from app.config import get_settings
+from app.processors.docx_stream import iter_docx_blocks
+
+settings = get_settings()
+
+
+PAGE_SEPARATOR = "\n\n"
+
+# Plain text files are streamed in blocks of this many characters
+TXT_BLOCK_CHARS = 1024 * 1024
+
+# An extractor yields (1-based page number or None, text) units: one per
+# page for paged formats, one per block otherwise
+ExtractFn = Callable[[str], Iterator[Tuple[Optional[int], str]]]
+
+
+@dataclass
+class Extractor:
+    """A registered extraction engine"""
+    name: str
+    file_type: str  # pdf, docx, doc, txt
+    extract: ExtractFn
+    priority: int = 0  # Higher wins when no override is configured
+    capabilities: FrozenSet[str] = field(default_factory=frozenset)  # pages, tables, headers, parallel
+    separator: str = PAGE_SEPARATOR  # Joins non-empty units; "" for continuous streams
+    is_available: Callable[[], bool] = lambda: True
+
+
+class ExtractorRegistry:
+    """Extractors by file type"""
+
+    def __init__(self):
+        self._extractors: Dict[str, List[Extractor]] = {}
+
+    def register(self, extractor: Extractor) -> Extractor:
+        """Register an extractor, replacing any with the same name and file type"""
+        extractors = [
+            e for e in self._extractors.get(extractor.file_type, [])
+            if e.name != extractor.name
+        ]
+        extractors.append(extractor)
+        extractors.sort(key=lambda e: e.priority, reverse=True)
+        self._extractors[extractor.file_type] = extractors
+        return extractor
+
+    def for_type(self, file_type: str, available_only: bool = True) -> List[Extractor]:
+        """Extractors for a file type, highest priority first"""
+        return [
+            e for e in self._extractors.get(file_type, [])
+            if not available_only or e.is_available()
+        ]
+
+    def get(self, file_type: str, name: Optional[str] = None) -> Extractor:
+        """The named extractor, or the highest-priority available one"""
+        name = name or settings.extractor_overrides.get(file_type)
+        extractors = self.for_type(file_type)
+
+        if name:
+            for extractor in extractors:
+                if extractor.name == name:
+                    return extractor
+            raise ValueError(f"Extractor {name!r} not available for {file_type}")
+
+        if not extractors:
+            raise ValueError(f"No extractor available for {file_type}")
+        return extractors[0]
+
+    def file_types(self) -> List[str]:
+        return list(self._extractors)
+
+
+registry = ExtractorRegistry()
+
+
+def register_extractor(
+    name: str,
+    file_type: str,
+    priority: int = 0,
+    capabilities: Tuple[str, ...] = (),
+    separator: str = PAGE_SEPARATOR,
+    is_available: Callable[[], bool] = lambda: True,
+):
+    """Decorator registering an extract function in the global registry"""
+    def decorator(fn: ExtractFn) -> ExtractFn:
+        registry.register(Extractor(
+            name=name,
+            file_type=file_type,
+            extract=fn,
+            priority=priority,
+            capabilities=frozenset(capabilities),
+            separator=separator,
+            is_available=is_available,
+        ))
+        return fn
+    return decorator
+
+
+def _module_available(module: str) -> Callable[[], bool]:
+    def check() -> bool:
+        try:
+            __import__(module)
+        except ImportError:
+            return False
+        return True
+    return check
+
+
+# PDF
+
+
+# The PdfReader of the document a pool worker is extracting, kept across
+# the ranges it is handed so each worker parses the file once
+_worker_reader: Optional[Tuple[str, PdfReader]] = None
+
+
+def _extract_pdf_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """Extract text for pages [start, end) in a worker process"""
+    global _worker_reader
+    if _worker_reader is None or _worker_reader[0] != file_path:
+        _worker_reader = (file_path, PdfReader(file_path))
+    reader = _worker_reader[1]
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _pdf_page_count(file_path: str) -> int:
+    """Page count from PDFium, which reads it without building a pypdf reader"""
+    try:
+        import pypdfium2
+    except ImportError:
+        return len(PdfReader(file_path).pages)
+
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _iter_pdf_pages_parallel(file_path: str, page_count: int) -> Iterator[str]:
+    """Extract page ranges in worker processes and yield them in order"""
+    step = settings.pdf_pages_per_task
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    workers = min(settings.pdf_max_workers, len(ranges))
+
+    # billiard (Celery's multiprocessing fork) lets daemonic processes start
+    # children, so this also works inside Celery prefork workers, where the
+    # stdlib pools refuse to start.
+    #
+    # The pool lives for one document, and each worker keeps one PdfReader
+    # for all the ranges it extracts, so the file is parsed once per worker.
+    # At most two ranges per worker are in flight, so finished text
+    # waiting to be consumed stays bounded.
+    pool = billiard.get_context("spawn").Pool(processes=workers)
+    try:
+        pending = []
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < workers * 2:
+                start, end = ranges[next_range]
+                pending.append(
+                    pool.apply_async(_extract_pdf_page_range, (file_path, start, end))
+                )
+                next_range += 1
+            yield from pending.pop(0).get()
+    except BaseException:
+        # Failed, or the consumer stopped early: drop the remaining ranges
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+@register_extractor("pypdf", "pdf", priority=10, capabilities=("pages", "parallel"))
+def extract_pdf_pypdf(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """
+    Extract PDF text with pypdf, one unit per page.
+
+    Large PDFs are split into page ranges extracted across a process pool,
+    including from Celery prefork workers; the parent only counts pages.
+    Small PDFs extract serially.
+    """
+    page_count = _pdf_page_count(file_path)
+
+    if page_count < settings.pdf_parallel_page_threshold or settings.pdf_max_workers < 2:
+        pages = (page.extract_text() or "" for page in PdfReader(file_path).pages)
+    else:
+        pages = _iter_pdf_pages_parallel(file_path, page_count)
+
+    for page_number, text in enumerate(pages, 1):
+        yield page_number, text
+
+
+@register_extractor(
+    "pypdfium2", "pdf", priority=5, capabilities=("pages",),
+    is_available=_module_available("pypdfium2"),
+)
+def extract_pdf_pdfium(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """Extract PDF text with PDFium, one unit per page"""
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            try:
+                yield index + 1, textpage.get_text_range().replace("\r\n", "\n")
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+
+
+# DOCX
+
+
+@register_extractor("iterparse", "docx", priority=10, capabilities=("tables", "headers"))
+def extract_docx_iterparse(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """Stream DOCX paragraphs, table rows, headers and footers"""
+    for block in iter_docx_blocks(file_path):
+        yield None, block
+
+
+@register_extractor(
+    "python-docx", "docx", priority=0,
+    is_available=_module_available("docx"),
+)
+def extract_docx_python_docx(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """Body paragraphs only, via the full python-docx object tree"""
+    from docx import Document as DocxDocument
+
+    doc = DocxDocument(file_path)
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            yield None, paragraph.text
+
+
+# Plain text and legacy DOC
+
+
+@register_extractor("blocks", "txt", priority=10, separator="")
+def extract_txt_blocks(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """Read a plain text file in fixed-size blocks"""
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        while block := f.read(TXT_BLOCK_CHARS):
+            yield None, block
+
+
+@register_extractor("docx-or-text", "doc", priority=10, separator="")
+def extract_doc(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """Extract text from legacy DOC format"""
+    # For now, treat as plain text - would need antiword or similar for full support
+    # Most modern DOC files are actually DOCX
+    if zipfile.is_zipfile(file_path):
+        first = True
+        for _, block in extract_docx_iterparse(file_path):
+            yield None, block if first else PAGE_SEPARATOR + block
+            first = False
+    else:
+        yield from extract_txt_blocks(file_path)
@@ -0,0 +1,149 @@
+"""
+Context Budget Service
+Counts tokens and allocates a model's context window across the system
+prompt, retrieved context, conversation history and expected output
+"""
+
+import math
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# Context window sizes (tokens) per model
+MODEL_CONTEXT_WINDOWS = {
+    "claude-sonnet-4-20250514": 200_000,
+    "gpt-4o": 128_000,
+}
+DEFAULT_CONTEXT_WINDOW = 128_000
+
+# Tokens added by the chat format around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Average tokens per English word in scientific prose
+TOKENS_PER_WORD = 1.4
+
+
+@lru_cache()
+def get_tokenizer():
+    """Cached tiktoken encoding, or None if tiktoken is not installed"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text, estimating at 4 chars per token without a tokenizer"""
+    if not text:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return math.ceil(len(text) / 4)
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+def tokens_for_words(words: int, headroom: float = 1.2) -> int:
+    """Output token cap for a target word count, with headroom to finish the last sentence"""
+    return math.ceil(words * TOKENS_PER_WORD * headroom)
+
+
+def fit_texts(parts: List[str], max_tokens: int, separator: str = "") -> List[str]:
+    """
+    Take the longest prefix of parts that fits in max_tokens.
+
+    Parts are assumed to be in priority order, so trimming always drops from
+    the end and gives the same result for the same input.
+    """
+    separator_tokens = count_tokens(separator)
+    kept = []
+    total = 0
+
+    for part in parts:
+        cost = count_tokens(part) + (separator_tokens if kept else 0)
+        if total + cost > max_tokens:
+            break
+        kept.append(part)
+        total += cost
+
+    return kept
+
+
+class ContextBudget:
+    """
+    Allocates a model's context window for one request.
+
+    Parts are reserved in priority order: fixed parts (system prompt, user
+    message) first, then retrieved context up to max_context_tokens, then as
+    much recent history as still fits. Output tokens are reserved up front.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_output_tokens: int = 2048,
+        max_context_tokens: int = 4000,
+        context_window: Optional[int] = None,
+    ):
+        self.model = model
+        self.max_output_tokens = max_output_tokens
+        self.max_context_tokens = max_context_tokens
+        self.context_window = context_window or MODEL_CONTEXT_WINDOWS.get(
+            model, DEFAULT_CONTEXT_WINDOW
+        )
+        self.usage: Dict[str, int] = {}
+
+    @property
+    def used(self) -> int:
+        return sum(self.usage.values())
+
+    @property
+    def remaining(self) -> int:
+        """Input tokens still available after reserving output"""
+        return max(self.context_window - self.max_output_tokens - self.used, 0)
+
+    @property
+    def context_allowance(self) -> int:
+        """Tokens available for retrieved context"""
+        return min(self.max_context_tokens, self.remaining)
+
+    def reserve(self, part: str, text: str) -> int:
+        """Record the token cost of a part that must be sent as-is"""
+        tokens = count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+        self.usage[part] = self.usage.get(part, 0) + tokens
+        return tokens
+
+    def fit_context(self, parts: List[str], separator: str = "\n\n---\n\n") -> str:
+        """Join as many context parts as fit in the context allowance"""
+        kept = fit_texts(parts, self.context_allowance, separator)
+        context = separator.join(kept)
+        self.usage["context"] = self.usage.get("context", 0) + count_tokens(context)
+        return context
+
+    def fit_history(self, history: Optional[List[dict]]) -> Optional[List[dict]]:
+        """
+        Keep the most recent history messages that fit in the remaining budget.
+
+        Older messages are dropped first. The kept history always starts with
+        a user message so providers accept it.
+        """
+        if not history:
+            return history
+
+        available = self.remaining
+        kept = []
+        total = 0
+
+        for msg in reversed(history):
+            cost = count_tokens(msg["content"]) + MESSAGE_OVERHEAD_TOKENS
+            if total + cost > available:
+                break
+            kept.append(msg)
+            total += cost
+
+        kept.reverse()
+        while kept and kept[0]["role"] != "user":
+            total -= count_tokens(kept[0]["content"]) + MESSAGE_OVERHEAD_TOKENS
+            kept.pop(0)
+
+        self.usage["history"] = self.usage.get("history", 0) + total
+        return kept
@@ -3,7 +3,7 @@ Chat Service
 Handles Q&A with RAG using Claude or OpenAI
 """
 
-from typing import Optional, List, AsyncGenerator
+from typing import Optional, List, AsyncGenerator, Tuple
 from uuid import UUID
 
 from anthropic import AsyncAnthropic
@@ -11,14 +11,49 @@ from openai import AsyncOpenAI
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
-from app.services.search import SearchService
+from app.services.budget import ContextBudget
+from app.services.fake_providers import FakeLLM
+from app.services.search import SearchService, SearchResult
 
 settings = get_settings()
 
+# Approximate pricing in USD per million tokens: (input, output)
+MODEL_PRICING = {
+    "claude": (3, 15),  # Sonnet
+    "gpt-4o": (5, 15),
+    "fake": (0, 0),
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Approximate request cost in USD from token usage"""
+    input_price, output_price = next(
+        (price for prefix, price in MODEL_PRICING.items() if model.startswith(prefix)),
+        MODEL_PRICING["gpt-4o"],
+    )
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def _record_usage(usage: Optional[dict], model: str, prompt_tokens: int, completion_tokens: int):
+    """Fill a caller-supplied usage dict at the end of a stream"""
+    if usage is None:
+        return
+    usage.update({
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost": estimate_cost(model, prompt_tokens, completion_tokens),
+    })
+
 
 class ChatService:
     """RAG-powered chat service"""
 
+    ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
+    OPENAI_MODEL = "gpt-4o"
+    MAX_OUTPUT_TOKENS = 2048
+    MAX_CONTEXT_TOKENS = 4000
+
     def __init__(self, db: Optional[AsyncSession] = None):
         self.db = db
         self.search_service = SearchService(db) if db else None
@@ -26,6 +61,11 @@ class ChatService:
         # Initialize LLM clients
         self.anthropic_client: Optional[AsyncAnthropic] = None
         self.openai_client: Optional[AsyncOpenAI] = None
+        self.fake_llm: Optional[FakeLLM] = None
+
+        if settings.llm_provider == "fake":
+            self.fake_llm = FakeLLM()
+            return
 
         if settings.anthropic_api_key:
             self.anthropic_client = AsyncAnthropic(api_key=settings.anthropic_api_key)
@@ -50,11 +90,46 @@ Instructions:
 - Be concise but thorough
 - Use scientific writing style appropriate for grant proposals"""
 
+    def _active_model(self) -> str:
+        """Model that chat() and chat_stream() will use"""
+        if self.fake_llm:
+            return self.fake_llm.model
+        return self.ANTHROPIC_MODEL if self.anthropic_client else self.OPENAI_MODEL
+
+    def _build_prompt(
+        self,
+        message: str,
+        results: List[SearchResult],
+        history: Optional[List[dict]],
+    ) -> Tuple[str, Optional[List[dict]]]:
+        """
+        Fit context and history into the active model's context window.
+
+        Returns:
+            (system_prompt, trimmed history)
+        """
+        budget = ContextBudget(
+            self._active_model(),
+            max_output_tokens=self.MAX_OUTPUT_TOKENS,
+            max_context_tokens=self.MAX_CONTEXT_TOKENS,
+        )
+        budget.reserve("system", self._get_system_prompt(""))
+        budget.reserve("message", message)
+
+        context = self.search_service.format_context(
+            results, max_tokens=budget.context_allowance
+        )
+        budget.reserve("context", context)
+        history = budget.fit_history(history)
+
+        return self._get_system_prompt(context if context else "No documents loaded yet."), history
+
     async def chat(
         self,
         message: str,
         project_id: Optional[UUID] = None,
         history: Optional[List[dict]] = None,
+        search_results: Optional[List[SearchResult]] = None,
     ) -> str:
         """
         Process a chat message with RAG.
@@ -63,19 +138,20 @@ Instructions:
             message: User's message
             project_id: Optional project for context filtering
             history: Optional conversation history
+            search_results: Pre-fetched retrieval results to use as context
 
         Returns:
             Assistant's response
         """
         # Get relevant context
-        context = await self.search_service.get_context_for_query(
-            message, project_id=project_id
-        )
-
-        system_prompt = self._get_system_prompt(context if context else "No documents loaded yet.")
+        if search_results is None:
+            search_results = await self.retrieve(message, project_id=project_id)
+        system_prompt, history = self._build_prompt(message, search_results, history)
 
         # Prefer Claude, fallback to OpenAI
-        if self.anthropic_client:
+        if self.fake_llm:
+            return await self._chat_fake(system_prompt, message, history)
+        elif self.anthropic_client:
             return await self._chat_anthropic(system_prompt, message, history)
         elif self.openai_client:
             return await self._chat_openai(system_prompt, message, history)
@@ -98,8 +174,8 @@ Instructions:
         messages.append({"role": "user", "content": message})
 
         response = await self.anthropic_client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=2048,
+            model=self.ANTHROPIC_MODEL,
+            max_tokens=self.MAX_OUTPUT_TOKENS,
             system=system_prompt,
             messages=messages,
         )
@@ -122,42 +198,102 @@ Instructions:
         messages.append({"role": "user", "content": message})
 
         response = await self.openai_client.chat.completions.create(
-            model="gpt-4o",
+            model=self.OPENAI_MODEL,
             messages=messages,
-            max_tokens=2048,
+            max_tokens=self.MAX_OUTPUT_TOKENS,
         )
 
         return response.choices[0].message.content
 
+    def _build_messages(
+        self, system_prompt: str, message: str, history: Optional[List[dict]]
+    ) -> List[dict]:
+        """Build an OpenAI-style message list"""
+        messages = [{"role": "system", "content": system_prompt}]
+
+        if history:
+            for msg in history:
+                messages.append({
+                    "role": msg["role"],
+                    "content": msg["content"],
+                })
+
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    async def _chat_fake(
+        self, system_prompt: str, message: str, history: Optional[List[dict]]
+    ) -> str:
+        """Chat using the offline fake LLM"""
+        messages = self._build_messages(system_prompt, message, history)
+        response = await self.fake_llm.complete(messages, max_tokens=self.MAX_OUTPUT_TOKENS)
+        return response["content"]
+
+    async def _stream_fake(
+        self,
+        system_prompt: str,
+        message: str,
+        history: Optional[List[dict]],
+        usage: Optional[dict] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Stream using the offline fake LLM"""
+        messages = self._build_messages(system_prompt, message, history)
+        parts = []
+        async for text in self.fake_llm.stream(messages, max_tokens=self.MAX_OUTPUT_TOKENS):
+            parts.append(text)
+            yield text
+
+        fake_usage = self.fake_llm.usage(messages, "".join(parts))
+        _record_usage(
+            usage, self.fake_llm.model, fake_usage["prompt_tokens"], fake_usage["completion_tokens"]
+        )
+
     async def chat_stream(
         self,
         message: str,
         project_id: Optional[UUID] = None,
         history: Optional[List[dict]] = None,
+        search_results: Optional[List[SearchResult]] = None,
+        usage: Optional[dict] = None,
     ) -> AsyncGenerator[str, None]:
         """
         Stream chat response.
 
+        Args:
+            message: User's message
+            project_id: Optional project for context filtering
+            history: Optional conversation history
+            search_results: Pre-fetched retrieval results; when given, they are
+                used as context instead of searching again
+            usage: Optional dict filled with model, token usage and cost from
+                the provider's stream metadata once the stream ends
+
         Yields:
             Chunks of the response text
         """
-        context = await self.search_service.get_context_for_query(
-            message, project_id=project_id
-        )
+        if search_results is None:
+            search_results = await self.retrieve(message, project_id=project_id)
 
-        system_prompt = self._get_system_prompt(context if context else "No documents loaded yet.")
+        system_prompt, history = self._build_prompt(message, search_results, history)
 
-        if self.anthropic_client:
-            async for chunk in self._stream_anthropic(system_prompt, message, history):
+        if self.fake_llm:
+            async for chunk in self._stream_fake(system_prompt, message, history, usage):
+                yield chunk
+        elif self.anthropic_client:
+            async for chunk in self._stream_anthropic(system_prompt, message, history, usage):
                 yield chunk
         elif self.openai_client:
-            async for chunk in self._stream_openai(system_prompt, message, history):
+            async for chunk in self._stream_openai(system_prompt, message, history, usage):
                 yield chunk
         else:
             yield "No LLM API key configured."
 
     async def _stream_anthropic(
-        self, system_prompt: str, message: str, history: Optional[List[dict]]
+        self,
+        system_prompt: str,
+        message: str,
+        history: Optional[List[dict]],
+        usage: Optional[dict] = None,
     ) -> AsyncGenerator[str, None]:
         """Stream using Claude"""
         messages = []
@@ -172,16 +308,28 @@ Instructions:
         messages.append({"role": "user", "content": message})
 
         async with self.anthropic_client.messages.stream(
-            model="claude-sonnet-4-20250514",
-            max_tokens=2048,
+            model=self.ANTHROPIC_MODEL,
+            max_tokens=self.MAX_OUTPUT_TOKENS,
             system=system_prompt,
             messages=messages,
         ) as stream:
             async for text in stream.text_stream:
                 yield text
 
+            final_message = await stream.get_final_message()
+            _record_usage(
+                usage,
+                self.ANTHROPIC_MODEL,
+                final_message.usage.input_tokens,
+                final_message.usage.output_tokens,
+            )
+
     async def _stream_openai(
-        self, system_prompt: str, message: str, history: Optional[List[dict]]
+        self,
+        system_prompt: str,
+        message: str,
+        history: Optional[List[dict]],
+        usage: Optional[dict] = None,
     ) -> AsyncGenerator[str, None]:
         """Stream using OpenAI"""
         messages = [{"role": "system", "content": system_prompt}]
@@ -196,19 +344,46 @@ Instructions:
         messages.append({"role": "user", "content": message})
 
         stream = await self.openai_client.chat.completions.create(
-            model="gpt-4o",
+            model=self.OPENAI_MODEL,
             messages=messages,
-            max_tokens=2048,
+            max_tokens=self.MAX_OUTPUT_TOKENS,
             stream=True,
+            stream_options={"include_usage": True},
         )
 
         async for chunk in stream:
-            if chunk.choices[0].delta.content:
+            # The usage trailer arrives as a final chunk with no choices
+            if chunk.usage:
+                _record_usage(
+                    usage,
+                    self.OPENAI_MODEL,
+                    chunk.usage.prompt_tokens,
+                    chunk.usage.completion_tokens,
+                )
+            if chunk.choices and chunk.choices[0].delta.content:
                 yield chunk.choices[0].delta.content
 
+    async def retrieve(
+        self,
+        message: str,
+        project_id: Optional[UUID] = None,
+        limit: int = 10,
+    ) -> List[SearchResult]:
+        """
+        Retrieve context chunks for a message.
+
+        Lets streaming callers announce sources and reuse the same results
+        as context, instead of searching twice.
+        """
+        return await self.search_service.search(message, project_id=project_id, limit=limit)
+
     def is_available(self) -> bool:
         """Check if chat service is available"""
-        return self.anthropic_client is not None or self.openai_client is not None
+        return (
+            self.anthropic_client is not None
+            or self.openai_client is not None
+            or self.fake_llm is not None
+        )
 
     async def generate(
         self,
@@ -238,6 +413,11 @@ Instructions:
             else:
                 user_messages.append(msg)
 
+        # Fake provider overrides the model for offline load testing
+        if self.fake_llm:
+            response = await self.fake_llm.complete(messages, max_tokens=max_tokens)
+            return {**response, "cost": 0.0}
+
         # Use Claude if model starts with 'claude', otherwise try OpenAI
         if model.startswith("claude") and self.anthropic_client:
             response = await self.anthropic_client.messages.create(
@@ -251,8 +431,7 @@ Instructions:
             # Calculate cost (approximate)
             prompt_tokens = response.usage.input_tokens
             completion_tokens = response.usage.output_tokens
-            # Claude pricing: $3/M input, $15/M output for Sonnet
-            cost = (prompt_tokens * 3 + completion_tokens * 15) / 1_000_000
+            cost = estimate_cost(model, prompt_tokens, completion_tokens)
 
             return {
                 "content": response.content[0].text,
@@ -277,11 +456,10 @@ Instructions:
                 temperature=temperature,
             )
 
-            # Calculate cost (approximate for gpt-4o)
+            # Calculate cost (approximate)
             prompt_tokens = response.usage.prompt_tokens
             completion_tokens = response.usage.completion_tokens
-            # GPT-4o pricing: $5/M input, $15/M output
-            cost = (prompt_tokens * 5 + completion_tokens * 15) / 1_000_000
+            cost = estimate_cost(response.model, prompt_tokens, completion_tokens)
 
             return {
                 "content": response.choices[0].message.content,
@@ -0,0 +1,118 @@
+"""
+Document Deduplication Service
+Reuses chunks and embeddings of an identical, already-processed upload
+"""
+
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import ChunkSignature, Document, DocumentChunk, ProcessingStatus
+from app.services.near_duplicates import band_keys
+
+
+CLONE_CHUNKS_SQL = text("""
+    INSERT INTO document_chunks (
+        id, document_id, chunk_index, content, start_char, end_char,
+        word_count, token_count, content_hash, embedding, page_number, section,
+        metadata_json, duplicate_of, created_at
+    )
+    SELECT
+        gen_random_uuid(), :target_id, chunk_index, content, start_char, end_char,
+        word_count, token_count, content_hash, embedding, page_number, section,
+        metadata_json, coalesce(duplicate_of, id), now()
+    FROM document_chunks
+    WHERE document_id = :source_id
+""")
+
+CLONE_TEXT_FRAMES_SQL = text("""
+    INSERT INTO document_text_frames (document_id, frame_index, start_char, end_char, data)
+    SELECT :target_id, frame_index, start_char, end_char, data
+    FROM document_text_frames
+    WHERE document_id = :source_id
+""")
+
+# Cloned chunks with the signature of the source group they point to
+CLONED_GROUPS_SQL = text("""
+    SELECT c.id, c.duplicate_of, s.minhash
+    FROM document_chunks c
+    JOIN chunk_signatures s ON s.chunk_id = c.duplicate_of
+    WHERE c.document_id = :target_id
+    ORDER BY c.chunk_index
+""")
+
+
+async def find_processed_duplicate(db: AsyncSession, file_hash: str) -> Optional[Document]:
+    """Most recent completed document with the same content hash"""
+    result = await db.execute(
+        select(Document)
+        .where(
+            Document.file_hash == file_hash,
+            Document.processing_status == ProcessingStatus.COMPLETED,
+        )
+        .order_by(Document.created_at.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def clone_processed_document(db: AsyncSession, source: Document, target: Document) -> int:
+    """
+    Copy extraction results, chunks and embeddings from source to target.
+
+    Text frames and chunks are copied server-side with INSERT ... SELECT, so
+    no text or vectors round-trip through the API process. The copies are
+    marked as duplicates of the source chunks, so search shows one of them.
+    When the target is in another project, the copies are indexed there
+    instead (see _index_in_project).
+
+    Returns:
+        Number of chunks copied
+    """
+    target.page_count = source.page_count
+    target.word_count = source.word_count
+    target.extracted_text = source.extracted_text
+    target.metadata_json = {**(source.metadata_json or {}), "deduplicated_from": str(source.id)}
+    target.processing_status = ProcessingStatus.COMPLETED
+    await db.flush()
+
+    params = {"source_id": source.id, "target_id": target.id}
+    await db.execute(CLONE_TEXT_FRAMES_SQL, params)
+    result = await db.execute(CLONE_CHUNKS_SQL, params)
+
+    if target.project_id is not None and target.project_id != source.project_id:
+        await _index_in_project(db, target)
+    return result.rowcount
+
+
+async def _index_in_project(db: AsyncSession, target: Document):
+    """
+    Make a cross-project clone's chunks canonical in the target's project.
+
+    Near-duplicate groups and the signature index are per project, so the
+    first copy in each source group takes over the group's signature, keyed
+    for the target's project, and the other copies point to it.
+    """
+    rows = (await db.execute(CLONED_GROUPS_SQL, {"target_id": target.id})).all()
+    if not rows:
+        return
+
+    canonical = {}
+    relinks, signatures = [], []
+    for chunk_id, group_id, signature in rows:
+        if group_id in canonical:
+            relinks.append({"id": chunk_id, "duplicate_of": canonical[group_id]})
+            continue
+        canonical[group_id] = chunk_id
+        relinks.append({"id": chunk_id, "duplicate_of": None})
+        signatures.append({
+            "chunk_id": chunk_id,
+            "project_id": target.project_id,
+            "minhash": signature,
+            "band_keys": band_keys(target.project_id, signature),
+        })
+
+    await db.execute(update(DocumentChunk), relinks)
+    await db.execute(insert(ChunkSignature), signatures)
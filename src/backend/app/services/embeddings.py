@@ -6,9 +6,11 @@ Generates vector embeddings for text chunks using OpenAI or local models
 from typing import List, Optional
 import asyncio
 
+import httpx
 from openai import AsyncOpenAI
 
 from app.config import get_settings
+from app.services.fake_providers import FakeEmbedder
 
 settings = get_settings()
 
@@ -16,13 +18,17 @@ settings = get_settings()
 class EmbeddingService:
     """Generate embeddings for text using OpenAI or fallback models"""
 
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.openai_client: Optional[AsyncOpenAI] = None
+        self.fake_embedder: Optional[FakeEmbedder] = None
         self.model = "text-embedding-3-small"  # 1536 dims, cheaper than ada-002
         self.dimensions = 768  # Request 768 dims to match our DB schema
 
-        if settings.openai_api_key:
-            self.openai_client = AsyncOpenAI(api_key=settings.openai_api_key)
+        if settings.embedding_provider == "fake":
+            self.fake_embedder = FakeEmbedder(self.dimensions)
+            self.model = self.fake_embedder.model
+        elif settings.openai_api_key:
+            self.openai_client = AsyncOpenAI(api_key=settings.openai_api_key, http_client=http_client)
 
     async def embed_text(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
@@ -34,7 +40,9 @@ class EmbeddingService:
         if not texts:
             return []
 
-        if self.openai_client:
+        if self.fake_embedder:
+            return await self._embed_fake(texts)
+        elif self.openai_client:
             return await self._embed_openai(texts)
         else:
             # Fallback: return zero vectors (embeddings disabled)
@@ -60,9 +68,24 @@ class EmbeddingService:
 
         return all_embeddings
 
+    async def _embed_fake(self, texts: List[str]) -> List[List[float]]:
+        """Generate deterministic offline embeddings, batched like OpenAI"""
+        batch_size = 100
+        all_embeddings = []
+
+        for i in range(0, len(texts), batch_size):
+            all_embeddings.extend(await self.fake_embedder.embed_batch(texts[i : i + batch_size]))
+
+        return all_embeddings
+
     def is_available(self) -> bool:
         """Check if embedding service is available"""
-        return self.openai_client is not None
+        return self.openai_client is not None or self.fake_embedder is not None
+
+    async def close(self):
+        """Close the HTTP connection pool"""
+        if self.openai_client:
+            await self.openai_client.close()
 
 
 # Singleton instance
@@ -75,3 +98,10 @@ def get_embedding_service() -> EmbeddingService:
     if _embedding_service is None:
         _embedding_service = EmbeddingService()
     return _embedding_service
+
+
+def init_embedding_service(http_client: Optional[httpx.AsyncClient] = None) -> EmbeddingService:
+    """Replace the singleton, e.g. with one using a worker's shared HTTP client"""
+    global _embedding_service
+    _embedding_service = EmbeddingService(http_client=http_client)
+    return _embedding_service
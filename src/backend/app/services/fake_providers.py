@@ -0,0 +1,131 @@
+"""
+Fake LLM and Embedding Providers
+Deterministic offline stand-ins for load testing and benchmarks.
+Enabled with LLM_PROVIDER=fake / EMBEDDING_PROVIDER=fake.
+"""
+
+import asyncio
+import hashlib
+import math
+import random
+from typing import AsyncGenerator, List
+
+import httpx
+import openai
+
+from app.config import get_settings
+from app.services.budget import count_tokens
+
+settings = get_settings()
+
+
+CANNED_RESPONSES = [
+    "Based on the provided context, the central hypothesis is supported by the "
+    "preliminary data. To strengthen the Approach section, describe the "
+    "experimental design for each aim, the expected outcomes, potential pitfalls "
+    "and alternative strategies. Reviewers will look for rigor in sample size "
+    "justification and a clear statistical analysis plan.",
+    "The Specific Aims page should open with the problem and its significance, "
+    "identify the gap in knowledge, and state a testable central hypothesis. "
+    "Each aim should be independent yet synergistic, with measurable outcomes "
+    "that together advance the long-term goal of the research program.",
+    "The documents describe a well-defined research question with strong "
+    "clinical relevance. Consider emphasizing what is innovative about the "
+    "methodology compared with prior approaches, and connect the expected "
+    "results to their potential impact on human health.",
+]
+
+
+class FakeRateLimitError(openai.RateLimitError):
+    """Simulated provider 429 response, caught by the same handlers as the real one"""
+
+    def __init__(self, message: str = "Simulated rate limit (429)"):
+        request = httpx.Request("POST", "https://fake-provider.invalid/v1")
+        super().__init__(message, response=httpx.Response(429, request=request), body=None)
+
+
+class FakeTimeoutError(TimeoutError):
+    """Simulated provider request timeout"""
+
+
+class _FaultInjector:
+    """Seeded source of simulated 429s and timeouts"""
+
+    def __init__(self):
+        self._random = random.Random(settings.fake_seed)
+
+    async def maybe_fail(self):
+        roll = self._random.random()
+        if roll < settings.fake_rate_limit_rate:
+            raise FakeRateLimitError()
+        if roll < settings.fake_rate_limit_rate + settings.fake_timeout_rate:
+            await asyncio.sleep(settings.fake_timeout_seconds)
+            raise FakeTimeoutError("Simulated request timeout")
+
+
+class FakeLLM:
+    """Streams canned completions at a configurable pace"""
+
+    model = "fake-llm"
+
+    def __init__(self):
+        self.faults = _FaultInjector()
+
+    def _pick_response(self, messages: List[dict], max_tokens: int) -> List[str]:
+        """Choose a canned response by prompt hash, cut to max_tokens words"""
+        prompt = "\n".join(msg["content"] for msg in messages)
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        words = CANNED_RESPONSES[digest[0] % len(CANNED_RESPONSES)].split()
+        return words[:max_tokens]
+
+    def usage(self, messages: List[dict], completion: str) -> dict:
+        """Token usage for a fake completion"""
+        return {
+            "prompt_tokens": sum(count_tokens(msg["content"]) for msg in messages),
+            "completion_tokens": count_tokens(completion),
+        }
+
+    async def stream(
+        self, messages: List[dict], max_tokens: int = 2048
+    ) -> AsyncGenerator[str, None]:
+        """Yield a canned completion word by word after the configured TTFT"""
+        await self.faults.maybe_fail()
+        await asyncio.sleep(settings.fake_llm_ttft_ms / 1000)
+
+        # 0 tokens/sec means no pacing
+        rate = settings.fake_llm_tokens_per_sec
+        delay = 1 / rate if rate > 0 else 0
+        for i, word in enumerate(self._pick_response(messages, max_tokens)):
+            if i and delay:
+                await asyncio.sleep(delay)
+            yield word if i == 0 else f" {word}"
+
+    async def complete(self, messages: List[dict], max_tokens: int = 2048) -> dict:
+        """Return a full canned completion with usage, paced like a stream"""
+        parts = [part async for part in self.stream(messages, max_tokens)]
+        content = "".join(parts)
+        return {"content": content, "usage": self.usage(messages, content)}
+
+
+class FakeEmbedder:
+    """Hash-seeded deterministic unit-length embeddings"""
+
+    model = "fake-embedding"
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self.faults = _FaultInjector()
+
+    def embed(self, text: str) -> List[float]:
+        """Same text always maps to the same vector"""
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimensions)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch with simulated request latency and faults"""
+        await self.faults.maybe_fail()
+        await asyncio.sleep(settings.fake_embedding_latency_ms / 1000)
+        return [self.embed(text) for text in texts]
@@ -0,0 +1,252 @@
+"""
+Near-Duplicate Chunk Detection
+MinHash signatures with an LSH index per project, so chunks that are
+near-identical to ones already ingested (boilerplate, repeated biosketch
+paragraphs, aims copied across versions) can reuse their embedding and be
+collapsed in search results.
+
+Each chunk's text is reduced to word 3-shingles and a NUM_PERM-value
+MinHash. The signature is cut into BANDS bands of ROWS values; every band
+is hashed together with the project id into a band key. Chunks sharing a
+band key are candidates, confirmed when the estimated Jaccard similarity
+reaches near_duplicate_threshold. With 8 bands of 8 rows, pairs above
+~0.8 similarity almost always share a band.
+
+Only canonical chunks (those that are not duplicates themselves) are
+indexed, so a duplicate always points straight at its canonical chunk.
+When a canonical chunk's document is deleted, one of its duplicates is
+promoted in its place.
+"""
+
+import hashlib
+import random
+import re
+import uuid
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.db.models import ChunkSignature, DocumentChunk
+
+settings = get_settings()
+
+NUM_PERM = 64
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed: signatures are persisted and must match across processes
+_rng = random.Random(0x6772616E74)
+_PERMUTATIONS = [
+    (_rng.randint(1, _MERSENNE_PRIME - 1), _rng.randint(0, _MERSENNE_PRIME - 1))
+    for _ in range(NUM_PERM)
+]
+
+# The permutations as column vectors, a split into 32-bit halves
+_PRIME = np.uint64(_MERSENNE_PRIME)
+_A_HIGH = np.array([a >> 32 for a, _ in _PERMUTATIONS], dtype=np.uint64)[:, None]
+_A_LOW = np.array([a & _MAX_HASH for a, _ in _PERMUTATIONS], dtype=np.uint64)[:, None]
+_B = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def _shingles(text: str) -> List[int]:
+    """32-bit hashes of a text's distinct word shingles"""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return []
+
+    size = min(SHINGLE_WORDS, len(words))
+    return list({
+        _hash64(" ".join(words[i:i + size]).encode("utf-8")) & _MAX_HASH
+        for i in range(len(words) - size + 1)
+    })
+
+
+def minhash(text: str) -> Optional[List[int]]:
+    """MinHash signature of a text's word shingles, or None if it has no words"""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+
+    # (a * shingle + b) mod 2^61 - 1 for every permutation (rows) and
+    # shingle (columns). Products are split on a's 32-bit halves and folded
+    # with 2^61 = 1 (mod 2^61 - 1), so nothing overflows uint64; the sums
+    # are only fully reduced at the end.
+    shingles = np.array(shingles, dtype=np.uint64)
+    low = _A_LOW * shingles
+    low = (low & _PRIME) + (low >> np.uint64(61))
+    high = _A_HIGH * shingles
+    high = (high >> np.uint64(29)) + ((high & np.uint64((1 << 29) - 1)) << np.uint64(32))
+    values = low + high + _B
+    values = (values & _PRIME) + (values >> np.uint64(61))
+    values = np.where(values >= _PRIME, values - _PRIME, values)
+    return values.min(axis=1).tolist()
+
+
+def band_keys(project_id: uuid.UUID, signature: Sequence[int]) -> List[int]:
+    """LSH bucket keys of a signature, scoped to one project"""
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * ROWS:(band + 1) * ROWS]
+        digest = _hash64(f"{project_id}:{band}:{','.join(map(str, values))}".encode())
+        keys.append(digest - (1 << 63))  # Signed, to fit a BIGINT
+    return keys
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Jaccard similarity estimated from two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+class NearDuplicateDetector:
+    """
+    Matches new chunks against a project's indexed chunks.
+
+    Call find() before writing a batch of chunks, then index() once the
+    rows exist, in the same transaction. Chunks found earlier in the same
+    document are matched too.
+
+    Args:
+        db: Sync session (Celery worker or CLI)
+        project_id: Project whose index is searched and extended
+    """
+
+    def __init__(self, db: Session, project_id: uuid.UUID, threshold: Optional[float] = None):
+        self.db = db
+        self.project_id = project_id
+        self.threshold = threshold or settings.near_duplicate_threshold
+        # Band key -> canonical chunks added by this detector, not yet queryable
+        self._local: Dict[int, List[Tuple[uuid.UUID, List[int]]]] = {}
+        self._pending: List[dict] = []
+
+    def find(self, chunks: Sequence[Tuple[uuid.UUID, str]]) -> Dict[uuid.UUID, uuid.UUID]:
+        """
+        Find near-duplicates among (chunk_id, text) pairs.
+
+        Returns:
+            Chunk id -> canonical chunk id, for the chunks that are duplicates.
+            The others are queued as new canonical chunks for index().
+        """
+        signed = []
+        for chunk_id, text in chunks:
+            signature = minhash(text)
+            if signature is not None:
+                signed.append((chunk_id, signature, band_keys(self.project_id, signature)))
+        if not signed:
+            return {}
+
+        candidates = self._load_candidates({key for _, _, keys in signed for key in keys})
+
+        duplicates = {}
+        for chunk_id, signature, keys in signed:
+            best_id, best_score = None, self.threshold
+            for key in keys:
+                for candidate_id, candidate in candidates.get(key, []) + self._local.get(key, []):
+                    score = similarity(signature, candidate)
+                    if score >= best_score:
+                        best_id, best_score = candidate_id, score
+
+            if best_id:
+                duplicates[chunk_id] = best_id
+                continue
+
+            for key in keys:
+                self._local.setdefault(key, []).append((chunk_id, signature))
+            self._pending.append({
+                "chunk_id": chunk_id,
+                "project_id": self.project_id,
+                "minhash": signature,
+                "band_keys": keys,
+            })
+        return duplicates
+
+    def index(self):
+        """Write the canonical chunks found since the last call to the index"""
+        if self._pending:
+            self.db.execute(insert(ChunkSignature), self._pending)
+            self._pending = []
+
+    def _load_candidates(self, keys) -> Dict[int, List[Tuple[uuid.UUID, List[int]]]]:
+        """Indexed chunks sharing any of the band keys, by band key"""
+        rows = self.db.execute(
+            select(ChunkSignature.chunk_id, ChunkSignature.minhash, ChunkSignature.band_keys)
+            .where(ChunkSignature.band_keys.overlap(list(keys)))
+        )
+        candidates: Dict[int, List[Tuple[uuid.UUID, List[int]]]] = {}
+        for chunk_id, signature, row_keys in rows:
+            for key in row_keys:
+                if key in keys:
+                    candidates.setdefault(key, []).append((chunk_id, signature))
+        return candidates
+
+
+# Before a document's chunks are deleted: for each of its canonical chunks
+# with near-duplicates in other documents, the oldest duplicate becomes the
+# canonical chunk, the others point at it, and it takes over the index
+# entry (its signature matched the old one at the threshold, so chunks that
+# would have matched the old canonical still find the group).
+PROMOTE_DUPLICATES_SQL = text("""
+    WITH heirs AS (
+        SELECT DISTINCT ON (d.duplicate_of) d.duplicate_of AS old_id, d.id AS new_id
+        FROM document_chunks d
+        JOIN document_chunks c ON c.id = d.duplicate_of
+        WHERE c.document_id = :document_id AND d.document_id <> :document_id
+        ORDER BY d.duplicate_of, d.created_at, d.id
+    ),
+    relinked AS (
+        UPDATE document_chunks d
+        SET duplicate_of = CASE WHEN d.id = h.new_id THEN NULL ELSE h.new_id END
+        FROM heirs h
+        WHERE d.duplicate_of = h.old_id AND d.document_id <> :document_id
+    )
+    INSERT INTO chunk_signatures (chunk_id, project_id, minhash, band_keys)
+    SELECT h.new_id, s.project_id, s.minhash, s.band_keys
+    FROM heirs h JOIN chunk_signatures s ON s.chunk_id = h.old_id
+    ON CONFLICT (chunk_id) DO NOTHING
+""")
+
+
+async def promote_duplicates(db: AsyncSession, document_id: uuid.UUID):
+    """Hand a document's canonical chunks over to their duplicates before it is deleted"""
+    await db.execute(PROMOTE_DUPLICATES_SQL, {"document_id": document_id})
+
+
+def promote_duplicates_sync(db: Session, document_id: uuid.UUID):
+    """promote_duplicates for sync sessions (Celery workers, CLI)"""
+    db.execute(PROMOTE_DUPLICATES_SQL, {"document_id": document_id})
+
+
+def get_detector(db: Session, project_id: Optional[uuid.UUID]) -> Optional[NearDuplicateDetector]:
+    """A detector for the project, or None when detection is off or there is no project"""
+    if not settings.near_duplicate_detection or project_id is None:
+        return None
+    return NearDuplicateDetector(db, project_id)
+
+
+def load_canonical_embeddings(
+    db: Session, chunk_ids: Iterable[uuid.UUID]
+) -> Dict[uuid.UUID, List[float]]:
+    """Embeddings of the canonical chunks that near-duplicates point to"""
+    chunk_ids = list(chunk_ids)
+    if not chunk_ids:
+        return {}
+    rows = db.execute(
+        select(DocumentChunk.id, DocumentChunk.embedding).where(
+            DocumentChunk.id.in_(chunk_ids),
+            DocumentChunk.embedding.isnot(None),
+        )
+    )
+    return {chunk_id: embedding for chunk_id, embedding in rows}
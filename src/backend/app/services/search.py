@@ -9,7 +9,14 @@ from uuid import UUID
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.services.budget import fit_texts
 from app.services.embeddings import get_embedding_service
+from app.services.text_store import materialize_chunks
+
+
+# Candidates fetched per requested result, to fill top-k after collapsing
+# near-duplicate chunks into one result
+DUPLICATE_OVERFETCH = 3
 
 
 class SearchResult:
@@ -84,7 +91,10 @@ class SearchService:
                 dc.id as chunk_id,
                 dc.document_id,
                 dc.content,
+                dc.start_char,
+                dc.end_char,
                 dc.chunk_index,
+                coalesce(dc.duplicate_of, dc.id) as canonical_id,
                 d.original_filename,
                 1 - (dc.embedding <=> :query_embedding::vector) as score
             FROM document_chunks dc
@@ -92,7 +102,11 @@ class SearchService:
             WHERE dc.embedding IS NOT NULL
         """
 
-        params = {"query_embedding": str(query_embedding), "limit": limit}
+        # Over-fetch so collapsed near-duplicates don't leave the results short
+        params = {
+            "query_embedding": str(query_embedding),
+            "limit": limit * DUPLICATE_OVERFETCH,
+        }
 
         # Add filters
         if project_id:
@@ -115,13 +129,27 @@ class SearchService:
             return []
 
         result = await session.execute(text(sql), params)
-        rows = result.fetchall()
+        rows = []
+        seen = set()
+        for row in result.fetchall():
+            # Keep the best-scoring copy of each near-duplicate group
+            if row.canonical_id not in seen:
+                seen.add(row.canonical_id)
+                rows.append(row)
+        rows = rows[:limit]
+
+        # Offset-referenced chunks (chunk_storage = "offsets") have no stored content
+        materialized = await materialize_chunks(session, (
+            (row.chunk_id, row.document_id, row.start_char, row.end_char)
+            for row in rows
+            if row.content is None
+        ))
 
         return [
             SearchResult(
                 chunk_id=row.chunk_id,
                 document_id=row.document_id,
-                content=row.content,
+                content=row.content if row.content is not None else materialized[row.chunk_id],
                 score=float(row.score),
                 chunk_index=row.chunk_index,
                 document_filename=row.original_filename,
@@ -142,27 +170,33 @@ class SearchService:
         Args:
             query: User's question
             project_id: Optional project filter
-            max_tokens: Approximate max tokens for context
+            max_tokens: Max tokens for context
             limit: Max chunks to retrieve
 
         Returns:
             Formatted context string
         """
         results = await self.search(query, project_id=project_id, limit=limit)
+        return self.format_context(results, max_tokens=max_tokens)
 
-        if not results:
-            return ""
+    def format_context(self, results: List[SearchResult], max_tokens: int = 4000) -> str:
+        """
+        Format search results as LLM context.
 
-        context_parts = []
-        total_chars = 0
-        char_limit = max_tokens * 4  # Rough estimate: 4 chars per token
+        Args:
+            results: Search results, most relevant first
+            max_tokens: Max tokens for context; lower-ranked chunks are dropped first
 
-        for result in results:
-            if total_chars + len(result.content) > char_limit:
-                break
+        Returns:
+            Formatted context string
+        """
+        if not results:
+            return ""
 
-            source_info = f"[Source: {result.document_filename}, chunk {result.chunk_index + 1}]"
-            context_parts.append(f"{source_info}\n{result.content}")
-            total_chars += len(result.content)
+        separator = "\n\n---\n\n"
+        context_parts = [
+            f"[Source: {result.document_filename}, chunk {result.chunk_index + 1}]\n{result.content}"
+            for result in results
+        ]
 
-        return "\n\n---\n\n".join(context_parts)
+        return separator.join(fit_texts(context_parts, max_tokens, separator))
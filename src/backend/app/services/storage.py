@@ -0,0 +1,312 @@
+"""
+Blob Storage
+Content-addressed storage for uploaded files. Blobs are keyed by SHA-256,
+so identical uploads share one stored copy. The blobs table counts the
+documents that reference each blob; a background reaper deletes blobs
+nobody references any more.
+
+Backends:
+    local: files under upload_dir/blobs, sharded by hash prefix
+        (blobs/ab/cd/abcd...), so no directory grows past a few thousand
+        entries
+    s3: any S3-compatible object store (requires boto3)
+
+A document's file_path holds its blob location: a filesystem path for the
+local backend, s3://bucket/key for S3. Legacy flat upload paths keep
+working as local locations.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.db.database import async_session_maker
+
+settings = get_settings()
+
+
+class BlobStore(ABC):
+    """Interface shared by storage backends"""
+
+    @abstractmethod
+    def location_for(self, file_hash: str) -> str:
+        """Where the blob with this hash is stored"""
+
+    @abstractmethod
+    def put(self, src_path: str, file_hash: str, move: bool = True) -> str:
+        """
+        Store a local file as the blob for its hash.
+
+        The blob is always rewritten, so a put racing a reaper delete still
+        leaves the content in place. With move=True the source file is
+        consumed.
+
+        Returns:
+            The blob location
+        """
+
+    @abstractmethod
+    def delete(self, location: str):
+        """Delete a blob; missing blobs are ignored"""
+
+    @abstractmethod
+    @contextmanager
+    def local_path(self, location: str) -> Iterator[str]:
+        """A local filesystem path with the blob's content, for extractors"""
+
+    def temp_dir(self) -> str:
+        """Directory for uploads in progress, on the same filesystem as local blobs"""
+        path = os.path.join(settings.upload_dir, "tmp")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def sweep_temp(self, max_age_seconds: float) -> int:
+        """Remove abandoned in-progress uploads"""
+        removed = 0
+        cutoff = time.time() - max_age_seconds
+        with os.scandir(self.temp_dir()) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+        return removed
+
+
+class LocalBlobStore(BlobStore):
+    """Hash-prefix-sharded blobs on the local filesystem"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def location_for(self, file_hash: str) -> str:
+        return os.path.join(self.root, file_hash[:2], file_hash[2:4], file_hash)
+
+    def put(self, src_path: str, file_hash: str, move: bool = True) -> str:
+        location = self.location_for(file_hash)
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        if move:
+            os.replace(src_path, location)
+        else:
+            # Copy beside the target, then rename, so readers never see a partial blob
+            fd, temp_path = tempfile.mkstemp(dir=self.temp_dir(), suffix=".part")
+            os.close(fd)
+            shutil.copyfile(src_path, temp_path)
+            os.replace(temp_path, location)
+        return location
+
+    def delete(self, location: str):
+        try:
+            os.remove(location)
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def local_path(self, location: str) -> Iterator[str]:
+        yield location
+
+
+class S3BlobStore(BlobStore):
+    """Blobs in an S3-compatible bucket (AWS, MinIO, R2, ...)"""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "blobs",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+    ):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("storage_backend 's3' requires boto3")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client(
+            "s3", endpoint_url=endpoint_url or None, region_name=region or None
+        )
+
+    def _key(self, location: str) -> str:
+        return location.removeprefix(f"s3://{self.bucket}/")
+
+    def location_for(self, file_hash: str) -> str:
+        return f"s3://{self.bucket}/{self.prefix}/{file_hash[:2]}/{file_hash[2:4]}/{file_hash}"
+
+    def put(self, src_path: str, file_hash: str, move: bool = True) -> str:
+        location = self.location_for(file_hash)
+        self.client.upload_file(src_path, self.bucket, self._key(location))
+        if move:
+            os.remove(src_path)
+        return location
+
+    def delete(self, location: str):
+        if not location.startswith("s3://"):
+            # Legacy local upload
+            LocalBlobStore(settings.upload_dir).delete(location)
+            return
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(location))
+
+    @contextmanager
+    def local_path(self, location: str) -> Iterator[str]:
+        if not location.startswith("s3://"):
+            yield location
+            return
+
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_dir(), suffix=".download")
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self._key(location), temp_path)
+            yield temp_path
+        finally:
+            os.remove(temp_path)
+
+
+@lru_cache()
+def get_blob_store() -> BlobStore:
+    """The configured storage backend"""
+    if settings.storage_backend == "s3":
+        return S3BlobStore(
+            bucket=settings.s3_bucket,
+            prefix=settings.s3_prefix,
+            endpoint_url=settings.s3_endpoint_url,
+            region=settings.s3_region,
+        )
+    return LocalBlobStore(os.path.join(settings.upload_dir, "blobs"))
+
+
+# Reference counting. Acquire takes the blob row's lock until the caller's
+# transaction commits, so the reaper (which locks with SKIP LOCKED and
+# re-checks the count) can never delete a blob that is being re-referenced.
+
+ACQUIRE_BLOB_SQL = text("""
+    INSERT INTO blobs (hash, location, size, refcount, created_at)
+    VALUES (:hash, :location, :size, 1, now())
+    ON CONFLICT (hash) DO UPDATE
+    SET refcount = blobs.refcount + 1, location = EXCLUDED.location, orphaned_at = NULL
+    RETURNING refcount
+""")
+
+RELEASE_BLOB_SQL = text("""
+    UPDATE blobs
+    SET refcount = refcount - 1,
+        orphaned_at = CASE WHEN refcount - 1 <= 0 THEN now() ELSE NULL END
+    WHERE hash = :hash
+""")
+
+# An unreferenced row, already orphaned, for a blob written before the
+# document that will reference it is committed
+STAGE_BLOB_SQL = text("""
+    INSERT INTO blobs (hash, location, size, refcount, orphaned_at, created_at)
+    VALUES (:hash, :location, :size, 0, now(), now())
+    ON CONFLICT (hash) DO UPDATE
+    SET location = EXCLUDED.location,
+        orphaned_at = CASE WHEN blobs.refcount <= 0 THEN now() ELSE NULL END
+    RETURNING refcount
+""")
+
+# :skip holds blobs whose delete already failed in this run
+CLAIM_ORPHANS_SQL = text("""
+    SELECT hash, location FROM blobs
+    WHERE refcount <= 0 AND orphaned_at < now() - make_interval(secs => :grace)
+      AND hash <> ALL(CAST(:skip AS varchar[]))
+    ORDER BY orphaned_at
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+""")
+
+DELETE_BLOB_ROW_SQL = text("DELETE FROM blobs WHERE hash = :hash")
+
+
+def _acquire_params(file_hash: str, size: int) -> dict:
+    return {
+        "hash": file_hash,
+        "location": get_blob_store().location_for(file_hash),
+        "size": size,
+    }
+
+
+def _store_blob(shared: bool, src_path: str, file_hash: str, move: bool) -> str:
+    """Write the blob unless another document already holds it"""
+    store = get_blob_store()
+    if shared:
+        # Already stored and referenced, so the reaper can't be deleting it
+        if move:
+            os.remove(src_path)
+        return store.location_for(file_hash)
+    return store.put(src_path, file_hash, move=move)
+
+
+async def stage_blob(src_path: str, file_hash: str, size: int, move: bool = True) -> str:
+    """
+    Store an upload as a blob before any document references it.
+
+    stage_blob_sync for the API. The orphaned blob row is committed in a
+    session of its own, so the caller's transaction (possibly a whole batch
+    of documents) isn't committed early. Reference the blob with
+    reference_blob in the transaction that creates the document.
+
+    Returns:
+        The blob location, to save as the document's file_path
+    """
+    async with async_session_maker() as db:
+        result = await db.execute(STAGE_BLOB_SQL, _acquire_params(file_hash, size))
+        refcount = result.scalar_one()
+        await db.commit()
+    return await run_in_threadpool(_store_blob, refcount > 0, src_path, file_hash, move)
+
+
+async def reference_blob(db: AsyncSession, file_hash: str, size: int):
+    """Add a document's reference to a blob written with stage_blob (not committed)"""
+    await db.execute(ACQUIRE_BLOB_SQL, _acquire_params(file_hash, size))
+
+
+def stage_blob_sync(
+    db: Session, src_path: str, file_hash: str, size: int, move: bool = False
+) -> str:
+    """
+    Store src_path as a blob before any document references it (commits).
+
+    The blob row is committed first, unreferenced and already orphaned, and
+    the file is written after it. If the transaction meant to reference the
+    blob rolls back, the reaper deletes the file after the grace period
+    instead of it being left behind with no row. Reference it with
+    reference_blob_sync in that transaction.
+
+    Returns:
+        The blob location, to save as the document's file_path
+    """
+    refcount = db.execute(STAGE_BLOB_SQL, _acquire_params(file_hash, size)).scalar_one()
+    db.commit()
+    return _store_blob(refcount > 0, src_path, file_hash, move)
+
+
+def reference_blob_sync(db: Session, file_hash: str, size: int):
+    """Add a document's reference to a blob written with stage_blob_sync (not committed)"""
+    db.execute(ACQUIRE_BLOB_SQL, _acquire_params(file_hash, size))
+
+
+async def release_blob(db: AsyncSession, file_hash: str, location: str):
+    """
+    Drop a document's reference to its blob.
+
+    The blob itself is deleted later by the reaper. Files stored before
+    blobs were tracked have no row and are deleted right away, off the
+    event loop.
+    """
+    result = await db.execute(RELEASE_BLOB_SQL, {"hash": file_hash})
+    if result.rowcount == 0 and location:
+        try:
+            await run_in_threadpool(get_blob_store().delete, location)
+        except Exception:
+            pass  # Log but don't fail
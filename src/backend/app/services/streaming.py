@@ -0,0 +1,63 @@
+"""
+Streaming helpers
+Coalesces LLM token streams into larger frames for WebSocket/HTTP delivery
+and formats Server-Sent Events
+"""
+
+import json
+import time
+from typing import Any, AsyncIterable, AsyncGenerator
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+async def coalesce_tokens(
+    tokens: AsyncIterable[str],
+    max_chars: int = None,
+    max_interval_ms: int = None,
+) -> AsyncGenerator[str, None]:
+    """
+    Group small token deltas into frames.
+
+    A frame is flushed once it reaches max_chars, or once max_interval_ms
+    has passed since the last flush. Whatever is buffered when the token
+    stream ends is flushed as the last frame.
+
+    Args:
+        tokens: Async iterable of text deltas from the LLM
+        max_chars: Flush when the buffer reaches this many characters
+        max_interval_ms: Flush when this much time has passed since the last flush
+
+    Yields:
+        Coalesced text frames
+    """
+    max_chars = max_chars or settings.chat_stream_flush_chars
+    max_interval = (max_interval_ms or settings.chat_stream_flush_ms) / 1000
+
+    buffer: list[str] = []
+    buffered_chars = 0
+    last_flush = time.monotonic()
+
+    async for token in tokens:
+        if not token:
+            continue
+
+        buffer.append(token)
+        buffered_chars += len(token)
+
+        now = time.monotonic()
+        if buffered_chars >= max_chars or now - last_flush >= max_interval:
+            yield "".join(buffer)
+            buffer.clear()
+            buffered_chars = 0
+            last_flush = now
+
+    if buffer:
+        yield "".join(buffer)
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event with a JSON data payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
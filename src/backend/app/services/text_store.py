@@ -0,0 +1,303 @@
+"""
+Extracted Text Store
+Keeps a document's extracted text zstd-compressed in frames of about
+FRAME_CHARS characters, so any range or page can be read by decompressing
+only the frames it overlaps.
+
+Frames start on page boundaries where the document has pages: small pages
+are packed together and a page only straddles frames when it is larger
+than a frame on its own. Offsets are character offsets into the text, the
+same ones chunks and page_offsets use.
+
+With chunk_storage = "offsets", chunk rows keep only start_char/end_char
+and their text is materialized from the frames here, through a small LRU
+of recently read chunks.
+"""
+
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import zstandard
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.db.models import DocumentTextFrame
+from app.processors.chunking import Segment
+from app.processors.document_processor import ExtractionResult
+
+settings = get_settings()
+
+# Target characters per frame
+FRAME_CHARS = 64 * 1024
+
+ZSTD_LEVEL = 3
+
+# Frames fetched per round trip when streaming a document back
+FRAME_FETCH_SIZE = 4
+
+
+class TextFrameWriter:
+    """
+    Compresses streamed text segments into frames as they arrive.
+
+    At most one frame of text is buffered, and each frame is inserted as
+    soon as it is complete, so storing a document never needs its whole
+    text in memory. Page offsets are recorded along the way. The caller
+    commits.
+
+    Args:
+        db: Sync session (Celery worker or CLI)
+        document_id: Document whose stored text is replaced
+    """
+
+    def __init__(self, db: Session, document_id: UUID):
+        self.db = db
+        self.document_id = document_id
+        self.length = 0  # Characters written so far
+        self.page_offsets: List[int] = []
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        self._parts: List[str] = []
+        self._buffered = 0
+        self._index = 0
+        db.execute(delete(DocumentTextFrame).where(DocumentTextFrame.document_id == document_id))
+
+    def write(self, page_number: Optional[int], text: str):
+        """Append one segment; a page number marks the start of a page"""
+        if page_number is not None:
+            self.page_offsets.append(self.length)
+            # Start the page in a new frame unless it fits in the current one
+            if self._buffered and self._buffered + len(text) > FRAME_CHARS:
+                self._flush(self._buffered)
+
+        self._parts.append(text)
+        self._buffered += len(text)
+        self.length += len(text)
+        # A page larger than a frame is split at fixed offsets
+        while self._buffered > FRAME_CHARS:
+            self._flush(FRAME_CHARS)
+
+    def close(self):
+        """Write the last partial frame"""
+        if self._buffered:
+            self._flush(self._buffered)
+
+    def _flush(self, size: int):
+        buffered = "".join(self._parts)
+        text, rest = buffered[:size], buffered[size:]
+        start = self.length - len(buffered)
+        self.db.execute(insert(DocumentTextFrame), [{
+            "document_id": self.document_id,
+            "frame_index": self._index,
+            "start_char": start,
+            "end_char": start + len(text),
+            "data": self._compressor.compress(text.encode("utf-8")),
+        }])
+        self._index += 1
+        self._parts = [rest] if rest else []
+        self._buffered = len(rest)
+
+
+def save_text(db: Session, document_id: UUID, text: str, page_offsets: List[int]):
+    """Replace a document's stored text with an already extracted string (not committed)"""
+    writer = TextFrameWriter(db, document_id)
+    for page_number, segment in ExtractionResult(text, page_offsets).iter_segments():
+        writer.write(page_number, segment)
+    writer.close()
+
+
+def _decompress(frames) -> str:
+    decompressor = zstandard.ZstdDecompressor()
+    return "".join(decompressor.decompress(data).decode("utf-8") for data in frames)
+
+
+def iter_stored_segments(
+    db: Session, document_id: UUID, page_offsets: List[int]
+) -> Iterator[Segment]:
+    """
+    Stream a document's stored text back as segments, one frame at a time.
+
+    Frames are split at page_offsets, so the segments carry page numbers
+    just like the extractor's output (empty pages included).
+    """
+    pages = list(enumerate(page_offsets, 1))
+    next_page = 0
+    decompressor = zstandard.ZstdDecompressor()
+    rows = db.execute(
+        select(DocumentTextFrame.start_char, DocumentTextFrame.data)
+        .where(DocumentTextFrame.document_id == document_id)
+        .order_by(DocumentTextFrame.frame_index)
+        .execution_options(yield_per=FRAME_FETCH_SIZE)
+    )
+
+    for frame_start, data in rows:
+        text = decompressor.decompress(data).decode("utf-8")
+        frame_end = frame_start + len(text)
+        cursor = frame_start
+        page_number = None
+        while next_page < len(pages) and pages[next_page][1] < frame_end:
+            number, offset = pages[next_page]
+            # Empty pages still yield their (empty) segment
+            if offset > cursor or page_number is not None:
+                yield page_number, text[cursor - frame_start:offset - frame_start]
+            cursor = offset
+            page_number = number
+            next_page += 1
+        if cursor < frame_end or page_number is not None:
+            yield page_number, text[cursor - frame_start:]
+
+    # Empty pages at the very end
+    for number, _ in pages[next_page:]:
+        yield number, ""
+
+
+async def text_length(db: AsyncSession, document_id: UUID) -> Optional[int]:
+    """Length of a document's stored text, or None if none was stored"""
+    result = await db.execute(
+        select(func.max(DocumentTextFrame.end_char)).where(
+            DocumentTextFrame.document_id == document_id
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+def _range_query(document_id: UUID, offset: int, end: int):
+    return (
+        select(DocumentTextFrame.start_char, DocumentTextFrame.data)
+        .where(
+            DocumentTextFrame.document_id == document_id,
+            DocumentTextFrame.end_char > offset,
+            DocumentTextFrame.start_char < end,
+        )
+        .order_by(DocumentTextFrame.frame_index)
+    )
+
+
+def _slice_frames(rows, offset: int, end: int) -> str:
+    if not rows:
+        return ""
+    first_start = rows[0].start_char
+    text = _decompress(row.data for row in rows)
+    return text[offset - first_start:end - first_start]
+
+
+async def read_range(db: AsyncSession, document_id: UUID, offset: int, length: int) -> str:
+    """Text in [offset, offset + length), decompressing only the frames it overlaps"""
+    end = offset + length
+    result = await db.execute(_range_query(document_id, offset, end))
+    return _slice_frames(result.all(), offset, end)
+
+
+def read_range_sync(db: Session, document_id: UUID, offset: int, length: int) -> str:
+    """read_range for sync sessions (Celery workers)"""
+    end = offset + length
+    return _slice_frames(db.execute(_range_query(document_id, offset, end)).all(), offset, end)
+
+
+def page_range(page_offsets: List[int], total_length: int, page: int) -> Optional[Tuple[int, int]]:
+    """(offset, length) of a 1-based page, or None if the page doesn't exist"""
+    if not 1 <= page <= len(page_offsets):
+        return None
+    start = page_offsets[page - 1]
+    end = page_offsets[page] if page < len(page_offsets) else total_length
+    return start, end - start
+
+
+def chunk_content(text: str) -> Optional[str]:
+    """Value for a new chunk's content column under the configured chunk_storage"""
+    return None if settings.chunk_storage == "offsets" else text
+
+
+class ChunkTextCache:
+    """
+    LRU of materialized chunk text by chunk id.
+
+    A chunk id's text never changes (re-chunking writes new rows), so
+    entries need no invalidation.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[UUID, str]" = OrderedDict()
+
+    def get(self, chunk_id: UUID) -> Optional[str]:
+        text = self._entries.get(chunk_id)
+        if text is not None:
+            self._entries.move_to_end(chunk_id)
+        return text
+
+    def put(self, chunk_id: UUID, text: str):
+        self._entries[chunk_id] = text
+        self._entries.move_to_end(chunk_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+chunk_text_cache = ChunkTextCache(settings.chunk_text_cache_size)
+
+
+async def materialize_chunks(
+    db: AsyncSession, chunks: Iterable[Tuple[UUID, UUID, int, int]]
+) -> Dict[UUID, str]:
+    """
+    Text of offset-referenced chunks.
+
+    Args:
+        chunks: (chunk_id, document_id, start_char, end_char) per chunk
+
+    Returns:
+        Chunk id -> text. Every overlapping frame is fetched in one query and
+        decompressed once, however many of the chunks it holds.
+    """
+    texts = {}
+    misses = []
+    for chunk_id, document_id, start, end in chunks:
+        cached = chunk_text_cache.get(chunk_id)
+        if cached is not None:
+            texts[chunk_id] = cached
+        else:
+            misses.append((chunk_id, document_id, start, end))
+    if not misses:
+        return texts
+
+    result = await db.execute(
+        select(
+            DocumentTextFrame.document_id,
+            DocumentTextFrame.start_char,
+            DocumentTextFrame.end_char,
+            DocumentTextFrame.data,
+        )
+        .where(or_(*(
+            and_(
+                DocumentTextFrame.document_id == document_id,
+                DocumentTextFrame.end_char > start,
+                DocumentTextFrame.start_char < end,
+            )
+            for _, document_id, start, end in misses
+        )))
+        .order_by(DocumentTextFrame.document_id, DocumentTextFrame.frame_index)
+    )
+
+    decompressor = zstandard.ZstdDecompressor()
+    frames: Dict[UUID, List[Tuple[int, int, str]]] = defaultdict(list)
+    for document_id, frame_start, frame_end, data in result.all():
+        frames[document_id].append(
+            (frame_start, frame_end, decompressor.decompress(data).decode("utf-8"))
+        )
+
+    for chunk_id, document_id, start, end in misses:
+        text = _slice_cached_frames(frames.get(document_id, ()), start, end)
+        chunk_text_cache.put(chunk_id, text)
+        texts[chunk_id] = text
+    return texts
+
+
+def _slice_cached_frames(frames: Sequence[Tuple[int, int, str]], start: int, end: int) -> str:
+    parts = [
+        text[max(start - frame_start, 0):end - frame_start]
+        for frame_start, frame_end, text in frames
+        if frame_end > start and frame_start < end
+    ]
+    return "".join(parts)
@@ -0,0 +1,254 @@
+"""
+Upload Handling
+Streams uploaded files to disk with async I/O, hashing and MIME-sniffing
+them as they arrive, and rejects oversized request bodies early
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+
+import aiofiles
+import aiofiles.os
+import magic
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+from app.services.storage import get_blob_store
+
+settings = get_settings()
+
+# Bytes read from the upload per iteration
+UPLOAD_READ_SIZE = 1024 * 1024
+
+# Bytes libmagic looks at to identify the content
+SNIFF_BYTES = 8192
+
+# Room for multipart boundaries and form fields around the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Allowed file types
+ALLOWED_EXTENSIONS = {
+    ".pdf": "application/pdf",
+    ".docx": DOCX_MIME,
+    ".doc": "application/msword",
+    ".txt": "text/plain",
+}
+
+# Sniffed MIME types accepted for each extension. libmagic reports some
+# DOCX files as plain zip, and legacy .doc files are often really DOCX.
+SNIFFED_TYPES = {
+    ".pdf": {"application/pdf"},
+    ".docx": {DOCX_MIME, "application/zip"},
+    ".doc": {"application/msword", "application/x-ole-storage", "application/CDFV2",
+             DOCX_MIME, "application/zip", "text/plain"},
+    ".txt": {"text/*"},
+}
+
+
+class UploadError(Exception):
+    """An upload that can't be stored, with the HTTP status to report"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class StoredFile:
+    """A fully received upload, waiting in the temp directory to become a blob"""
+    filename: str  # <hash><ext>
+    temp_path: str
+    file_size: int
+    file_hash: str
+    sniffed_mime_type: Optional[str] = None
+
+
+async def iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    """Read an upload in UPLOAD_READ_SIZE pieces"""
+    while chunk := await file.read(UPLOAD_READ_SIZE):
+        yield chunk
+
+
+async def iter_zip_entry(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> AsyncIterator[bytes]:
+    """Decompress one zip entry in UPLOAD_READ_SIZE pieces, off the event loop"""
+    entry = await run_in_threadpool(archive.open, info)
+    try:
+        while chunk := await run_in_threadpool(entry.read, UPLOAD_READ_SIZE):
+            yield chunk
+    finally:
+        entry.close()
+
+
+def mime_matches(ext: str, mime_type: str) -> bool:
+    """Whether sniffed content is plausible for a file extension"""
+    for allowed in SNIFFED_TYPES.get(ext, ()):
+        if allowed == mime_type or (allowed.endswith("/*") and mime_type.startswith(allowed[:-1])):
+            return True
+    return False
+
+
+async def store_upload(
+    chunks: AsyncIterator[bytes],
+    ext: str,
+    max_size: Optional[int] = None,
+) -> StoredFile:
+    """
+    Stream file content into a temp file in the blob store's temp directory.
+
+    Content is written with async I/O while the SHA-256 is updated per
+    chunk. The first SNIFF_BYTES are MIME-sniffed and must match the
+    extension. Writing stops as soon as max_size is passed. The caller
+    turns the complete file into a blob with storage.stage_blob.
+
+    Raises:
+        UploadError: Too large (413) or content doesn't match the extension (415)
+    """
+    max_size = max_size or settings.max_upload_size_mb * 1024 * 1024
+
+    temp_dir = await run_in_threadpool(get_blob_store().temp_dir)
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir, prefix="upload-", suffix=".part")
+    os.close(fd)
+
+    hasher = hashlib.sha256()
+    file_size = 0
+    head = b""
+    sniffed = None
+    try:
+        async with aiofiles.open(temp_path, "wb") as f:
+            async for chunk in chunks:
+                file_size += len(chunk)
+                if file_size > max_size:
+                    raise UploadError(
+                        413, f"File too large. Max size: {max_size // (1024 * 1024)}MB"
+                    )
+
+                if sniffed is None:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                    if len(head) >= SNIFF_BYTES:
+                        sniffed = _sniff(head, ext)
+
+                hasher.update(chunk)
+                await f.write(chunk)
+
+        if sniffed is None:
+            sniffed = _sniff(head, ext)
+    except UploadError:
+        await aiofiles.os.remove(temp_path)
+        raise
+    except Exception as e:
+        if os.path.exists(temp_path):
+            await aiofiles.os.remove(temp_path)
+        raise UploadError(500, f"Failed to save file: {str(e)}")
+
+    file_hash = hasher.hexdigest()
+    return StoredFile(f"{file_hash}{ext}", temp_path, file_size, file_hash, sniffed)
+
+
+def _sniff(head: bytes, ext: str) -> str:
+    mime_type = magic.from_buffer(head, mime=True)
+    if not mime_matches(ext, mime_type):
+        raise UploadError(415, f"File content ({mime_type}) does not match extension {ext}")
+    return mime_type
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects upload requests with 413 before their bodies are buffered.
+
+    Multipart bodies are parsed (and spooled) before an endpoint runs, so a
+    size check in the endpoint only fires after the whole body arrived.
+    This checks Content-Length up front, and counts bytes as they stream in
+    for requests without one. Once the count passes the limit, the 413 is
+    sent from here and the app is told the client disconnected: an error
+    raised through receive would surface as the framework's own 400.
+
+    Args:
+        limits: Request path -> max body bytes, for POST requests
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        limit = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = self.limits.get(scope["path"].rstrip("/"))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        response_started = False
+        cut_off = False
+        rejected = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, cut_off, rejected
+            if cut_off:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    cut_off = True
+                    if not response_started:
+                        await self._reject(send, limit)
+                        rejected = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message: Message):
+            nonlocal response_started
+            if rejected:
+                return  # The app's reply to the disconnect; the 413 went out
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except Exception:
+            # The app failing on the disconnect after the 413 was sent
+            if not rejected:
+                raise
+
+    @staticmethod
+    async def _reject(send: Send, limit: int):
+        body = json.dumps(
+            {"detail": f"Request too large. Max size: {limit // (1024 * 1024)}MB"}
+        ).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def upload_size_limits() -> Dict[str, int]:
+    """Body limits for the document upload endpoints"""
+    max_file = settings.max_upload_size_mb * 1024 * 1024
+    return {
+        "/api/documents": max_file + FORM_OVERHEAD_BYTES,
+        "/api/documents/batch": settings.max_batch_upload_mb * 1024 * 1024 + FORM_OVERHEAD_BYTES,
+    }
@@ -0,0 +1,415 @@
+"""
+Offline Bulk Ingestion
+Loads a local directory tree into a project directly, without HTTP uploads
+or Celery. Files are hashed on a thread pool, extracted and chunked on a
+process pool that spools its output to disk, embedded in concurrent
+batches and written with COPY.
+
+Re-running over the same tree is safe: files whose content hash is
+already completed in the project are skipped, and unfinished ones are
+redone.
+
+Usage:
+    python -m app.tasks.bulk_ingest /path/to/papers --project <project-id>
+    python -m app.tasks.bulk_ingest /path/to/papers --project <id> --workers 8 --type manuscript
+"""
+
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from app.config import get_settings
+from app.db.bulk import copy_chunks
+from app.db.models import Document, DocumentChunk, DocumentType, ProcessingStatus
+from app.processors.chunking import TextChunker
+from app.processors.document_processor import DocumentProcessor, WordCounter
+from app.services.embeddings import get_embedding_service
+from app.services.near_duplicates import (
+    get_detector,
+    load_canonical_embeddings,
+    promote_duplicates_sync,
+)
+from app.services.storage import reference_blob_sync, stage_blob_sync
+from app.services.text_store import TextFrameWriter, chunk_content
+from app.services.uploads import ALLOWED_EXTENSIONS
+from app.tasks.runtime import SessionLocal, run_async
+
+settings = get_settings()
+
+HASH_READ_SIZE = 1024 * 1024
+
+# Record kinds in an extraction spool file
+SPOOL_SEGMENT = "segment"
+SPOOL_CHUNK = "chunk"
+
+
+@dataclass
+class IngestStats:
+    """Running totals for progress output"""
+    started: float
+    docs: int = 0
+    chunks: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (
+            f"{self.docs} docs ({self.docs / elapsed:.2f}/s)  "
+            f"{self.chunks} chunks ({self.chunks / elapsed:.1f}/s)  "
+            f"{self.skipped} skipped  {self.failed} failed"
+        )
+
+
+def iter_files(root: Path) -> Iterator[Path]:
+    """Supported files under root, in a stable order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if not name.startswith(".") and os.path.splitext(name)[1].lower() in ALLOWED_EXTENSIONS:
+                yield Path(dirpath) / name
+
+
+def hash_file(path: Path) -> Tuple[Path, str, int]:
+    """SHA-256 and size of a file"""
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while block := f.read(HASH_READ_SIZE):
+            hasher.update(block)
+            size += len(block)
+    return path, hasher.hexdigest(), size
+
+
+def _init_extract_worker():
+    # The pool already uses every core; don't nest PDF page pools inside it
+    settings.pdf_max_workers = 1
+
+
+def extract_and_chunk(path: str) -> dict:
+    """
+    Process pool body: extract text and chunk it into a spool file.
+
+    Segments and chunks are appended to the spool as the extractor and
+    chunker produce them, and only the spool's path goes back to the
+    parent, which streams it with read_spool. Neither process holds a
+    whole document's text or chunk list.
+    """
+    processor = DocumentProcessor(path)
+    fd, spool_path = tempfile.mkstemp(prefix="bulk-ingest-", suffix=".spool")
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            def segments():
+                for segment in processor.iter_segments():
+                    pickle.dump((SPOOL_SEGMENT, segment), spool)
+                    yield segment
+
+            for chunk in TextChunker().iter_chunks(segments()):
+                pickle.dump((SPOOL_CHUNK, chunk), spool)
+    except BaseException:
+        os.remove(spool_path)
+        raise
+
+    return {
+        "mime_type": processor.mime_type,
+        "extractor": processor.extractor_name,
+        "spool": spool_path,
+    }
+
+
+def read_spool(spool_path: str) -> Iterator[Tuple[str, Any]]:
+    """(kind, record) pairs written by extract_and_chunk, in order"""
+    with open(spool_path, "rb") as spool:
+        while True:
+            try:
+                yield pickle.load(spool)
+            except EOFError:
+                return
+
+
+async def embed_chunks(texts: List[str], batch_size: int, concurrency: int) -> List[Optional[list]]:
+    """Embed texts in batches, several requests in flight at once"""
+    embedding_service = get_embedding_service()
+    if not embedding_service.is_available():
+        return [None] * len(texts)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed_batch(batch: List[str]) -> List[list]:
+        async with semaphore:
+            return await embedding_service.embed_texts(batch)
+
+    batches = await asyncio.gather(*(
+        embed_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)
+    ))
+    return [embedding for batch in batches for embedding in batch]
+
+
+class BulkIngester:
+    """Ingests a directory tree into one project"""
+
+    def __init__(
+        self,
+        root: Path,
+        project_id: Optional[uuid.UUID],
+        document_type: DocumentType = DocumentType.OTHER,
+        workers: Optional[int] = None,
+        embed_batch_size: int = 256,
+        embed_concurrency: int = 4,
+    ):
+        self.root = root
+        self.project_id = project_id
+        self.document_type = document_type
+        self.workers = workers or os.cpu_count() or 1
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.stats = IngestStats(started=time.monotonic())
+
+    def _existing(self, db) -> Dict[str, Tuple[uuid.UUID, ProcessingStatus]]:
+        """Documents already in the project, by content hash"""
+        rows = db.execute(
+            select(Document.file_hash, Document.id, Document.processing_status).where(
+                Document.project_id == self.project_id,
+                Document.file_hash.isnot(None),
+            )
+        )
+        existing = {}
+        for file_hash, document_id, processing_status in rows:
+            # Prefer a completed copy when the same content was ingested twice
+            if existing.get(file_hash, (None, None))[1] != ProcessingStatus.COMPLETED:
+                existing[file_hash] = (document_id, processing_status)
+        return existing
+
+    def _to_process(self, db) -> Iterator[Tuple[Path, str, int, Optional[uuid.UUID]]]:
+        """Hash files in parallel and yield those not yet completed"""
+        existing = self._existing(db)
+        seen = set()
+        with ThreadPoolExecutor(max_workers=min(32, self.workers * 4)) as pool:
+            for path, file_hash, size in pool.map(hash_file, iter_files(self.root)):
+                previous = existing.get(file_hash)
+                if file_hash in seen or (previous and previous[1] == ProcessingStatus.COMPLETED):
+                    self.stats.skipped += 1
+                    continue
+                seen.add(file_hash)
+                yield path, file_hash, size, previous[0] if previous else None
+
+    def _store(self, db, path: Path, file_hash: str, size: int,
+               previous_id: Optional[uuid.UUID], result: dict):
+        """
+        Copy the file into blob storage and write the document with its chunks.
+
+        The spool is streamed: text goes to frames as it is read, and chunks
+        are embedded and written in batches of embed_batch_size *
+        embed_concurrency, all in one transaction.
+        """
+        if previous_id:
+            # Unfinished earlier attempt: start that document over
+            document = db.get(Document, previous_id)
+            promote_duplicates_sync(db, previous_id)
+            db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == previous_id))
+        else:
+            # Written with its own committed row, so a rollback below can't orphan it
+            file_path = stage_blob_sync(db, str(path), file_hash, size)
+            reference_blob_sync(db, file_hash, size)
+            document = Document(
+                project_id=self.project_id,
+                filename=f"{file_hash}{path.suffix.lower()}",
+                original_filename=path.name,
+                file_path=file_path,
+                file_size=size,
+                file_hash=file_hash,
+                mime_type=result["mime_type"],
+                document_type=self.document_type,
+            )
+            db.add(document)
+
+        document.processing_status = ProcessingStatus.PROCESSING
+        document.processing_error = None
+        db.flush()
+
+        writer = TextFrameWriter(db, document.id)
+        words = WordCounter()
+        detector = get_detector(db, self.project_id)
+        batch_size = self.embed_batch_size * self.embed_concurrency
+        chunk_count = 0
+        batch = []
+        for kind, record in read_spool(result["spool"]):
+            if kind == SPOOL_SEGMENT:
+                page_number, text = record
+                writer.write(page_number, text)
+                words.add(text)
+            else:
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    chunk_count += self._write_chunks(db, document.id, detector, batch)
+                    batch = []
+        writer.close()
+        chunk_count += self._write_chunks(db, document.id, detector, batch)
+
+        document.page_count = len(writer.page_offsets) or None
+        document.word_count = words.count
+        document.metadata_json = {
+            **(document.metadata_json or {}),
+            "ingest": {
+                "stage": "chunked",
+                "extractor": result["extractor"],
+                "page_offsets": writer.page_offsets,
+                "chunk_count": chunk_count,
+            },
+            "source_path": str(path.relative_to(self.root)),
+        }
+        document.processing_status = ProcessingStatus.COMPLETED
+        db.commit()
+        db.expunge(document)
+        return chunk_count
+
+    def _write_chunks(self, db, document_id: uuid.UUID, detector, chunks: List[dict]) -> int:
+        """Embed one batch of chunks and write it with COPY"""
+        if not chunks:
+            return 0
+        chunk_ids = [uuid.uuid4() for _ in chunks]
+
+        # Near-duplicates of chunks already in the project reuse their embeddings
+        duplicates = (
+            detector.find([(i, c["text"]) for i, c in zip(chunk_ids, chunks)]) if detector else {}
+        )
+        canonical = load_canonical_embeddings(db, set(duplicates.values()))
+        missing = [
+            (i, c["text"]) for i, c in zip(chunk_ids, chunks)
+            if canonical.get(duplicates.get(i)) is None
+        ]
+        generated = run_async(embed_chunks(
+            [t for _, t in missing], self.embed_batch_size, self.embed_concurrency
+        ))
+
+        embedding_for = {i: canonical.get(duplicates.get(i)) for i in chunk_ids}
+        embedding_for.update((i, e) for (i, _), e in zip(missing, generated))
+
+        written = copy_chunks(db, (
+            {
+                "id": chunk_id,
+                "document_id": document_id,
+                "chunk_index": c["index"],
+                "content": chunk_content(c["text"]),
+                "start_char": c["start_char"],
+                "end_char": c["end_char"],
+                "word_count": c["word_count"],
+                "token_count": c["token_count"],
+                "content_hash": c["content_hash"],
+                "page_number": c["page_number"],
+                "section": c["section"],
+                "duplicate_of": duplicates.get(chunk_id),
+                "embedding": embedding_for[chunk_id],
+            }
+            for chunk_id, c in zip(chunk_ids, chunks)
+        ))
+        if detector:
+            detector.index()
+        return written
+
+    def run(self, progress_interval: float = 1.0) -> IngestStats:
+        """Ingest everything, printing live throughput to stderr"""
+        db = SessionLocal()
+        last_report = 0.0
+        pending = {}
+
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_extract_worker,
+            ) as pool:
+                files = self._to_process(db)
+
+                while True:
+                    # Keep the pool busy without extracting the whole tree ahead
+                    while len(pending) < self.workers * 2:
+                        item = next(files, None)
+                        if item is None:
+                            break
+                        pending[pool.submit(extract_and_chunk, str(item[0]))] = item
+                    if not pending:
+                        break
+
+                    finished, _ = wait(
+                        pending, timeout=progress_interval, return_when=FIRST_COMPLETED
+                    )
+                    for future in finished:
+                        path, file_hash, size, previous_id = pending.pop(future)
+                        try:
+                            result = future.result()
+                            try:
+                                self.stats.chunks += self._store(
+                                    db, path, file_hash, size, previous_id, result
+                                )
+                            finally:
+                                os.remove(result["spool"])
+                            self.stats.docs += 1
+                        except Exception as e:
+                            db.rollback()
+                            self.stats.failed += 1
+                            print(f"\nFailed {path}: {type(e).__name__}: {e}", file=sys.stderr)
+
+                    now = time.monotonic()
+                    if now - last_report >= progress_interval:
+                        print(f"\r{self.stats.line()}", end="", file=sys.stderr, flush=True)
+                        last_report = now
+        finally:
+            db.close()
+            # Interrupted: drop the spools of files extracted but never stored
+            for future in pending:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    os.remove(future.result()["spool"])
+
+        print(f"\r{self.stats.line()}", file=sys.stderr)
+        return self.stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ingest a local directory tree into a project")
+    parser.add_argument("root", type=Path, help="Directory of documents")
+    parser.add_argument(
+        "--project", type=uuid.UUID, help="Project id (omit for unassigned documents)"
+    )
+    parser.add_argument(
+        "--type", dest="document_type", type=DocumentType, default=DocumentType.OTHER,
+        help="Document type for every file",
+    )
+    parser.add_argument("--workers", type=int, help="Extraction processes (default: CPU count)")
+    parser.add_argument(
+        "--embed-batch-size", type=int, default=256, help="Texts per embedding request"
+    )
+    parser.add_argument(
+        "--embed-concurrency", type=int, default=4, help="Embedding requests in flight"
+    )
+    args = parser.parse_args(argv)
+
+    if not args.root.is_dir():
+        parser.error(f"{args.root} is not a directory")
+
+    stats = BulkIngester(
+        args.root,
+        args.project,
+        document_type=args.document_type,
+        workers=args.workers,
+        embed_batch_size=args.embed_batch_size,
+        embed_concurrency=args.embed_concurrency,
+    ).run()
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
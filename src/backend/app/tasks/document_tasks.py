@@ -2,36 +2,363 @@
 Document Processing Celery Tasks
 """
 
-import os
-import asyncio
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional
+from uuid import UUID
 
-from app.celery_app import celery_app
+from celery import chord
+from sqlalchemy import func, select
+
+from app.celery_app import QUEUE_BULK, QUEUE_INTERACTIVE, QUEUE_MAINTENANCE, celery_app
 from app.config import get_settings
-from app.db.models import Document, DocumentChunk
-from app.processors.document_processor import process_document
+from app.db.bulk import copy_chunks, update_embeddings
+from app.db.models import Document, DocumentChunk, DocumentTextFrame
+from app.processors.chunking import Segment, TextChunker
+from app.processors.document_processor import DocumentProcessor, ExtractionResult, WordCounter
 from app.services.embeddings import get_embedding_service
+from app.services.near_duplicates import get_detector, load_canonical_embeddings
+from app.services.storage import get_blob_store
+from app.services.text_store import (
+    TextFrameWriter,
+    chunk_content,
+    iter_stored_segments,
+    read_range_sync,
+)
+from app.tasks.runtime import SessionLocal, run_async
+from app.tasks.scheduling import (
+    acquire_project_slot,
+    defer_document,
+    free_slots,
+    pop_pending,
+    release_project_slot,
+)
+from app.websocket.bridge import publish_event
+from app.websocket.events import DocumentProcessingEvent
 
 settings = get_settings()
 
-# Sync engine for Celery (Celery doesn't support async well)
-sync_engine = create_engine(
-    settings.database_url.replace("postgresql://", "postgresql+psycopg2://")
-    if "postgresql://" in settings.database_url
-    else settings.database_url.replace("postgresql+asyncpg://", "postgresql+psycopg2://")
-)
-SessionLocal = sessionmaker(bind=sync_engine)
+# Ingest stages, in order. The last completed stage is checkpointed in
+# Document.metadata_json["ingest"] so a retry resumes after it.
+STAGE_EXTRACTED = "extracted"
+STAGE_CHUNKED = "chunked"
+
+# Progress reported when each stage starts; embedding fills the rest up to 100
+PROGRESS_PROCESSING = 5
+PROGRESS_CHUNKING = 20
+PROGRESS_EMBEDDING = 30
+
+
+def load_reusable_embeddings(
+    db, parent_id: UUID, content_hashes: Iterable[str]
+) -> Dict[str, List[float]]:
+    """
+    Embeddings of a parent version's chunks with the given content hashes.
+
+    Rows written before content_hash existed are hashed in the database
+    the same way chunking.content_hash does. Those rows always have
+    content: offset-referenced chunks (content NULL) came later and are
+    written with their content_hash, so the fallback never sees them.
+    """
+    chunk_hash = func.coalesce(
+        DocumentChunk.content_hash,
+        func.encode(func.sha256(func.convert_to(DocumentChunk.content, "UTF8")), "hex"),
+    )
+    rows = db.execute(
+        select(chunk_hash, DocumentChunk.embedding).where(
+            DocumentChunk.document_id == parent_id,
+            DocumentChunk.embedding.isnot(None),
+            chunk_hash.in_(list(content_hashes)),
+        )
+    )
+    return {content_hash: embedding for content_hash, embedding in rows}
+
+
+def get_checkpoint(document: Document) -> dict:
+    """Ingest progress saved by earlier attempts"""
+    return dict((document.metadata_json or {}).get("ingest") or {})
+
+
+def save_checkpoint(db, document: Document, **progress):
+    """Merge progress into the document's checkpoint and commit it"""
+    checkpoint = {**get_checkpoint(document), **progress}
+    # Reassign so the JSON column is flagged as changed
+    document.metadata_json = {**(document.metadata_json or {}), "ingest": checkpoint}
+    db.commit()
+
+
+def publish_progress(
+    document: Document,
+    status: str,
+    progress_percent: int,
+    chunks_created: int = 0,
+    error_message: Optional[str] = None,
+):
+    """Send a document_processing event to WebSocket subscribers via Redis"""
+    publish_event(DocumentProcessingEvent(
+        document_id=document.id,
+        project_id=document.project_id,
+        filename=document.original_filename,
+        status=status,
+        progress_percent=progress_percent,
+        chunks_created=chunks_created,
+        error_message=error_message,
+    ).to_event())
+
+
+def extract_stage(db, document: Document, file_path: str):
+    """
+    Extract text once and persist it with page offsets.
+
+    Segments are compressed into text frames and counted as the extractor
+    yields them, so the whole text is never held in memory.
+    """
+    if get_checkpoint(document).get("stage") in (STAGE_EXTRACTED, STAGE_CHUNKED):
+        return
+
+    # S3 blobs are downloaded to a temp file for the extractors
+    with get_blob_store().local_path(file_path) as local_path:
+        processor = DocumentProcessor(local_path)
+        writer = TextFrameWriter(db, document.id)
+        words = WordCounter()
+        for page_number, text in processor.iter_segments():
+            writer.write(page_number, text)
+            words.add(text)
+        writer.close()
+
+    document.page_count = len(writer.page_offsets) or None
+    document.word_count = words.count
+    save_checkpoint(
+        db, document,
+        stage=STAGE_EXTRACTED,
+        extractor=processor.extractor_name,
+        page_offsets=writer.page_offsets,
+    )
+
+
+def stored_segments(db, document: Document) -> Iterator[Segment]:
+    """Segments of the extracted text, streamed back from its frames"""
+    has_frames = db.execute(
+        select(DocumentTextFrame.frame_index)
+        .where(DocumentTextFrame.document_id == document.id)
+        .limit(1)
+    ).first()
+    if document.extracted_text and not has_frames:
+        # Extracted before text frames existed
+        return ExtractionResult(
+            text=document.extracted_text,
+            page_offsets=get_checkpoint(document).get("page_offsets", []),
+        ).iter_segments()
+    return iter_stored_segments(db, document.id, get_checkpoint(document).get("page_offsets", []))
+
+
+def chunk_stage(db, document: Document) -> int:
+    """
+    Chunk the extracted text and store chunks without embeddings.
+
+    The text is streamed frame by frame from the text store. Rows are
+    written with COPY in ingest_batch_size batches, all in one
+    transaction, so a failure here leaves no partial set behind for the
+    retry. Near-duplicates of chunks already in the project are linked to
+    them through duplicate_of; the rest are added to the project's index.
+    """
+    checkpoint = get_checkpoint(document)
+    if checkpoint.get("stage") == STAGE_CHUNKED:
+        return checkpoint["chunk_count"]
+
+    detector = get_detector(db, document.project_id)
+
+    def write(batch: List[dict], texts: List[str]) -> int:
+        if detector:
+            duplicates = detector.find([(row["id"], t) for row, t in zip(batch, texts)])
+            for row in batch:
+                row["duplicate_of"] = duplicates.get(row["id"])
+        written = copy_chunks(db, batch)
+        if detector:
+            detector.index()
+        return written
+
+    chunk_count = 0
+    batch = []
+    texts = []
+    for chunk_data in TextChunker().iter_chunks(stored_segments(db, document)):
+        texts.append(chunk_data["text"])
+        batch.append({
+            "id": uuid.uuid4(),
+            "document_id": document.id,
+            "chunk_index": chunk_data["index"],
+            "content": chunk_content(chunk_data["text"]),
+            "start_char": chunk_data["start_char"],
+            "end_char": chunk_data["end_char"],
+            "word_count": chunk_data["word_count"],
+            "token_count": chunk_data["token_count"],
+            "content_hash": chunk_data["content_hash"],
+            "page_number": chunk_data["page_number"],
+            "section": chunk_data["section"],
+        })
+        if len(batch) >= settings.ingest_batch_size:
+            chunk_count += write(batch, texts)
+            batch = []
+            texts = []
+    chunk_count += write(batch, texts)
+
+    save_checkpoint(db, document, stage=STAGE_CHUNKED, chunk_count=chunk_count)
+    return chunk_count
+
+
+def chunk_texts(db, document: Document, chunks) -> List[str]:
+    """Text of chunk rows, reading offset-referenced ones from the stored text"""
+    if all(chunk.content is not None for chunk in chunks):
+        return [chunk.content for chunk in chunks]
+
+    # Chunks in a range are contiguous, so one read covers them all
+    start = min(chunk.start_char for chunk in chunks)
+    end = max(chunk.end_char for chunk in chunks)
+    text = read_range_sync(db, document.id, start, end - start)
+    return [
+        chunk.content if chunk.content is not None
+        else text[chunk.start_char - start:chunk.end_char - start]
+        for chunk in chunks
+    ]
+
+
+def embed_range(db, document: Document, start: int, end: int) -> Dict[str, int]:
+    """
+    Embed the stored chunks with start <= chunk_index < end.
+
+    Only chunks without an embedding are touched, so running a range again
+    after a failure does no repeated work. For a new version of a document,
+    chunks whose text is unchanged from the parent copy its embeddings, and
+    near-duplicates copy the embedding of their canonical chunk.
+    """
+    embedding_service = get_embedding_service()
+    stats = {"embeddings_generated": 0, "embeddings_reused": 0}
+    if not embedding_service.is_available():
+        return stats
+
+    batch = db.execute(
+        select(
+            DocumentChunk.id,
+            DocumentChunk.content,
+            DocumentChunk.content_hash,
+            DocumentChunk.start_char,
+            DocumentChunk.end_char,
+            DocumentChunk.duplicate_of,
+        )
+        .where(
+            DocumentChunk.document_id == document.id,
+            DocumentChunk.chunk_index >= start,
+            DocumentChunk.chunk_index < end,
+            DocumentChunk.embedding.is_(None),
+        )
+        .order_by(DocumentChunk.chunk_index)
+    ).all()
+    if not batch:
+        return stats
+
+    reusable = {}
+    if document.parent_id:
+        reusable = load_reusable_embeddings(
+            db, document.parent_id, {chunk.content_hash for chunk in batch}
+        )
+
+    canonical = load_canonical_embeddings(
+        db, {chunk.duplicate_of for chunk in batch if chunk.duplicate_of}
+    )
+
+    updates = []
+    missing = []
+    for chunk in batch:
+        embedding = reusable.get(chunk.content_hash)
+        if embedding is None and chunk.duplicate_of:
+            embedding = canonical.get(chunk.duplicate_of)
+        if embedding is not None:
+            updates.append((chunk.id, embedding))
+            stats["embeddings_reused"] += 1
+        else:
+            missing.append(chunk)
+
+    if missing:
+        generated = run_async(embedding_service.embed_texts(chunk_texts(db, document, missing)))
+        updates.extend((chunk.id, embedding) for chunk, embedding in zip(missing, generated))
+        stats["embeddings_generated"] += len(generated)
+
+    update_embeddings(db, updates)
+    db.commit()
+
+    # Ranges finish out of order, so report overall progress from the table
+    embedded, total = db.execute(
+        select(func.count(DocumentChunk.embedding), func.count())
+        .where(DocumentChunk.document_id == document.id)
+    ).one()
+    publish_progress(
+        document, "embedding",
+        PROGRESS_EMBEDDING + (99 - PROGRESS_EMBEDDING) * embedded // max(total, 1),
+        chunks_created=total,
+    )
+    return stats
+
+
+def mark_failed(db, document_id: str, error: Exception, queue: str):
+    """Roll back the unfinished step and record the error on the document"""
+    db.rollback()
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if document:
+        document.processing_status = "failed"
+        document.processing_error = str(error)
+        db.commit()
+        publish_progress(document, "failed", 0, error_message=str(error))
+        if queue == QUEUE_BULK:
+            release_slot(document)
+
+
+def release_slot(document: Document):
+    """Give back a bulk document's project slot and start the next parked document"""
+    project_id = document.project_id and str(document.project_id)
+    if release_project_slot(project_id, str(document.id)):
+        resume_deferred(project_id, 1)
+
+
+def resume_deferred(project_id: str, count: int) -> int:
+    """Queue up to count of a project's parked bulk documents again"""
+    pending = pop_pending(project_id, count)
+    for document_id, file_path in pending:
+        enqueue_document(document_id, file_path, QUEUE_BULK)
+    return len(pending)
+
+
+def embed_workflow(document_id: str, chunk_count: int, queue: str):
+    """Chord of embedding ranges followed by finalize, all on one queue"""
+    step = settings.ingest_batch_size
+    header = [
+        embed_chunks_task.s(
+            document_id, start, min(start + step, chunk_count), queue=queue
+        ).set(queue=queue)
+        for start in range(0, chunk_count, step)
+    ]
+    return chord(header, finalize_document_task.s(document_id, queue=queue).set(queue=queue))
 
 
 @celery_app.task(bind=True, max_retries=3)
-def process_document_task(self, document_id: str, file_path: str):
+def process_document_task(self, document_id: str, file_path: str, queue: str = QUEUE_INTERACTIVE):
     """
-    Process an uploaded document:
-    1. Extract text from file
-    2. Split into chunks
-    3. Store chunks in database
-    4. Update document status
+    Process an uploaded document as a chain of checkpointed stages:
+    1. Extract text and store it on the document
+    2. Split into chunks and store them without embeddings
+    3. Fan out: a chord of embed_chunks_task over ranges of
+       ingest_batch_size chunks, run in parallel across workers
+    4. Fan in: finalize_document_task marks the document completed
+
+    Extraction and chunking commit their output and are checkpointed in the
+    document's metadata, so a retry skips finished stages. The document is
+    only marked failed once retries are exhausted. Embedding sub-tasks
+    retry on their own and only embed chunks still missing a vector. This
+    task replaces itself with the chord, so its result is the finalize
+    result. Sub-tasks run on the same queue as this task.
+
+    On the bulk queue, each project may only have a few documents in
+    flight; others are parked in Redis and queued again when one of the
+    project's slots frees up, so documents from different projects take
+    turns without deferred tasks piling up in the broker.
     """
     db = SessionLocal()
 
@@ -41,77 +368,138 @@ def process_document_task(self, document_id: str, file_path: str):
         if not document:
             raise ValueError(f"Document {document_id} not found")
 
+        project_id = document.project_id and str(document.project_id)
+        if queue == QUEUE_BULK and not acquire_project_slot(project_id, document_id):
+            defer_document(project_id, document_id, file_path)
+            # A slot freed since the check would otherwise wait for the sweep
+            resume_deferred(project_id, free_slots(project_id))
+            return {"document_id": document_id, "status": "deferred"}
+
         # Update status to processing
         document.processing_status = "processing"
+        document.processing_error = None
         db.commit()
+        publish_progress(document, "processing", PROGRESS_PROCESSING)
 
-        # Process the document
-        result = process_document(file_path)
-
-        # Update document metadata
-        document.page_count = result["page_count"]
-        document.word_count = result["word_count"]
-
-        # Create chunks
-        chunk_texts = [chunk_data["text"] for chunk_data in result["chunks"]]
-        chunks_created = []
-
-        for chunk_data in result["chunks"]:
-            chunk = DocumentChunk(
-                document_id=document_id,
-                chunk_index=chunk_data["index"],
-                content=chunk_data["text"],
-                start_char=chunk_data["start_char"],
-                end_char=chunk_data["end_char"],
-                word_count=chunk_data["word_count"],
-            )
-            db.add(chunk)
-            chunks_created.append(chunk)
-
-        db.flush()  # Get chunk IDs
-
-        # Generate embeddings if service is available
-        embedding_service = get_embedding_service()
-        embeddings_generated = 0
-
-        if embedding_service.is_available() and chunk_texts:
-            # Run async embedding generation in sync context
-            loop = asyncio.new_event_loop()
-            try:
-                embeddings = loop.run_until_complete(
-                    embedding_service.embed_texts(chunk_texts)
-                )
-                for chunk, embedding in zip(chunks_created, embeddings):
-                    chunk.embedding = embedding
-                    embeddings_generated += 1
-            finally:
-                loop.close()
-
-        # Mark as completed
-        document.processing_status = "completed"
+        extract_stage(db, document, file_path)
+        publish_progress(document, "chunking", PROGRESS_CHUNKING)
+        chunk_count = chunk_stage(db, document)
+        publish_progress(document, "embedding", PROGRESS_EMBEDDING, chunks_created=chunk_count)
+
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            mark_failed(db, document_id, e, queue)
+            raise
+        # Only the unfinished stage is lost; checkpoints are committed
+        db.rollback()
+
+        # Retry with exponential backoff
+        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+
+    finally:
+        db.close()
+
+    if not chunk_count:
+        return finalize_document_task.run([], document_id, queue=queue)
+    return self.replace(embed_workflow(document_id, chunk_count, queue))
+
+
+@celery_app.task(bind=True, max_retries=3)
+def reembed_document_task(self, document_id: str):
+    """
+    Re-embed every chunk of a processed document, e.g. after an embedding
+    model change. Runs on the maintenance queue so it never delays uploads.
+    """
+    db = SessionLocal()
+
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            raise ValueError(f"Document {document_id} not found")
+
+        document.processing_status = "processing"
+        db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).update(
+            {DocumentChunk.embedding: None}, synchronize_session=False
+        )
         db.commit()
+        chunk_count = get_checkpoint(document).get("chunk_count") or (
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).count()
+        )
 
-        return {
-            "document_id": document_id,
-            "status": "completed",
-            "chunks_created": len(result["chunks"]),
-            "embeddings_generated": embeddings_generated,
-            "word_count": result["word_count"],
-            "page_count": result["page_count"],
-        }
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            mark_failed(db, document_id, e, QUEUE_MAINTENANCE)
+            raise
+        db.rollback()
+        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+
+    finally:
+        db.close()
+
+    if not chunk_count:
+        return finalize_document_task.run([], document_id, queue=QUEUE_MAINTENANCE)
+    return self.replace(embed_workflow(document_id, chunk_count, QUEUE_MAINTENANCE))
+
+
+@celery_app.task(bind=True, max_retries=5)
+def embed_chunks_task(self, document_id: str, start: int, end: int, queue: str = QUEUE_INTERACTIVE):
+    """Embed one range of a document's chunks"""
+    db = SessionLocal()
+
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            raise ValueError(f"Document {document_id} not found")
+        return embed_range(db, document, start, end)
 
     except Exception as e:
+        if self.request.retries >= self.max_retries:
+            mark_failed(db, document_id, e, queue)
+            raise
         db.rollback()
 
-        # Update document with error
+        # Retry with exponential backoff, only this range
+        raise self.retry(exc=e, countdown=min(10 * (2 ** self.request.retries), 300))
+
+    finally:
+        db.close()
+
+
+@celery_app.task
+def finalize_document_task(
+    results: List[Dict[str, int]], document_id: str, queue: str = QUEUE_INTERACTIVE
+):
+    """Mark a document completed once all embedding ranges are done"""
+    db = SessionLocal()
+
+    try:
         document = db.query(Document).filter(Document.id == document_id).first()
-        if document:
-            document.processing_status = "failed"
-            document.processing_error = str(e)
-            db.commit()
+        if not document:
+            raise ValueError(f"Document {document_id} not found")
 
-        # Retry with exponential backoff
-        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+        document.processing_status = "completed"
+        db.commit()
+        publish_progress(
+            document, "ready", 100,
+            chunks_created=get_checkpoint(document).get("chunk_count", 0),
+        )
+        if queue == QUEUE_BULK:
+            release_slot(document)
+
+        return {
+            "document_id": document_id,
+            "status": "completed",
+            "chunks_created": get_checkpoint(document).get("chunk_count", 0),
+            "embeddings_generated": sum(r["embeddings_generated"] for r in results),
+            "embeddings_reused": sum(r["embeddings_reused"] for r in results),
+            "word_count": document.word_count,
+            "page_count": document.page_count,
+        }
 
     finally:
         db.close()
+
+
+def enqueue_document(document_id: str, file_path: str, queue: str = QUEUE_INTERACTIVE):
+    """Queue a document for processing in the given priority class"""
+    return process_document_task.apply_async((document_id, file_path), {"queue": queue}, queue=queue)
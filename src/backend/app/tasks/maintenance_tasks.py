@@ -0,0 +1,93 @@
+"""
+Maintenance Celery Tasks
+Periodic housekeeping, run on the maintenance queue
+"""
+
+import logging
+
+from app.celery_app import celery_app
+from app.config import get_settings
+from app.services.storage import (
+    CLAIM_ORPHANS_SQL,
+    DELETE_BLOB_ROW_SQL,
+    get_blob_store,
+)
+from app.tasks.document_tasks import resume_deferred
+from app.tasks.runtime import SessionLocal
+from app.tasks.scheduling import free_slots, pending_projects
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Blobs deleted per reaper transaction
+REAP_BATCH_SIZE = 100
+
+# In-progress uploads older than this are abandoned
+TEMP_MAX_AGE_SECONDS = 24 * 3600
+
+
+@celery_app.task
+def reap_blobs_task():
+    """
+    Delete blobs no document has referenced for blob_reap_grace_seconds.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED and the refcount is
+    re-checked under the lock, so a blob being re-referenced by an upload
+    in flight is never deleted. Also removes abandoned temp uploads.
+    """
+    store = get_blob_store()
+    deleted = 0
+    failed = []
+    db = SessionLocal()
+
+    try:
+        while True:
+            orphans = db.execute(
+                CLAIM_ORPHANS_SQL,
+                {
+                    "grace": settings.blob_reap_grace_seconds,
+                    "limit": REAP_BATCH_SIZE,
+                    "skip": failed,
+                },
+            ).all()
+            if not orphans:
+                break
+
+            for file_hash, location in orphans:
+                try:
+                    store.delete(location)
+                except Exception as e:
+                    # Keep the row so the next run retries, but not this one
+                    logger.warning(f"Failed to delete blob {file_hash}: {e}")
+                    failed.append(file_hash)
+                    continue
+                db.execute(DELETE_BLOB_ROW_SQL, {"hash": file_hash})
+                deleted += 1
+            db.commit()
+
+            if len(orphans) < REAP_BATCH_SIZE:
+                break
+    finally:
+        db.close()
+
+    temp_removed = store.sweep_temp(TEMP_MAX_AGE_SECONDS)
+    return {
+        "blobs_deleted": deleted,
+        "blobs_failed": len(failed),
+        "temp_files_removed": temp_removed,
+    }
+
+
+@celery_app.task
+def resume_deferred_task():
+    """
+    Re-queue parked bulk documents of projects with free slots.
+
+    Slots are normally handed on when a document finishes; this catches
+    documents parked while no slot was released afterwards, e.g. when a
+    crashed worker's slot expired.
+    """
+    resumed = 0
+    for project_id in pending_projects():
+        resumed += resume_deferred(project_id, free_slots(project_id))
+    return {"documents_resumed": resumed}
@@ -0,0 +1,86 @@
+"""
+Celery Worker Runtime
+Per-process resources for ingest tasks: one long-lived event loop, one
+pooled HTTP client for embedding calls, and a sync DB engine sized for a
+worker. Set up in worker_process_init and torn down on shutdown.
+"""
+
+import asyncio
+from typing import Awaitable, Optional, TypeVar
+
+import httpx
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.services.budget import get_tokenizer
+from app.services.embeddings import get_embedding_service, init_embedding_service
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+# Sync engine for Celery (Celery doesn't support async well). A worker
+# process runs one task at a time (prefetch 1), so a small pool suffices.
+sync_engine = create_engine(
+    settings.database_url.replace("postgresql://", "postgresql+psycopg2://")
+    if "postgresql://" in settings.database_url
+    else settings.database_url.replace("postgresql+asyncpg://", "postgresql+psycopg2://"),
+    pool_size=settings.worker_db_pool_size,
+    max_overflow=settings.worker_db_max_overflow,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+)
+SessionLocal = sessionmaker(bind=sync_engine)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide event loop, created on first use"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run_async(awaitable: Awaitable[T]) -> T:
+    """Run async code on the worker's loop from a sync task"""
+    return get_loop().run_until_complete(awaitable)
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Set up loop, HTTP client and DB pool in each forked worker"""
+    # Connections inherited from the parent must not be shared
+    sync_engine.dispose(close=False)
+
+    get_loop()
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.worker_http_max_connections,
+            max_keepalive_connections=settings.worker_http_max_connections,
+        ),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+    init_embedding_service(http_client=http_client)
+
+    # Preload the tokenizer used by the chunker so the first task doesn't pay for it
+    get_tokenizer()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Close pooled connections and the loop"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+    try:
+        _loop.run_until_complete(get_embedding_service().close())
+        _loop.run_until_complete(_loop.shutdown_asyncgens())
+    finally:
+        _loop.close()
+        _loop = None
+    sync_engine.dispose()
@@ -0,0 +1,127 @@
+"""
+Ingest Scheduling
+Picks the queue for a document and keeps bulk imports fair across projects
+"""
+
+import json
+from typing import List, Optional, Tuple
+
+import redis
+
+from app.celery_app import QUEUE_BULK, QUEUE_INTERACTIVE
+from app.config import get_settings
+
+settings = get_settings()
+
+# In-flight bulk documents per project, and a token per document holding
+# one of them so a slot is only given back once. Both expire so a crashed
+# worker can't hold a slot forever.
+INFLIGHT_KEY = "ingest:inflight:{project_id}"
+SLOT_TOKEN_KEY = "ingest:slot:{document_id}"
+INFLIGHT_TTL_SECONDS = 3600
+
+# Bulk documents waiting for one of their project's slots, oldest first
+PENDING_KEY = "ingest:pending:{project_id}"
+PENDING_PATTERN = "ingest:pending:*"
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.redis_url)
+    return _client
+
+
+def queue_for_upload(file_size: int, bulk: bool = False) -> str:
+    """Interactive queue for single small uploads, bulk otherwise"""
+    if bulk or file_size > settings.interactive_max_upload_mb * 1024 * 1024:
+        return QUEUE_BULK
+    return QUEUE_INTERACTIVE
+
+
+def acquire_project_slot(project_id: Optional[str], document_id: str) -> bool:
+    """
+    Claim one of a project's bulk processing slots for a document.
+
+    A project holding bulk_max_inflight_per_project slots has to wait, so
+    one large import can't occupy every bulk worker while other projects'
+    documents sit behind it in the queue. A document that already holds a
+    slot (a redelivered task) keeps it.
+    """
+    if not project_id:
+        return True
+
+    key = INFLIGHT_KEY.format(project_id=project_id)
+    token = SLOT_TOKEN_KEY.format(document_id=document_id)
+    client = get_redis()
+    if client.exists(token):
+        return True
+    if client.incr(key) > settings.bulk_max_inflight_per_project:
+        _decr(client, key)
+        return False
+    client.expire(key, INFLIGHT_TTL_SECONDS)
+    client.set(token, project_id, ex=INFLIGHT_TTL_SECONDS)
+    return True
+
+
+def release_project_slot(project_id: Optional[str], document_id: str) -> bool:
+    """
+    Give back a document's slot claimed with acquire_project_slot.
+
+    Safe to call more than once per document (e.g. from every failed
+    embedding range): only the call that removes the token gives the
+    slot back. Returns whether a slot was freed.
+    """
+    if not project_id:
+        return False
+
+    client = get_redis()
+    if not client.delete(SLOT_TOKEN_KEY.format(document_id=document_id)):
+        return False
+    _decr(client, INFLIGHT_KEY.format(project_id=project_id))
+    return True
+
+
+def _decr(client: redis.Redis, key: str):
+    """Decrement a slot counter, never below 0"""
+    if client.decr(key) <= 0:
+        client.delete(key)
+
+
+def free_slots(project_id: str) -> int:
+    """Slots a project can still claim"""
+    inflight = int(get_redis().get(INFLIGHT_KEY.format(project_id=project_id)) or 0)
+    return max(settings.bulk_max_inflight_per_project - inflight, 0)
+
+
+def defer_document(project_id: str, document_id: str, file_path: str):
+    """Park a bulk document until one of its project's slots frees up"""
+    get_redis().rpush(
+        PENDING_KEY.format(project_id=project_id),
+        json.dumps({"document_id": document_id, "file_path": file_path}),
+    )
+
+
+def pop_pending(project_id: str, count: int = 1) -> List[Tuple[str, str]]:
+    """Take up to count parked documents, oldest first, as (document_id, file_path)"""
+    client = get_redis()
+    key = PENDING_KEY.format(project_id=project_id)
+    pending = []
+    for _ in range(count):
+        raw = client.lpop(key)
+        if raw is None:
+            break
+        entry = json.loads(raw)
+        pending.append((entry["document_id"], entry["file_path"]))
+    return pending
+
+
+def pending_projects() -> List[str]:
+    """Projects with parked documents"""
+    prefix = PENDING_KEY.format(project_id="")
+    return [
+        (key.decode() if isinstance(key, bytes) else key)[len(prefix):]
+        for key in get_redis().scan_iter(match=PENDING_PATTERN)
+    ]
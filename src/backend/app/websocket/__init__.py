@@ -8,7 +8,9 @@ from app.websocket.events import (
     TaskProgressEvent,
     NotificationEvent,
     ChatStreamEvent,
+    DocumentProcessingEvent,
 )
+from app.websocket.bridge import EventBridge, event_bridge, publish_event
 
 __all__ = [
     "ConnectionManager",
@@ -19,4 +21,8 @@ __all__ = [
     "TaskProgressEvent",
     "NotificationEvent",
     "ChatStreamEvent",
+    "DocumentProcessingEvent",
+    "EventBridge",
+    "event_bridge",
+    "publish_event",
 ]
@@ -0,0 +1,106 @@
+"""
+Redis pub/sub bridge for WebSocket events.
+
+Celery workers have no access to the ConnectionManager in API processes.
+Workers publish events to a Redis channel; every API process runs an
+EventBridge that relays them to its own subscribed WebSocket clients.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from app.config import get_settings
+from app.websocket.events import EventType, WebSocketEvent
+from app.websocket.manager import ConnectionManager, manager
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+EVENTS_CHANNEL = "grantpilot:events"
+
+_publisher: Optional[redis.Redis] = None
+
+
+def publish_event(event: WebSocketEvent) -> bool:
+    """
+    Publish an event to all API processes (sync, for Celery workers).
+
+    Delivery is best effort: a Redis error is logged and never fails the
+    caller's task.
+
+    Returns:
+        True if the event was published
+    """
+    global _publisher
+    try:
+        if _publisher is None:
+            _publisher = redis.Redis.from_url(settings.redis_url)
+        _publisher.publish(EVENTS_CHANNEL, json.dumps(event.to_json()))
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to publish {event.type.value} event: {e}")
+        return False
+
+
+class EventBridge:
+    """Relays events published on Redis to local WebSocket subscribers"""
+
+    def __init__(self, connection_manager: ConnectionManager, redis_url: Optional[str] = None):
+        self.manager = connection_manager
+        self.redis_url = redis_url or settings.redis_url
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start relaying in a background task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """Subscribe and relay, reconnecting after Redis errors"""
+        while True:
+            client = aioredis.from_url(self.redis_url)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    await self._relay(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event bridge error, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+                await client.close()
+
+    async def _relay(self, data: bytes):
+        try:
+            raw = json.loads(data)
+            event = WebSocketEvent(
+                type=EventType(raw["type"]),
+                payload=raw.get("payload", {}),
+                timestamp=datetime.fromisoformat(raw["timestamp"]),
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Dropping malformed bridged event: {e}")
+            return
+        await self.manager.broadcast_to_subscribers(event)
+
+
+# Bridge for this API process
+event_bridge = EventBridge(manager)
@@ -107,6 +107,8 @@ class ChatStreamEvent(BaseModel):
     chunk: str
     is_final: bool = False
     sources: List[Dict[str, Any]] = Field(default_factory=list)
+    usage: Optional[Dict[str, Any]] = None  # Set on the final event
+    error: Optional[str] = None  # Set on the final event when the stream failed
 
     def to_event(self) -> WebSocketEvent:
         return WebSocketEvent(
@@ -134,6 +136,7 @@ class NotificationEvent(BaseModel):
 class DocumentProcessingEvent(BaseModel):
     """Document processing status event"""
     document_id: UUID
+    project_id: Optional[UUID] = None
     filename: str
     status: str  # uploading, processing, chunking, embedding, ready, failed
     progress_percent: int = 0
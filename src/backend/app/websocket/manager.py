@@ -13,11 +13,11 @@ import asyncio
 import json
 import logging
 from datetime import datetime
-from typing import Dict, Set, Optional, Any
+from typing import AsyncIterable, Dict, List, Set, Optional, Any
 from uuid import UUID, uuid4
 from fastapi import WebSocket, WebSocketDisconnect
 
-from app.websocket.events import WebSocketEvent, EventType
+from app.websocket.events import WebSocketEvent, EventType, ChatStreamEvent
 
 logger = logging.getLogger(__name__)
 
@@ -173,6 +173,45 @@ class ConnectionManager:
         for client_id in list(subscribers):
             await self.send_to_client(client_id, event)
 
+    async def stream_chat(
+        self,
+        client_id: str,
+        frames: AsyncIterable[str],
+        sources: Optional[List[Dict[str, Any]]] = None,
+        conversation_id: Optional[UUID] = None,
+        usage: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """
+        Stream a chat response to a client as chat_stream events.
+
+        Each frame from the iterable is sent as one event, so callers should
+        coalesce tokens before handing them over. A final chat_complete event
+        carries the sources and usage.
+
+        Args:
+            client_id: Target client
+            frames: Async iterable of text frames
+            sources: Retrieval sources for the final event
+            conversation_id: Optional conversation identifier
+            usage: Dict filled with token usage and cost once frames are exhausted
+
+        Returns:
+            True if the full response was delivered, False if the client went away
+        """
+        async for frame in frames:
+            event = ChatStreamEvent(conversation_id=conversation_id, chunk=frame)
+            if not await self.send_to_client(client_id, event.to_event()):
+                return False
+
+        final = ChatStreamEvent(
+            conversation_id=conversation_id,
+            chunk="",
+            is_final=True,
+            sources=sources or [],
+            usage=usage or None,
+        )
+        return await self.send_to_client(client_id, final.to_event())
+
     async def subscribe(self, client_id: str, event_types: list[EventType]):
         """
         Subscribe a client to specific event types.
@@ -0,0 +1,22 @@
+"""
+Shared test fixtures
+"""
+
+import pytest
+
+from app.config import get_settings
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    """The cached settings object, with setattr changes undone after each test"""
+    current = get_settings()
+
+    class Overrides:
+        def __getattr__(self, name):
+            return getattr(current, name)
+
+        def __setattr__(self, name, value):
+            monkeypatch.setattr(current, name, value)
+
+    return Overrides()
@@ -0,0 +1,71 @@
+"""
+Tests for the extractor benchmark harness
+"""
+
+import multiprocessing
+import os
+import signal
+import time
+
+from app.processors.benchmark import run_isolated, wait_for_result
+
+
+def _crash(queue):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def _hang(queue):
+    time.sleep(60)
+
+
+def _exit_after_result(queue):
+    queue.put({"text": "partial"})
+    queue.close()
+    queue.join_thread()
+    os._exit(3)
+
+
+def _start(target):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=target, args=(queue,))
+    process.start()
+    return process, queue
+
+
+def test_crashed_child_is_a_failed_run():
+    process, queue = _start(_crash)
+
+    result = wait_for_result(process, queue, timeout=30)
+
+    assert result["error"] == f"Extractor process failed (killed by signal {signal.SIGKILL})"
+
+
+def test_stuck_child_times_out_and_is_killed():
+    process, queue = _start(_hang)
+    started = time.monotonic()
+
+    result = wait_for_result(process, queue, timeout=1)
+
+    assert result["error"].startswith("Timed out")
+    assert time.monotonic() - started < 30
+    assert not process.is_alive()
+
+
+def test_nonzero_exit_fails_even_with_a_result():
+    process, queue = _start(_exit_after_result)
+
+    result = wait_for_result(process, queue, timeout=30)
+
+    assert result["error"] == "Extractor process failed (exit code 3)"
+
+
+def test_run_isolated_reports_text(tmp_path):
+    path = tmp_path / "sample.txt"
+    path.write_text("Specific aims and approach")
+
+    result = run_isolated(str(path), "blocks", timeout=60)
+
+    assert result.get("error") is None
+    assert result["text"] == "Specific aims and approach"
+    assert result["seconds"] >= 0
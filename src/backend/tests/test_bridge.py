@@ -0,0 +1,120 @@
+"""
+Tests for relaying worker events to WebSocket clients over Redis pub/sub
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.websocket import bridge
+from app.websocket.bridge import EVENTS_CHANNEL, EventBridge, publish_event
+from app.websocket.events import DocumentProcessingEvent, EventType
+from app.websocket.manager import ConnectionManager
+
+
+class FakePublisher:
+    """The sync client workers publish with"""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, data):
+        self.published.append((channel, data.encode()))
+
+
+class FakePubSub:
+    """Delivers the published messages, then waits like an idle subscription"""
+
+    def __init__(self, published):
+        self.published = published
+        self.channels = []
+        self.drained = asyncio.Event()
+        self.closed = False
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def listen(self):
+        for channel, data in self.published:
+            if channel in self.channels:
+                yield {"type": "message", "channel": channel, "data": data}
+        self.drained.set()
+        await asyncio.Event().wait()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeRedis:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+        self.closed = False
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return self._pubsub
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def publisher(monkeypatch):
+    fake = FakePublisher()
+    monkeypatch.setattr(bridge, "_publisher", fake)
+    return fake
+
+
+def progress(status):
+    return DocumentProcessingEvent(
+        document_id=uuid.uuid4(), filename="aims.pdf", status=status, progress_percent=40,
+    ).to_event()
+
+
+def test_worker_events_reach_subscribed_clients(publisher, monkeypatch):
+    embedding = progress("embedding")
+    assert publish_event(embedding)
+    publisher.published.append((EVENTS_CHANNEL, b"not json"))
+    publisher.published.append((EVENTS_CHANNEL, b'{"type": "unknown", "timestamp": "2024-01-01"}'))
+    assert publish_event(progress("ready"))  # Nobody subscribed to document_ready
+
+    connection_manager = ConnectionManager()
+    sent = []
+
+    async def send_to_client(client_id, event):
+        sent.append((client_id, event))
+        return True
+
+    monkeypatch.setattr(connection_manager, "send_to_client", send_to_client)
+
+    async def relay():
+        pubsub = FakePubSub(publisher.published)
+        client = FakeRedis(pubsub)
+        monkeypatch.setattr(bridge.aioredis, "from_url", lambda url: client)
+        await connection_manager.subscribe("client", [EventType.DOCUMENT_PROCESSING])
+
+        event_bridge = EventBridge(connection_manager, redis_url="redis://test")
+        await event_bridge.start()
+        await asyncio.wait_for(pubsub.drained.wait(), timeout=5)
+        await event_bridge.stop()
+        return pubsub, client
+
+    pubsub, client = asyncio.run(relay())
+
+    assert pubsub.channels == [EVENTS_CHANNEL]
+    [(client_id, event)] = sent
+    assert client_id == "client"
+    assert event.type == EventType.DOCUMENT_PROCESSING
+    assert event.payload == embedding.payload
+    assert event.timestamp == embedding.timestamp
+    assert pubsub.closed and client.closed
+
+
+def test_publish_failures_do_not_raise(monkeypatch):
+    class BrokenPublisher:
+        def publish(self, channel, data):
+            raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(bridge, "_publisher", BrokenPublisher())
+
+    assert publish_event(progress("processing")) is False
@@ -0,0 +1,97 @@
+"""
+Tests for the prompt token budget
+"""
+
+import sys
+
+import pytest
+
+from app.services import budget
+from app.services.budget import (
+    MESSAGE_OVERHEAD_TOKENS,
+    ContextBudget,
+    count_tokens,
+    fit_texts,
+)
+
+
+@pytest.fixture
+def no_tiktoken(monkeypatch):
+    """count_tokens as it behaves when tiktoken isn't installed"""
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    budget.get_tokenizer.cache_clear()
+    yield
+    budget.get_tokenizer.cache_clear()
+
+
+def message(role, words):
+    return {"role": role, "content": " ".join(["word"] * words)}
+
+
+def test_count_tokens_falls_back_to_chars_over_four(no_tiktoken):
+    assert budget.get_tokenizer() is None
+    assert count_tokens("") == 0
+    assert count_tokens("abcd") == 1
+    assert count_tokens("abcde") == 2
+    assert count_tokens("x" * 400) == 100
+
+
+def test_output_is_reserved_up_front():
+    context_budget = ContextBudget("gpt-4o", max_output_tokens=1000, context_window=5000)
+    assert context_budget.remaining == 4000
+
+    context_budget.reserve("system", "You are a grant writing assistant.")
+    assert context_budget.remaining == 4000 - context_budget.usage["system"]
+
+    tight = ContextBudget("gpt-4o", max_output_tokens=5000, context_window=5000)
+    assert tight.remaining == 0
+    assert tight.fit_history([message("user", 3)]) == []
+
+
+def test_context_window_defaults_by_model():
+    assert ContextBudget("claude-sonnet-4-20250514").context_window == 200_000
+    assert ContextBudget("unknown-model").context_window == budget.DEFAULT_CONTEXT_WINDOW
+
+
+def test_history_drops_oldest_messages_first():
+    history = [message("user" if i % 2 == 0 else "assistant", 50) for i in range(6)]
+    cost = count_tokens(history[0]["content"]) + MESSAGE_OVERHEAD_TOKENS
+    context_budget = ContextBudget("gpt-4o", max_output_tokens=0, context_window=cost * 3)
+
+    kept = context_budget.fit_history(history)
+
+    # The three newest fit, but history must start with a user message
+    assert kept == history[4:]
+    assert context_budget.usage["history"] == cost * 2
+
+
+def test_history_that_fits_is_kept_whole():
+    history = [message("user", 5), message("assistant", 5), message("user", 5)]
+
+    assert ContextBudget("gpt-4o").fit_history(history) == history
+    assert ContextBudget("gpt-4o").fit_history(None) is None
+
+
+def test_context_stops_at_the_allowance(no_tiktoken):
+    parts = ["a" * 40, "b" * 40, "c" * 40]  # 10 tokens each
+    context_budget = ContextBudget("gpt-4o", max_context_tokens=25)
+
+    context = context_budget.fit_context(parts, separator="")
+
+    assert context == "a" * 40 + "b" * 40
+    assert context_budget.usage["context"] == 20
+
+
+def test_oversized_context_block_is_dropped_with_everything_after_it(no_tiktoken):
+    parts = ["a" * 40, "x" * 4000, "c" * 40]
+    context_budget = ContextBudget("gpt-4o", max_context_tokens=100)
+
+    assert context_budget.fit_context(parts, separator="") == "a" * 40
+    assert context_budget.fit_context(["x" * 4000]) == ""
+
+
+def test_fit_texts_counts_separators(no_tiktoken):
+    parts = ["a" * 40, "b" * 40]
+
+    assert fit_texts(parts, 20, separator="") == parts
+    assert fit_texts(parts, 20, separator="----") == parts[:1]
@@ -0,0 +1,130 @@
+"""
+Tests for COPY chunk writes and batched embedding updates
+"""
+
+import io
+import json
+import re
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.db import bulk
+from app.db.bulk import CHUNK_COLUMNS, copy_chunks, update_embeddings, vector_literal
+
+_UNESCAPES = {"\\\\": "\\", "\\t": "\t", "\\n": "\n", "\\r": "\r"}
+
+
+def parse_copy(data):
+    """Rows of a COPY text-format buffer, decoded the way Postgres reads them"""
+    rows = []
+    for line in data.split("\n")[:-1]:
+        rows.append([
+            None if field == "\\N" else re.sub(r"\\[\\tnr]", lambda m: _UNESCAPES[m.group()], field)
+            for field in line.split("\t")
+        ])
+    return rows
+
+
+class CopyCursor:
+    def __init__(self):
+        self.copies = []
+        self.closed = False
+
+    def copy_expert(self, sql, buffer):
+        self.copies.append((sql, buffer.read()))
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def cursor():
+    return CopyCursor()
+
+
+@pytest.fixture
+def db(cursor):
+    connection = SimpleNamespace(connection=SimpleNamespace(cursor=lambda: cursor))
+    return SimpleNamespace(connection=lambda: connection)
+
+
+@pytest.mark.parametrize("content", [
+    "C:\\grants\\aims.docx",
+    "Budget\tYear 1\tYear 2",
+    "Line one\nLine two",
+    "Windows line\r\nending",
+    "\\N",
+    "Naïve Bayes — résumé, 日本語, 🧬",
+    "",
+])
+def test_copy_round_trips_text(db, cursor, content):
+    assert copy_chunks(db, [{"content": content, "chunk_index": 0}]) == 1
+
+    [(_, data)] = cursor.copies
+    [row] = parse_copy(data)
+    assert len(row) == len(CHUNK_COLUMNS)
+    assert dict(zip(CHUNK_COLUMNS, row))["content"] == content
+    assert cursor.closed
+
+
+def test_copy_encodes_nulls_metadata_and_vectors(db, cursor):
+    chunk_id, document_id = uuid.uuid4(), uuid.uuid4()
+    metadata = {"heading": "Aim 1\tSignaling", "path": "a\\b"}
+
+    copy_chunks(db, [
+        {"id": chunk_id, "document_id": document_id, "chunk_index": 3, "content": None,
+         "embedding": [0.5, 1, -2.25], "metadata_json": metadata},
+        {"document_id": document_id, "chunk_index": 4, "content": "x", "metadata_json": None},
+    ])
+
+    [(sql, data)] = cursor.copies
+    assert sql == f"COPY document_chunks ({', '.join(CHUNK_COLUMNS)}) FROM STDIN"
+    first, second = (dict(zip(CHUNK_COLUMNS, row)) for row in parse_copy(data))
+
+    assert first["id"] == str(chunk_id) and first["document_id"] == str(document_id)
+    assert first["chunk_index"] == "3"
+    assert first["content"] is None
+    assert first["embedding"] == "[0.5,1.0,-2.25]"
+    assert json.loads(first["metadata_json"]) == metadata
+    assert first["duplicate_of"] is None and first["page_number"] is None
+
+    assert second["metadata_json"] is None and second["embedding"] is None
+    # Generated ids, one timestamp for the batch
+    assert uuid.UUID(second["id"]) != chunk_id
+    assert second["created_at"] == first["created_at"]
+
+
+def test_copy_skips_empty_batches(db, cursor):
+    assert copy_chunks(db, iter([])) == 0
+    assert cursor.copies == []
+
+
+def test_vector_literal():
+    assert vector_literal(None) is None
+    assert vector_literal([]) == "[]"
+    assert vector_literal([1, 0.25]) == "[1.0,0.25]"
+
+
+def test_update_embeddings_sends_one_batch(db, cursor, monkeypatch):
+    calls = []
+
+    def execute_values(cur, sql, rows, page_size):
+        calls.append((sql, rows, page_size))
+        cur.rowcount = len(rows)
+
+    monkeypatch.setattr(bulk, "execute_values", execute_values)
+    first, second = uuid.uuid4(), uuid.uuid4()
+
+    assert update_embeddings(db, [(first, [0.1, 0.2]), (second, [1, 2])]) == 2
+
+    [(sql, rows, page_size)] = calls
+    assert rows == [(str(first), "[0.1,0.2]"), (str(second), "[1.0,2.0]")]
+    assert page_size == 2
+    assert "embedding = v.embedding::vector" in sql
+    assert cursor.closed
+
+    calls.clear()
+    assert update_embeddings(db, []) == 0
+    assert calls == []
@@ -0,0 +1,140 @@
+"""
+Tests for the offline bulk ingestion CLI
+"""
+
+import tempfile
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.processors.chunking import TextChunker
+from app.processors.document_processor import DocumentProcessor
+from app.tasks import bulk_ingest
+from app.tasks.bulk_ingest import (
+    SPOOL_CHUNK,
+    SPOOL_SEGMENT,
+    BulkIngester,
+    extract_and_chunk,
+    read_spool,
+)
+
+TEXT = "".join(
+    f"Aim {i}. This paragraph describes experiment {i} of the renewal in some detail.\n\n"
+    for i in range(200)
+)
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "spools"
+    directory.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(directory))
+    return directory
+
+
+@pytest.fixture
+def aims(tmp_path):
+    path = tmp_path / "papers" / "aims.txt"
+    path.parent.mkdir()
+    path.write_text(TEXT)
+    return path
+
+
+def test_extraction_is_spooled_to_disk(spool_dir, aims):
+    result = extract_and_chunk(str(aims))
+
+    assert set(result) == {"mime_type", "extractor", "spool"}
+    assert result["mime_type"] == "text/plain"
+    records = list(read_spool(result["spool"]))
+    segments = [record for kind, record in records if kind == SPOOL_SEGMENT]
+    chunks = [record for kind, record in records if kind == SPOOL_CHUNK]
+
+    assert "".join(text for _, text in segments) == TEXT
+    assert chunks == list(TextChunker().iter_chunks(DocumentProcessor(str(aims)).iter_segments()))
+    assert len(chunks) > 1
+
+
+def test_failed_extraction_leaves_no_spool(spool_dir, aims, monkeypatch):
+    def iter_segments(self):
+        yield 1, "First page"
+        raise RuntimeError("corrupt page 2")
+
+    monkeypatch.setattr(DocumentProcessor, "iter_segments", iter_segments)
+
+    with pytest.raises(RuntimeError):
+        extract_and_chunk(str(aims))
+
+    assert list(spool_dir.iterdir()) == []
+
+
+class IngestSession:
+    def __init__(self):
+        self.added = []
+        self.commits = 0
+
+    def add(self, document):
+        self.added.append(document)
+
+    def flush(self):
+        for document in self.added:
+            document.id = document.id or uuid.uuid4()
+
+    def commit(self):
+        self.commits += 1
+
+    def expunge(self, document):
+        pass
+
+
+class FakeFrameWriter:
+    def __init__(self, db, document_id):
+        self.texts = []
+        self.page_offsets = []
+
+    def write(self, page_number, text):
+        self.texts.append(text)
+
+    def close(self):
+        pass
+
+
+def test_store_writes_chunks_in_bounded_batches(spool_dir, aims, monkeypatch):
+    batches = []
+    writers = []
+
+    def frame_writer(db, document_id):
+        writers.append(FakeFrameWriter(db, document_id))
+        return writers[-1]
+
+    monkeypatch.setattr(bulk_ingest, "TextFrameWriter", frame_writer)
+    monkeypatch.setattr(
+        bulk_ingest, "copy_chunks", lambda db, rows: batches.append(list(rows)) or len(batches[-1])
+    )
+    monkeypatch.setattr(bulk_ingest, "stage_blob_sync", lambda db, path, *args: path)
+    monkeypatch.setattr(bulk_ingest, "reference_blob_sync", lambda db, file_hash, size: None)
+    monkeypatch.setattr(bulk_ingest, "get_detector", lambda db, project_id: None)
+    monkeypatch.setattr(
+        bulk_ingest, "get_embedding_service", lambda: SimpleNamespace(is_available=lambda: False)
+    )
+    db = IngestSession()
+    ingester = BulkIngester(aims.parent, uuid.uuid4(), embed_batch_size=2, embed_concurrency=2)
+    result = extract_and_chunk(str(aims))
+    expected = [record for kind, record in read_spool(result["spool"]) if kind == SPOOL_CHUNK]
+
+    chunk_count = ingester._store(db, aims, "abc123", len(TEXT), None, result)
+
+    assert chunk_count == len(expected) > 4
+    assert [len(batch) for batch in batches[:-1]] == [4] * (len(batches) - 1)
+    assert 0 < len(batches[-1]) <= 4
+    rows = [row for batch in batches for row in batch]
+    assert [row["chunk_index"] for row in rows] == [c["index"] for c in expected]
+    assert [row["content_hash"] for row in rows] == [c["content_hash"] for c in expected]
+
+    [document] = db.added
+    assert "".join(writers[0].texts) == TEXT
+    assert {row["document_id"] for row in rows} == {document.id}
+    assert document.word_count == len(TEXT.split())
+    assert document.metadata_json["ingest"]["chunk_count"] == chunk_count
+    assert document.metadata_json["source_path"] == "aims.txt"
+    assert db.commits == 1
@@ -0,0 +1,72 @@
+"""
+Tests for the /api/chat/stream Server-Sent Events contract
+"""
+
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from app.api.chat import ChatRequest, stream_chat_events
+from app.services import embeddings
+from app.services.chat import ChatService
+from app.services.search import SearchResult
+
+
+@pytest.fixture
+def fake_llm(settings, monkeypatch):
+    settings.llm_provider = "fake"
+    settings.embedding_provider = "fake"
+    # Don't leave a fake embedding singleton behind for other tests
+    monkeypatch.setattr(embeddings, "_embedding_service", None)
+    settings.fake_llm_ttft_ms = 0
+    settings.fake_llm_tokens_per_sec = 0
+    settings.fake_rate_limit_rate = 0.0
+    settings.fake_timeout_rate = 0.0
+
+
+def parse(raw_events):
+    events = []
+    for raw in raw_events:
+        lines = raw.rstrip("\n").split("\n")
+        assert lines[0].startswith("event: ") and lines[1].startswith("data: ")
+        events.append((lines[0][len("event: "):], json.loads(lines[1][len("data: "):])))
+    return events
+
+
+def stream(request):
+    sources = [SearchResult(uuid.uuid4(), uuid.uuid4(), "Specific aims text", 0.9, 0, "aims.pdf")]
+
+    async def collect():
+        return [
+            event async for event in
+            # Sources are passed in, so the session is never used
+            stream_chat_events(ChatService(db=object()), request, None, sources)
+        ]
+
+    return parse(asyncio.run(collect()))
+
+
+def test_events_arrive_as_sources_deltas_usage(fake_llm):
+    events = stream(ChatRequest(message="Summarize the aims"))
+    names = [name for name, _ in events]
+
+    assert names[0] == "sources"
+    assert events[0][1]["sources"][0]["content"] == "Specific aims text"
+    assert names[-1] == "usage"
+    assert set(names[1:-1]) == {"delta"}
+    assert "".join(data["text"] for _, data in events[1:-1])
+
+    usage = events[-1][1]
+    assert usage["model"] == "fake-llm"
+    assert usage["prompt_tokens"] > 0 and usage["completion_tokens"] > 0
+
+
+def test_provider_failure_ends_with_error_instead_of_usage(fake_llm, settings):
+    settings.fake_rate_limit_rate = 1.0
+
+    events = stream(ChatRequest(message="Summarize the aims"))
+
+    assert [name for name, _ in events] == ["sources", "error"]
+    assert "rate limit" in events[-1][1]["message"].lower()
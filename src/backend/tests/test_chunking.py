@@ -0,0 +1,82 @@
+"""
+Tests for the token-aware chunker
+"""
+
+import pytest
+
+from app.processors.chunking import TextChunker, content_hash
+from app.services.budget import count_tokens
+
+
+def chunk(text, segment_size=None, **kwargs):
+    size = segment_size or max(len(text), 1)
+    segments = [(None, text[i:i + size]) for i in range(0, len(text), size)] or [(None, "")]
+    return list(TextChunker(**kwargs).iter_chunks(segments))
+
+
+def assert_consistent(text, chunks, chunk_size=256):
+    for c in chunks:
+        assert text[c["start_char"]:c["end_char"]] == c["text"]
+        assert c["content_hash"] == content_hash(c["text"])
+        assert c["token_count"] <= chunk_size
+    assert [c["index"] for c in chunks] == list(range(len(chunks)))
+
+
+@pytest.mark.parametrize("text", [
+    "x" * 100_000,
+    "Introduction. " + "y" * 30_000 + " closing words.",
+    "漢字" * 20_000,
+], ids=["one-run", "run-between-sentences", "cjk"])
+def test_text_without_whitespace_is_split_to_chunk_size(text):
+    chunks = chunk(text, segment_size=7_000)
+
+    assert len(chunks) > 1
+    assert_consistent(text, chunks)
+    assert max(count_tokens(c["text"]) for c in chunks) <= 256
+    # Every non-space character lands in some chunk
+    covered = set()
+    for c in chunks:
+        covered.update(range(c["start_char"], c["end_char"]))
+    assert all(i in covered for i, ch in enumerate(text) if not ch.isspace())
+
+
+def test_empty_and_blank_text():
+    assert chunk("") == []
+    assert chunk(" \n\n \t ") == []
+
+
+def test_chunks_overlap_and_advance():
+    text = " ".join(f"Sentence number {i} describes the aim." for i in range(400))
+    chunks = chunk(text, chunk_size=64, chunk_overlap=16)
+
+    assert_consistent(text, chunks, chunk_size=64)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current["start_char"] <= previous["end_char"]  # Overlap or adjacent
+        assert current["end_char"] > previous["end_char"]  # Always new text
+
+
+def test_segment_boundaries_do_not_change_chunks():
+    text = "\n\n".join(f"Paragraph {i}. " + "word " * 40 for i in range(50))
+
+    whole = chunk(text)
+    streamed = chunk(text, segment_size=97)
+
+    assert [(c["start_char"], c["end_char"]) for c in streamed] == [
+        (c["start_char"], c["end_char"]) for c in whole
+    ]
+
+
+def test_headings_start_chunks_and_set_sections():
+    text = "Specific Aims\nAim one text.\n\nResearch Strategy\nSignificance\nWhy it matters."
+    chunks = chunk(text)
+
+    assert [c["section"] for c in chunks] == ["specific_aims", "significance"]
+    assert chunks[1]["text"].startswith("Research Strategy")
+
+
+def test_pages_follow_segments():
+    segments = [(1, "First page text. "), (2, "Second page text. "), (3, "Third.")]
+    chunks = list(TextChunker(chunk_size=6, chunk_overlap=0).iter_chunks(segments))
+
+    assert chunks[0]["page_number"] == 1
+    assert chunks[-1]["page_number"] == 3
@@ -0,0 +1,101 @@
+"""
+Tests for cloning an identical, already-processed upload
+"""
+
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+from app.db.models import ProcessingStatus
+from app.services import dedup
+from app.services.near_duplicates import band_keys, minhash
+
+SOURCE_PROJECT = uuid.UUID(int=1)
+TARGET_PROJECT = uuid.UUID(int=2)
+
+
+class CloneSession:
+    """Records statements, and returns the given clones and their source groups"""
+
+    def __init__(self, groups=()):
+        self.groups = list(groups)
+        self.statements = []
+
+    async def flush(self):
+        pass
+
+    async def execute(self, statement, params=None):
+        self.statements.append((statement, params))
+        if statement is dedup.CLONE_CHUNKS_SQL:
+            return SimpleNamespace(rowcount=len(self.groups))
+        if statement is dedup.CLONED_GROUPS_SQL:
+            return SimpleNamespace(all=lambda: self.groups)
+        return None
+
+    def executed(self, table):
+        return [
+            params for statement, params in self.statements
+            if getattr(getattr(statement, "table", None), "name", None) == table
+        ]
+
+
+def document(project_id):
+    return SimpleNamespace(
+        id=uuid.uuid4(), project_id=project_id, page_count=3, word_count=900,
+        extracted_text=None, metadata_json={"title": "Aims"}, processing_status=None,
+    )
+
+
+def clone(groups, target_project):
+    db = CloneSession(groups)
+    source, target = document(SOURCE_PROJECT), document(target_project)
+    copied = asyncio.run(dedup.clone_processed_document(db, source, target))
+    return db, source, target, copied
+
+
+def test_clone_copies_results_server_side():
+    db, source, target, copied = clone([], SOURCE_PROJECT)
+
+    assert copied == 0
+    assert target.processing_status == ProcessingStatus.COMPLETED
+    assert target.page_count == 3 and target.word_count == 900
+    assert target.metadata_json == {"title": "Aims", "deduplicated_from": str(source.id)}
+    assert [statement for statement, _ in db.statements] == [
+        dedup.CLONE_TEXT_FRAMES_SQL, dedup.CLONE_CHUNKS_SQL,
+    ]
+    assert db.statements[1][1] == {"source_id": source.id, "target_id": target.id}
+
+
+def test_same_project_clone_stays_in_the_source_group():
+    signature = minhash("aims of the renewal")
+    db, _, _, _ = clone([(uuid.uuid4(), uuid.uuid4(), signature)], SOURCE_PROJECT)
+
+    # The source group is already indexed in this project
+    assert dedup.CLONED_GROUPS_SQL not in [statement for statement, _ in db.statements]
+    assert db.executed("chunk_signatures") == []
+
+
+def test_cross_project_clone_is_indexed_in_the_target_project():
+    aims, budget = minhash("aims of the renewal"), minhash("budget justification")
+    aims_group, budget_group = uuid.uuid4(), uuid.uuid4()
+    first, repeat, other = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    db, _, _, copied = clone(
+        [(first, aims_group, aims), (repeat, aims_group, aims), (other, budget_group, budget)],
+        TARGET_PROJECT,
+    )
+
+    assert copied == 3
+    [relinks] = db.executed("document_chunks")
+    assert relinks == [
+        {"id": first, "duplicate_of": None},
+        {"id": repeat, "duplicate_of": first},
+        {"id": other, "duplicate_of": None},
+    ]
+    [signatures] = db.executed("chunk_signatures")
+    assert signatures == [
+        {"chunk_id": first, "project_id": TARGET_PROJECT, "minhash": aims,
+         "band_keys": band_keys(TARGET_PROJECT, aims)},
+        {"chunk_id": other, "project_id": TARGET_PROJECT, "minhash": budget,
+         "band_keys": band_keys(TARGET_PROJECT, budget)},
+    ]
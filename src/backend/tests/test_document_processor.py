@@ -0,0 +1,42 @@
+"""
+Tests for streamed extraction and document statistics
+"""
+
+from app.processors import extractors
+from app.processors.document_processor import (
+    DocumentProcessor,
+    ExtractionResult,
+    WordCounter,
+    process_document,
+)
+
+
+def test_word_counter_joins_words_cut_at_boundaries():
+    text = "alpha beta  gamma\ndelta epsilon"
+    for size in range(1, len(text) + 1):
+        counter = WordCounter()
+        for i in range(0, len(text), size):
+            counter.add(text[i:i + size])
+        assert counter.count == len(text.split()), size
+
+
+def test_streamed_word_count_matches_extract(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractors, "TXT_BLOCK_CHARS", 7)
+    path = tmp_path / "notes.txt"
+    path.write_text("Specific aims of the proposed research program\n" * 20)
+
+    pipeline = process_document(str(path), batch_size=4)
+    for _ in pipeline:
+        pass
+
+    processor = DocumentProcessor(str(path))
+    assert pipeline.word_count == processor.get_word_count(processor.extract_text()) == 7 * 20
+
+
+def test_segments_round_trip():
+    result = ExtractionResult.from_segments([(1, "one "), (2, ""), (3, "three")])
+
+    assert result.text == "one three"
+    assert result.page_offsets == [0, 4, 4]
+    assert list(result.iter_segments()) == [(1, "one "), (2, ""), (3, "three")]
+    assert result.page_for_offset(5) == 3
@@ -0,0 +1,217 @@
+"""
+Tests for the document ingest tasks
+"""
+
+import uuid
+from collections import namedtuple
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.processors.chunking import content_hash
+from app.tasks import document_tasks
+from app.tasks.document_tasks import (
+    STAGE_CHUNKED,
+    STAGE_EXTRACTED,
+    chunk_stage,
+    embed_range,
+    embed_workflow,
+    extract_stage,
+    get_checkpoint,
+    load_reusable_embeddings,
+)
+
+Chunk = namedtuple("Chunk", "id content content_hash start_char end_char duplicate_of")
+
+
+class EmbedSession:
+    """Answers embed_range's queries: the range's chunks, the parent's embeddings, the count"""
+
+    def __init__(self, chunks, parent_embeddings):
+        self.chunks = chunks
+        self.parent_embeddings = parent_embeddings
+
+    def execute(self, statement):
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        if "coalesce" in sql:
+            hashes = next(v for v in statement.compile().params.values() if isinstance(v, list))
+            return [(h, e) for h, e in self.parent_embeddings.items() if h in hashes]
+        if "count(" in sql:
+            return SimpleNamespace(one=lambda: (len(self.chunks), len(self.chunks)))
+        return SimpleNamespace(all=lambda: self.chunks)
+
+    def commit(self):
+        pass
+
+
+class FakeEmbeddingService:
+    def __init__(self):
+        self.embedded = []
+
+    def is_available(self):
+        return True
+
+    async def embed_texts(self, texts):
+        self.embedded.extend(texts)
+        return [[9.0] for _ in texts]
+
+
+@pytest.fixture
+def embedding(monkeypatch):
+    service = FakeEmbeddingService()
+    updates = []
+    monkeypatch.setattr(document_tasks, "get_embedding_service", lambda: service)
+    monkeypatch.setattr(document_tasks, "update_embeddings", lambda db, rows: updates.extend(rows))
+    monkeypatch.setattr(document_tasks, "publish_progress", lambda *args, **kwargs: None)
+    return SimpleNamespace(service=service, updates=updates)
+
+
+def test_new_version_reuses_embeddings_of_unchanged_chunks(embedding, monkeypatch):
+    text = "Aim one is unchanged. Aim two was edited."
+    unchanged, edited = text[:21], text[22:]
+    # Offset-referenced chunks: no content, text comes from the frames
+    monkeypatch.setattr(
+        document_tasks, "read_range_sync",
+        lambda db, document_id, offset, length: text[offset:offset + length],
+    )
+    chunks = [
+        Chunk(uuid.uuid4(), None, content_hash(unchanged), 0, 21, None),
+        Chunk(uuid.uuid4(), None, content_hash(edited), 22, len(text), None),
+    ]
+    parent = {content_hash(unchanged): [1.0], content_hash("Aim two was drafted."): [2.0]}
+    document = SimpleNamespace(id=uuid.uuid4(), parent_id=uuid.uuid4(), project_id=None)
+
+    stats = embed_range(EmbedSession(chunks, parent), document, 0, 2)
+
+    assert stats == {"embeddings_generated": 1, "embeddings_reused": 1}
+    assert embedding.service.embedded == [edited]
+    assert embedding.updates == [(chunks[0].id, [1.0]), (chunks[1].id, [9.0])]
+
+
+def test_reuse_query_hashes_rows_written_without_content_hash():
+    captured = []
+
+    class Capture:
+        def execute(self, statement):
+            captured.append(statement)
+            return []
+
+    load_reusable_embeddings(Capture(), uuid.uuid4(), {"abc"})
+
+    sql = str(captured[0].compile(dialect=postgresql.dialect()))
+    assert (
+        "coalesce(document_chunks.content_hash, "
+        "encode(sha256(convert_to(document_chunks.content, %(convert_to_1)s)), %(encode_1)s))"
+    ) in sql
+
+
+class TaskSession:
+    """A Session whose document query always finds the same document"""
+
+    def __init__(self, document):
+        self.document = document
+        self.rollbacks = 0
+
+    def query(self, model):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def first(self):
+        return self.document
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+def test_document_is_marked_failed_only_after_the_last_retry(monkeypatch):
+    document = SimpleNamespace(id=uuid.uuid4(), project_id=None, metadata_json=None)
+    db = TaskSession(document)
+    failures = []
+
+    def extract_stage(db, document, file_path):
+        raise RuntimeError("extractor crashed")
+
+    monkeypatch.setattr(document_tasks, "SessionLocal", lambda: db)
+    monkeypatch.setattr(document_tasks, "extract_stage", extract_stage)
+    monkeypatch.setattr(document_tasks, "publish_progress", lambda *args, **kwargs: None)
+    monkeypatch.setattr(
+        document_tasks, "mark_failed",
+        lambda db, document_id, error, queue: failures.append(str(error)),
+    )
+
+    # Eager: retries run inline, without the countdown
+    result = document_tasks.process_document_task.apply(args=(str(document.id), "blob"))
+
+    assert result.failed()
+    max_retries = document_tasks.process_document_task.max_retries
+    assert db.rollbacks == max_retries
+    assert failures == ["extractor crashed"]
+
+
+class CheckpointSession:
+    """Commits are counted; the document has no text frames"""
+
+    def __init__(self):
+        self.commits = 0
+
+    def execute(self, statement):
+        return SimpleNamespace(first=lambda: None)
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_resumed_run_skips_finished_stages(monkeypatch):
+    def no_blob_store():
+        raise AssertionError("extraction ran again")
+
+    written = []
+    monkeypatch.setattr(document_tasks, "get_blob_store", no_blob_store)
+    monkeypatch.setattr(
+        document_tasks, "copy_chunks", lambda db, rows: written.extend(rows) or len(rows)
+    )
+    db = CheckpointSession()
+    document = SimpleNamespace(
+        id=uuid.uuid4(), project_id=None,
+        extracted_text="Specific Aims\n\nAim 1 studies signaling. " * 20,
+        metadata_json={"title": "Aims", "ingest": {"stage": STAGE_EXTRACTED, "page_offsets": [0]}},
+    )
+
+    extract_stage(db, document, "blob")
+    chunk_count = chunk_stage(db, document)
+
+    assert chunk_count == len(written) > 0
+    assert [row["chunk_index"] for row in written] == list(range(chunk_count))
+    assert get_checkpoint(document)["stage"] == STAGE_CHUNKED
+    assert document.metadata_json["title"] == "Aims"
+    assert db.commits == 1
+
+    # Another retry finds both stages done
+    extract_stage(db, document, "blob")
+    assert chunk_stage(db, document) == chunk_count
+    assert len(written) == chunk_count and db.commits == 1
+
+
+def test_embed_workflow_fans_out_ranges_on_one_queue(settings):
+    settings.ingest_batch_size = 100
+
+    workflow = embed_workflow("doc", 250, "bulk")
+
+    assert [task.args for task in workflow.tasks] == [
+        ("doc", 0, 100), ("doc", 100, 200), ("doc", 200, 250),
+    ]
+    assert all(task.name == document_tasks.embed_chunks_task.name for task in workflow.tasks)
+    assert workflow.body.name == document_tasks.finalize_document_task.name
+    assert workflow.body.args == ("doc",)
+    for signature in [*workflow.tasks, workflow.body]:
+        assert signature.kwargs == {"queue": "bulk"}
+        assert signature.options["queue"] == "bulk"
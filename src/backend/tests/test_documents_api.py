@@ -0,0 +1,100 @@
+"""
+Tests for the documents API
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import documents
+from app.db.models import ProcessingStatus
+
+NOW = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+class BatchSession:
+    """Returns the batch and its documents' (status, count, last update) groups"""
+
+    def __init__(self, batch, groups):
+        self.batch = batch
+        self.groups = groups
+
+    async def get(self, model, key):
+        return self.batch if self.batch and key == self.batch.id else None
+
+    async def execute(self, statement):
+        return iter(self.groups)
+
+
+@pytest.fixture(autouse=True)
+def fixed_now(monkeypatch):
+    monkeypatch.setattr(documents, "datetime", FixedDatetime)
+
+
+def batch_progress(total, groups, started_ago, skipped=0):
+    batch = SimpleNamespace(
+        id=uuid.uuid4(),
+        document_ids=[str(uuid.uuid4()) for _ in range(total)],
+        skipped_json=[{"filename": f"dup{i}.pdf"} for i in range(skipped)],
+        created_at=NOW - timedelta(seconds=started_ago),
+    )
+    return asyncio.run(documents.get_batch_progress(batch.id, BatchSession(batch, groups)))
+
+
+def test_progress_of_a_running_batch():
+    progress = batch_progress(10, [
+        (ProcessingStatus.COMPLETED, 4, NOW - timedelta(seconds=5)),
+        (ProcessingStatus.FAILED, 1, NOW - timedelta(seconds=30)),
+        (ProcessingStatus.PROCESSING, 2, NOW),
+        (ProcessingStatus.PENDING, 3, NOW - timedelta(seconds=100)),
+    ], started_ago=100, skipped=2)
+
+    assert (progress.total, progress.done, progress.failed) == (10, 4, 1)
+    assert (progress.processing, progress.pending, progress.skipped) == (2, 3, 2)
+    assert progress.elapsed_seconds == 100.0
+    # Five finished in 100 seconds, five to go
+    assert progress.docs_per_second == 0.05
+    assert progress.eta_seconds == 100.0
+
+
+def test_finished_batch_measures_until_its_last_document():
+    progress = batch_progress(4, [
+        (ProcessingStatus.COMPLETED, 3, NOW - timedelta(seconds=600)),
+        (ProcessingStatus.FAILED, 1, NOW - timedelta(seconds=620)),
+    ], started_ago=640)
+
+    assert progress.elapsed_seconds == 40.0
+    assert progress.docs_per_second == 0.1
+    assert progress.eta_seconds == 0.0
+
+
+def test_batch_with_nothing_finished_has_no_eta():
+    progress = batch_progress(3, [(ProcessingStatus.PENDING, 3, NOW)], started_ago=10)
+
+    assert progress.pending == 3 and progress.done == 0
+    assert progress.docs_per_second is None
+    assert progress.eta_seconds is None
+
+
+def test_empty_batch_is_done():
+    progress = batch_progress(0, [], started_ago=10, skipped=3)
+
+    assert progress.total == 0 and progress.skipped == 3
+    assert progress.eta_seconds == 0.0
+
+
+def test_unknown_batch_is_not_found():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(documents.get_batch_progress(uuid.uuid4(), BatchSession(None, [])))
+
+    assert error.value.status_code == 404
@@ -0,0 +1,120 @@
+"""
+Tests for streaming DOCX extraction
+"""
+
+import zipfile
+
+import pytest
+from docx import Document as DocxDocument
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from app.processors import docx_stream
+from app.processors.docx_stream import CELL_SEPARATOR, iter_docx_blocks
+
+
+def python_docx_blocks(path):
+    """The blocks iter_docx_blocks should produce, read with python-docx"""
+    doc = DocxDocument(path)
+
+    def table_lines(table):
+        for row in table.rows:
+            cells = []
+            for cell in row.cells:
+                # Nested tables come out before the row that contains them
+                for nested in cell.tables:
+                    yield from table_lines(nested)
+                cells.append(" ".join(p.text.strip() for p in cell.paragraphs if p.text.strip()))
+            if any(cells):
+                yield CELL_SEPARATOR.join(cells)
+
+    blocks = []
+    for child in doc.element.body.iterchildren():
+        if child.tag == docx_stream.W_P:
+            text = Paragraph(child, doc).text
+            if text.strip():
+                blocks.append(text)
+        elif child.tag == docx_stream.W_TBL:
+            blocks.extend(table_lines(Table(child, doc)))
+    return blocks
+
+
+@pytest.fixture
+def docx_with_tables(tmp_path):
+    doc = DocxDocument()
+    doc.add_paragraph("Specific Aims")
+    doc.add_paragraph("Aim 1 studies signaling.")
+
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Year"
+    table.cell(0, 1).text = "Milestone"
+    table.cell(1, 0).text = "1"
+    cell = table.cell(1, 1)
+    cell.text = "Recruit cohort"
+    cell.add_paragraph("and consent")
+    nested = cell.add_table(rows=1, cols=2)
+    nested.cell(0, 0).text = "Site A"
+    nested.cell(0, 1).text = "40 patients"
+
+    doc.add_paragraph("")
+    doc.add_paragraph("Approach\tand rationale")
+
+    path = tmp_path / "aims.docx"
+    doc.save(path)
+    return str(path)
+
+
+def test_blocks_match_python_docx(docx_with_tables):
+    blocks = list(iter_docx_blocks(docx_with_tables))
+
+    assert blocks == python_docx_blocks(docx_with_tables)
+    assert blocks == [
+        "Specific Aims",
+        "Aim 1 studies signaling.",
+        "Year | Milestone",
+        "Site A | 40 patients",
+        "1 | Recruit cohort and consent",
+        "Approach\tand rationale",
+    ]
+
+
+def test_headers_and_footers_wrap_the_body(tmp_path):
+    doc = DocxDocument()
+    section = doc.sections[0]
+    section.header.paragraphs[0].text = "Running title"
+    section.footer.paragraphs[0].text = "Page footer"
+    doc.add_paragraph("Body text")
+    path = tmp_path / "sections.docx"
+    doc.save(path)
+
+    assert list(iter_docx_blocks(str(path))) == ["Running title", "Body text", "Page footer"]
+
+
+def test_processed_elements_are_released(tmp_path, monkeypatch):
+    doc = DocxDocument()
+    for i in range(300):
+        doc.add_paragraph(f"Paragraph {i}")
+        if i % 50 == 0:
+            doc.add_table(rows=2, cols=3).cell(0, 0).text = f"Table {i}"
+    path = tmp_path / "long.docx"
+    doc.save(path)
+
+    roots = []
+    iterparse = etree.iterparse
+
+    def recording_iterparse(*args, **kwargs):
+        for event, elem in iterparse(*args, **kwargs):
+            if not roots:
+                roots.append(elem.getroottree().getroot())
+            yield event, elem
+
+    monkeypatch.setattr(docx_stream.etree, "iterparse", recording_iterparse)
+
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as stream:
+        blocks = list(docx_stream._iter_part_blocks(stream))
+
+    assert len(blocks) == 306
+    # Parsed ahead, the full tree has over a thousand elements. Processed
+    # paragraphs and tables are cleared and detached from the body.
+    assert sum(1 for _ in roots[0].iter()) < 20
@@ -0,0 +1,111 @@
+"""
+Tests for the extractor registry and parallel PDF extraction
+"""
+
+import billiard
+import pytest
+
+from app.processors import extractors
+from app.processors.extractors import extract_pdf_pypdf, registry
+from tests.pdfs import write_pdf
+
+PAGE_COUNT = 12
+
+
+@pytest.fixture
+def large_pdf(tmp_path):
+    path = tmp_path / "large.pdf"
+    write_pdf(path, [f"Page {n} text" for n in range(1, PAGE_COUNT + 1)])
+    return str(path)
+
+
+def _extract_in_prefork_child(path, results):
+    """Stand-in for a Celery prefork child: a daemonic billiard process"""
+    from app.config import get_settings
+
+    settings = get_settings()
+    settings.pdf_parallel_page_threshold = 2
+    settings.pdf_max_workers = 2
+    settings.pdf_pages_per_task = 3
+
+    used_pool = []
+    parallel = extractors._iter_pdf_pages_parallel
+
+    def tracking(*args):
+        used_pool.append(True)
+        yield from parallel(*args)
+
+    extractors._iter_pdf_pages_parallel = tracking
+    try:
+        pages = list(extract_pdf_pypdf(path))
+        results.put((bool(used_pool), pages, None))
+    except Exception as e:
+        results.put((bool(used_pool), None, repr(e)))
+
+
+def test_parallel_pdf_extraction_in_daemon_process(large_pdf):
+    context = billiard.get_context("fork")
+    results = context.Queue()
+    child = context.Process(target=_extract_in_prefork_child, args=(large_pdf, results))
+    child.daemon = True
+    child.start()
+
+    used_pool, pages, error = results.get(timeout=60)
+    child.join(timeout=10)
+
+    assert error is None
+    assert used_pool
+    assert pages == [(n, f"Page {n} text") for n in range(1, PAGE_COUNT + 1)]
+    assert child.exitcode == 0
+
+
+def test_parallel_matches_serial(large_pdf, settings):
+    settings.pdf_pages_per_task = 5
+    settings.pdf_max_workers = 2
+
+    parallel = list(extractors._iter_pdf_pages_parallel(large_pdf, PAGE_COUNT))
+
+    assert parallel == [f"Page {n} text" for n in range(1, PAGE_COUNT + 1)]
+
+
+def test_registry_override(settings):
+    settings.extractor_overrides = {"pdf": "pypdfium2"}
+    assert registry.get("pdf").name == "pypdfium2"
+
+    settings.extractor_overrides = {"pdf": "missing"}
+    with pytest.raises(ValueError):
+        registry.get("pdf")
+
+
+def test_parallel_path_does_not_parse_in_the_parent(large_pdf, settings, monkeypatch):
+    settings.pdf_parallel_page_threshold = 2
+    settings.pdf_max_workers = 2
+    readers = []
+    monkeypatch.setattr(extractors, "PdfReader", lambda path: readers.append(path))
+    monkeypatch.setattr(
+        extractors, "_iter_pdf_pages_parallel",
+        lambda path, page_count: (f"page {n}" for n in range(page_count)),
+    )
+
+    pages = list(extract_pdf_pypdf(large_pdf))
+
+    assert len(pages) == PAGE_COUNT
+    assert readers == []
+
+
+def test_worker_reuses_its_reader_across_ranges(large_pdf, monkeypatch):
+    monkeypatch.setattr(extractors, "_worker_reader", None)
+    readers = []
+    real_reader = extractors.PdfReader
+
+    def counting_reader(path):
+        readers.append(path)
+        return real_reader(path)
+
+    monkeypatch.setattr(extractors, "PdfReader", counting_reader)
+
+    first = extractors._extract_pdf_page_range(large_pdf, 0, 3)
+    second = extractors._extract_pdf_page_range(large_pdf, 3, 6)
+
+    assert first + second == [f"Page {n} text" for n in range(1, 7)]
+    assert readers == [large_pdf]
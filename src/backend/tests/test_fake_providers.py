@@ -0,0 +1,42 @@
+"""
+Tests for the offline fake providers
+"""
+
+import asyncio
+
+import openai
+import pytest
+
+from app.services.fake_providers import FakeEmbedder, FakeLLM, FakeRateLimitError
+
+
+def test_stream_without_pacing(settings):
+    settings.fake_llm_ttft_ms = 0
+    settings.fake_llm_tokens_per_sec = 0
+
+    async def collect():
+        return [part async for part in FakeLLM().stream([{"role": "user", "content": "aims"}])]
+
+    parts = asyncio.run(collect())
+    assert parts
+    assert not parts[0].startswith(" ")
+
+
+def test_rate_limit_is_sdk_error(settings):
+    settings.fake_rate_limit_rate = 1.0
+    settings.fake_embedding_latency_ms = 0
+
+    with pytest.raises(openai.RateLimitError) as excinfo:
+        asyncio.run(FakeEmbedder(8).embed_batch(["text"]))
+
+    assert isinstance(excinfo.value, FakeRateLimitError)
+    assert excinfo.value.status_code == 429
+
+
+def test_embeddings_are_deterministic_unit_vectors():
+    embedder = FakeEmbedder(16)
+    vector = embedder.embed("specific aims")
+
+    assert vector == embedder.embed("specific aims")
+    assert vector != embedder.embed("approach")
+    assert abs(sum(v * v for v in vector) - 1.0) < 1e-9
@@ -0,0 +1,110 @@
+"""
+Tests for MinHash near-duplicate detection
+"""
+
+import random
+import uuid
+
+from app.services import near_duplicates
+from app.services.near_duplicates import (
+    NUM_PERM,
+    NearDuplicateDetector,
+    band_keys,
+    minhash,
+    similarity,
+)
+
+PROJECT = uuid.UUID(int=1)
+
+ABSTRACT = (
+    "Aim 1 will characterize the role of inflammatory signaling in early "
+    "tumor progression using longitudinal imaging and single cell profiling "
+    "of patient derived organoids across three independent cohorts"
+)
+
+
+def reference_minhash(text):
+    """The signature computed one permutation and shingle at a time"""
+    words = near_duplicates._WORD_RE.findall(text.lower())
+    if not words:
+        return None
+    size = min(near_duplicates.SHINGLE_WORDS, len(words))
+    shingles = {
+        near_duplicates._hash64(" ".join(words[i:i + size]).encode()) & near_duplicates._MAX_HASH
+        for i in range(len(words) - size + 1)
+    }
+    return [
+        min((a * s + b) % near_duplicates._MERSENNE_PRIME for s in shingles)
+        for a, b in near_duplicates._PERMUTATIONS
+    ]
+
+
+def test_vectorized_minhash_matches_reference():
+    rng = random.Random(7)
+    vocab = [f"w{i}" for i in range(300)]
+    texts = ["", "!!!", "one", "two words", ABSTRACT] + [
+        " ".join(rng.choice(vocab) for _ in range(rng.randint(1, 400))) for _ in range(50)
+    ]
+
+    for text in texts:
+        assert minhash(text) == reference_minhash(text)
+
+
+def test_signature_shape():
+    signature = minhash(ABSTRACT)
+
+    assert len(signature) == NUM_PERM
+    assert all(0 <= value < near_duplicates._MERSENNE_PRIME for value in signature)
+    assert all(isinstance(value, int) for value in signature)
+    assert len(band_keys(PROJECT, signature)) == near_duplicates.BANDS
+
+
+def test_similarity_separates_near_duplicates():
+    edited = ABSTRACT.replace("three", "four")
+
+    assert similarity(minhash(ABSTRACT), minhash(ABSTRACT.upper())) == 1.0
+    assert similarity(minhash(ABSTRACT), minhash(edited)) > 0.7
+    assert similarity(minhash(ABSTRACT), minhash("An unrelated budget justification")) < 0.2
+
+
+def test_band_keys_are_scoped_to_the_project():
+    signature = minhash(ABSTRACT)
+
+    assert set(band_keys(PROJECT, signature)).isdisjoint(band_keys(uuid.UUID(int=2), signature))
+
+
+class IndexSession:
+    """Signature rows for _load_candidates, and the rows index() inserts"""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.inserted = []
+
+    def execute(self, statement, params=None):
+        if params is not None:
+            self.inserted.extend(params)
+            return None
+        return iter(self.rows)
+
+
+def test_detector_matches_within_a_batch():
+    db = IndexSession()
+    detector = NearDuplicateDetector(db, PROJECT, threshold=0.9)
+    first, second, other = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    duplicates = detector.find([
+        (first, ABSTRACT), (second, ABSTRACT + "."), (other, "Budget justification"),
+    ])
+    detector.index()
+
+    assert duplicates == {second: first}
+    assert [row["chunk_id"] for row in db.inserted] == [first, other]
+
+
+def test_detector_matches_indexed_chunks():
+    canonical = uuid.uuid4()
+    signature = minhash(ABSTRACT)
+    db = IndexSession([(canonical, signature, band_keys(PROJECT, signature))])
+    chunk = uuid.uuid4()
+
+    assert NearDuplicateDetector(db, PROJECT).find([(chunk, ABSTRACT)]) == {chunk: canonical}
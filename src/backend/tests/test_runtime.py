@@ -0,0 +1,71 @@
+"""
+Tests for the Celery worker process runtime
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.tasks import runtime
+
+
+class FakeEngine:
+    def __init__(self):
+        self.disposals = []
+
+    def dispose(self, close=True):
+        self.disposals.append(close)
+
+
+class FakeEmbeddingService:
+    def __init__(self, http_client):
+        self.http_client = http_client
+        self.closed = False
+
+    async def close(self):
+        await self.http_client.aclose()
+        self.closed = True
+
+
+async def running_loop():
+    return asyncio.get_running_loop()
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    state = SimpleNamespace(engine=FakeEngine(), service=None)
+
+    def init_embedding_service(http_client=None):
+        state.service = FakeEmbeddingService(http_client)
+        return state.service
+
+    monkeypatch.setattr(runtime, "_loop", None)
+    monkeypatch.setattr(runtime, "sync_engine", state.engine)
+    monkeypatch.setattr(runtime, "init_embedding_service", init_embedding_service)
+    monkeypatch.setattr(runtime, "get_embedding_service", lambda: state.service)
+    monkeypatch.setattr(runtime, "get_tokenizer", lambda: None)
+    return state
+
+
+def test_worker_process_keeps_one_loop_and_client(worker):
+    runtime.init_worker_process()
+
+    # Inherited connections are dropped without closing the parent's sockets
+    assert worker.engine.disposals == [False]
+    assert isinstance(worker.service.http_client, httpx.AsyncClient)
+
+    # Every task's async code runs on the same loop
+    loop = runtime.run_async(running_loop())
+    assert runtime.run_async(running_loop()) is loop is runtime.get_loop()
+
+    runtime.shutdown_worker_process()
+
+    assert worker.service.closed and worker.service.http_client.is_closed
+    assert loop.is_closed() and runtime._loop is None
+    assert worker.engine.disposals == [False, True]
+
+    # A second shutdown signal is a no-op
+    runtime.shutdown_worker_process()
+    assert worker.engine.disposals == [False, True]
@@ -0,0 +1,167 @@
+"""
+Tests for bulk slot accounting and deferral
+"""
+
+import fnmatch
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.celery_app import QUEUE_BULK, QUEUE_MAINTENANCE, celery_app
+from app.tasks import document_tasks, scheduling
+from app.tasks.scheduling import (
+    INFLIGHT_KEY,
+    acquire_project_slot,
+    defer_document,
+    free_slots,
+    pending_projects,
+    pop_pending,
+    release_project_slot,
+)
+
+PROJECT = "project-a"
+
+
+class FakeRedis:
+    """The handful of Redis commands scheduling uses, kept in a dict"""
+
+    def __init__(self):
+        self.data = {}
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def get(self, key):
+        value = self.data.get(key)
+        return None if value is None else str(value).encode()
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def decr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) - 1
+        return self.data[key]
+
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value)
+
+    def lpop(self, key):
+        items = self.data.get(key)
+        if not items:
+            return None
+        value = items.pop(0)
+        if not items:
+            del self.data[key]
+        return value.encode()
+
+    def scan_iter(self, match):
+        return [key.encode() for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch, settings):
+    settings.bulk_max_inflight_per_project = 2
+    client = FakeRedis()
+    monkeypatch.setattr(scheduling, "_client", client)
+    return client
+
+
+def inflight(client, project_id=PROJECT):
+    return int(client.data.get(INFLIGHT_KEY.format(project_id=project_id), 0))
+
+
+def test_slots_are_limited_per_project(fake_redis):
+    assert acquire_project_slot(PROJECT, "doc-1")
+    assert acquire_project_slot(PROJECT, "doc-2")
+    assert not acquire_project_slot(PROJECT, "doc-3")
+    assert acquire_project_slot("project-b", "doc-4")
+
+    assert inflight(fake_redis) == 2
+    assert free_slots(PROJECT) == 0
+    assert free_slots("project-b") == 1
+
+
+def test_redelivered_document_keeps_its_slot(fake_redis):
+    assert acquire_project_slot(PROJECT, "doc-1")
+    assert acquire_project_slot(PROJECT, "doc-1")
+
+    assert inflight(fake_redis) == 1
+
+
+def test_slot_is_released_once_per_document(fake_redis):
+    acquire_project_slot(PROJECT, "doc-1")
+    acquire_project_slot(PROJECT, "doc-2")
+
+    # Every failed embedding range of doc-1 reports the failure
+    assert release_project_slot(PROJECT, "doc-1")
+    assert not release_project_slot(PROJECT, "doc-1")
+    assert not release_project_slot(PROJECT, "doc-1")
+
+    assert inflight(fake_redis) == 1
+    assert release_project_slot(PROJECT, "doc-2")
+    assert INFLIGHT_KEY.format(project_id=PROJECT) not in fake_redis.data
+
+
+def test_counter_never_goes_negative(fake_redis):
+    # The counter expired while the document still held its token
+    acquire_project_slot(PROJECT, "doc-1")
+    del fake_redis.data[INFLIGHT_KEY.format(project_id=PROJECT)]
+
+    assert release_project_slot(PROJECT, "doc-1")
+    assert inflight(fake_redis) == 0
+    assert free_slots(PROJECT) == 2
+
+
+def test_no_project_means_no_limit(fake_redis):
+    assert all(acquire_project_slot(None, f"doc-{i}") for i in range(5))
+    assert not release_project_slot(None, "doc-1")
+    assert fake_redis.data == {}
+
+
+def test_deferred_documents_resume_in_order(fake_redis):
+    defer_document(PROJECT, "doc-3", "/uploads/3.pdf")
+    defer_document(PROJECT, "doc-4", "/uploads/4.pdf")
+
+    assert pending_projects() == [PROJECT]
+    assert pop_pending(PROJECT) == [("doc-3", "/uploads/3.pdf")]
+    assert pop_pending(PROJECT, 5) == [("doc-4", "/uploads/4.pdf")]
+    assert pop_pending(PROJECT) == []
+    assert pending_projects() == []
+
+
+def test_finished_document_hands_its_slot_on(fake_redis, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(
+        document_tasks, "enqueue_document",
+        lambda document_id, file_path, queue: enqueued.append((document_id, queue)),
+    )
+    document = SimpleNamespace(id=uuid.uuid4(), project_id=PROJECT)
+    acquire_project_slot(PROJECT, str(document.id))
+    defer_document(PROJECT, "doc-3", "/uploads/3.pdf")
+    defer_document(PROJECT, "doc-4", "/uploads/4.pdf")
+
+    document_tasks.release_slot(document)
+    document_tasks.release_slot(document)
+
+    assert enqueued == [("doc-3", QUEUE_BULK)]
+    assert pop_pending(PROJECT) == [("doc-4", "/uploads/4.pdf")]
+
+
+@pytest.mark.parametrize("task", [
+    "app.tasks.document_tasks.reembed_document_task",
+    "app.tasks.maintenance_tasks.reap_blobs_task",
+    "app.tasks.maintenance_tasks.resume_deferred_task",
+])
+def test_background_tasks_route_to_maintenance(task):
+    assert celery_app.amqp.router.route({}, task)["queue"].name == QUEUE_MAINTENANCE
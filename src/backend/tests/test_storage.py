@@ -0,0 +1,269 @@
+"""
+Tests for blob storage and reference counting
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from app.api import documents
+from app.db.models import DocumentType
+from app.services import storage
+from app.services.storage import (
+    ACQUIRE_BLOB_SQL,
+    CLAIM_ORPHANS_SQL,
+    DELETE_BLOB_ROW_SQL,
+    STAGE_BLOB_SQL,
+    LocalBlobStore,
+    reference_blob,
+    reference_blob_sync,
+    release_blob,
+    stage_blob,
+    stage_blob_sync,
+)
+from app.services.uploads import StoredFile
+from app.tasks import maintenance_tasks
+
+HASH = "ab" * 32
+
+
+class FakeResult:
+    def __init__(self, value=None, rowcount=1):
+        self.value = value
+        self.rowcount = rowcount
+
+    def scalar_one(self):
+        return self.value
+
+    def all(self):
+        return self.value
+
+
+class BlobSession:
+    """Records statements and commits; refcount is what the upsert reports"""
+
+    def __init__(self, refcount=0):
+        self.refcount = refcount
+        self.log = []
+
+    def execute(self, statement, params=None):
+        self.log.append(statement)
+        return FakeResult(self.refcount)
+
+    def commit(self):
+        self.log.append("commit")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch, settings):
+    settings.upload_dir = str(tmp_path)
+    blob_store = LocalBlobStore(str(tmp_path / "blobs"))
+    monkeypatch.setattr(storage, "get_blob_store", lambda: blob_store)
+    return blob_store
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(b"%PDF-1.4 content")
+    return path
+
+
+def test_staged_blob_row_is_committed_before_the_file_is_written(store, source, monkeypatch):
+    db = BlobSession(refcount=0)
+    put = store.put
+
+    def checked_put(*args, **kwargs):
+        assert db.log == [STAGE_BLOB_SQL, "commit"]
+        return put(*args, **kwargs)
+
+    monkeypatch.setattr(store, "put", checked_put)
+    location = stage_blob_sync(db, str(source), HASH, 16)
+
+    assert location == store.location_for(HASH)
+    assert open(location, "rb").read() == b"%PDF-1.4 content"
+    assert source.exists()  # Bulk ingest copies, never moves
+
+    reference_blob_sync(db, HASH, 16)
+    assert db.log == [STAGE_BLOB_SQL, "commit", ACQUIRE_BLOB_SQL]
+
+
+def test_staging_a_referenced_blob_skips_the_copy(store, source):
+    location = stage_blob_sync(BlobSession(refcount=2), str(source), HASH, 16)
+
+    assert location == store.location_for(HASH)
+    assert not os.path.exists(location)
+
+
+def test_local_store_put_and_delete(store, source):
+    location = store.put(str(source), HASH, move=False)
+
+    assert location == os.path.join(store.root, "ab", "ab", HASH)
+    assert open(location, "rb").read() == b"%PDF-1.4 content"
+    assert not os.listdir(store.temp_dir())  # No partial copies left behind
+    with store.local_path(location) as path:
+        assert path == location
+
+    store.delete(location)
+    store.delete(location)  # Missing blobs are ignored
+    assert not os.path.exists(location)
+
+
+class AsyncBlobSession(BlobSession):
+    def __init__(self, refcount=0, rowcount=1):
+        super().__init__(refcount)
+        self.rowcount = rowcount
+
+    async def execute(self, statement, params=None):
+        self.log.append(statement)
+        return FakeResult(self.refcount, self.rowcount)
+
+
+class StageSession(AsyncBlobSession):
+    """The session stage_blob opens for itself"""
+
+    async def commit(self):
+        self.log.append("commit")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def staging(monkeypatch, refcount):
+    db = StageSession(refcount)
+    monkeypatch.setattr(storage, "async_session_maker", lambda: db)
+    return db
+
+
+def test_staged_upload_row_is_committed_before_the_file_is_moved(store, source, monkeypatch):
+    stage_db = staging(monkeypatch, refcount=0)
+    put = store.put
+
+    def checked_put(*args, **kwargs):
+        assert stage_db.log == [STAGE_BLOB_SQL, "commit"]
+        return put(*args, **kwargs)
+
+    monkeypatch.setattr(store, "put", checked_put)
+    location = asyncio.run(stage_blob(str(source), HASH, 16))
+
+    assert open(location, "rb").read() == b"%PDF-1.4 content"
+    assert not source.exists()  # Uploads are moved into place
+
+    db = AsyncBlobSession()
+    asyncio.run(reference_blob(db, HASH, 16))
+    assert db.log == [ACQUIRE_BLOB_SQL]
+
+
+def test_staging_a_referenced_upload_shares_the_stored_blob(store, source, monkeypatch):
+    staging(monkeypatch, refcount=3)
+
+    location = asyncio.run(stage_blob(str(source), HASH, 16))
+
+    assert location == store.location_for(HASH)
+    assert not os.path.exists(location)
+    assert not source.exists()  # The duplicate upload is discarded
+
+
+class FailingDocumentSession(AsyncBlobSession):
+    """The request's session, failing when the document row is inserted"""
+
+    def add(self, document):
+        self.log.append("add")
+
+    async def flush(self):
+        raise RuntimeError("insert failed")
+
+
+def test_document_rollback_leaves_the_upload_to_the_reaper(store, source, tmp_path, monkeypatch):
+    stage_db = staging(monkeypatch, refcount=0)
+    db = FailingDocumentSession()
+    stored = StoredFile(f"{HASH}.pdf", str(source), 16, HASH)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(documents.create_document(
+            db, stored, "paper.pdf", "application/pdf", None, DocumentType.OTHER
+        ))
+
+    # The orphaned row is committed; the reference never is
+    assert stage_db.log == [STAGE_BLOB_SQL, "commit"]
+    assert db.log == [ACQUIRE_BLOB_SQL, "add"]
+    location = store.location_for(HASH)
+    assert os.path.exists(location)
+
+    # Past the grace period the reaper claims the row and deletes the blob
+    reaper_db, result = reap(monkeypatch, tmp_path, {HASH: location})
+    assert reaper_db.orphans == {}
+    assert result["blobs_deleted"] == 1
+
+
+def test_release_keeps_tracked_blobs_for_the_reaper(store, source):
+    location = store.put(str(source), HASH, move=False)
+    asyncio.run(release_blob(AsyncBlobSession(rowcount=1), HASH, location))
+
+    assert os.path.exists(location)
+
+
+def test_release_deletes_untracked_legacy_files(store, source):
+    asyncio.run(release_blob(AsyncBlobSession(rowcount=0), None, str(source)))
+
+    assert not source.exists()
+
+
+class ReaperSession:
+    """Orphaned blob rows, claimed in batches the way CLAIM_ORPHANS_SQL does"""
+
+    def __init__(self, orphans):
+        self.orphans = dict(orphans)
+        self.claims = 0
+
+    def execute(self, statement, params):
+        if statement is CLAIM_ORPHANS_SQL:
+            self.claims += 1
+            rows = [row for row in self.orphans.items() if row[0] not in params["skip"]]
+            return FakeResult(rows[:params["limit"]])
+        assert statement is DELETE_BLOB_ROW_SQL
+        del self.orphans[params["hash"]]
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FlakyStore(LocalBlobStore):
+    def delete(self, location):
+        if "bad" in location:
+            raise OSError("permission denied")
+
+
+def reap(monkeypatch, tmp_path, orphans):
+    db = ReaperSession(orphans)
+    monkeypatch.setattr(maintenance_tasks, "REAP_BATCH_SIZE", 2)
+    monkeypatch.setattr(maintenance_tasks, "SessionLocal", lambda: db)
+    monkeypatch.setattr(
+        maintenance_tasks, "get_blob_store", lambda: FlakyStore(str(tmp_path / "blobs"))
+    )
+    return db, maintenance_tasks.reap_blobs_task.run()
+
+
+def test_reaper_deletes_orphans_in_batches(store, tmp_path, monkeypatch):
+    db, result = reap(monkeypatch, tmp_path, {f"h{i}": f"/blobs/h{i}" for i in range(5)})
+
+    assert db.orphans == {}
+    assert result["blobs_deleted"] == 5
+    assert db.claims == 3
+
+
+def test_reaper_stops_when_every_delete_fails(store, tmp_path, monkeypatch):
+    orphans = {f"h{i}": f"/blobs/bad{i}" for i in range(4)}
+    orphans["ok"] = "/blobs/ok"
+    db, result = reap(monkeypatch, tmp_path, orphans)
+
+    assert set(db.orphans) == {"h0", "h1", "h2", "h3"}  # Kept for the next run
+    assert result["blobs_deleted"] == 1
+    assert result["blobs_failed"] == 4
@@ -0,0 +1,196 @@
+"""
+Tests for the zstd frame text store
+"""
+
+import asyncio
+import uuid
+from collections import namedtuple
+
+import pytest
+from sqlalchemy.sql import Delete, Insert
+
+from app.processors.document_processor import ExtractionResult
+from app.services import text_store
+from app.services.text_store import (
+    ChunkTextCache,
+    TextFrameWriter,
+    iter_stored_segments,
+    materialize_chunks,
+    page_range,
+    read_range,
+    read_range_sync,
+    save_text,
+)
+
+Frame = namedtuple("Frame", "document_id frame_index start_char end_char data")
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def all(self):
+        return self.rows
+
+
+class FrameSession:
+    """
+    Just enough of a Session for the text store: frame inserts are kept
+    in memory, and range selects are answered from their bound parameters.
+    """
+
+    def __init__(self):
+        self.frames = []
+
+    def execute(self, statement, rows=None):
+        if isinstance(statement, Delete):
+            self.frames = []
+        elif isinstance(statement, Insert):
+            self.frames.extend(Frame(**row) for row in rows)
+        else:
+            params = statement.compile().params
+            offset = params.get("end_char_1", 0)
+            end = params.get("start_char_1", float("inf"))
+            columns = [column.name for column in statement.selected_columns]
+            Row = namedtuple("Row", columns)
+            return FakeResult([
+                Row(*(getattr(frame, name) for name in columns))
+                for frame in sorted(self.frames, key=lambda f: f.frame_index)
+                if frame.end_char > offset and frame.start_char < end
+            ])
+
+
+class AsyncFrameSession(FrameSession):
+    async def execute(self, statement, rows=None):
+        return FrameSession.execute(self, statement, rows)
+
+
+@pytest.fixture
+def small_frames(monkeypatch):
+    monkeypatch.setattr(text_store, "FRAME_CHARS", 10)
+
+
+def store(segments):
+    db = FrameSession()
+    writer = TextFrameWriter(db, uuid.uuid4())
+    for page_number, text in segments:
+        writer.write(page_number, text)
+    writer.close()
+    return db, writer
+
+
+def test_writer_packs_pages_into_frames(small_frames):
+    db, writer = store([(1, "aaaa"), (2, "bbbb"), (3, "cccc"), (4, "d" * 25)])
+
+    assert writer.page_offsets == [0, 4, 8, 12]
+    assert [(f.start_char, f.end_char) for f in db.frames] == [
+        (0, 8), (8, 12), (12, 22), (22, 32), (32, 37),
+    ]
+    assert [f.frame_index for f in db.frames] == list(range(5))
+
+
+@pytest.mark.parametrize("segments", [
+    [(None, "no pages at all")],
+    [(1, "one "), (2, ""), (3, "three "), (4, "")],
+    [(None, "preamble "), (1, "x" * 23), (None, "continued"), (2, "tail")],
+    [(1, "exactly10!"), (2, "")],
+], ids=["no-pages", "empty-pages", "continuations", "frame-sized-page"])
+def test_stored_segments_round_trip(small_frames, segments):
+    db, writer = store(segments)
+    expected = ExtractionResult.from_segments(segments)
+
+    streamed = ExtractionResult.from_segments(
+        iter_stored_segments(db, uuid.uuid4(), writer.page_offsets)
+    )
+
+    assert streamed.text == expected.text
+    assert streamed.page_offsets == expected.page_offsets == writer.page_offsets
+
+
+def test_stored_segments_decompress_one_frame_at_a_time(small_frames):
+    db, writer = store([(1, "p" * 45)])
+    segments = iter_stored_segments(db, uuid.uuid4(), writer.page_offsets)
+
+    assert next(segments) == (1, "p" * 10)
+    assert next(segments) == (None, "p" * 10)
+
+
+def test_read_range_decompresses_only_overlapping_frames(small_frames):
+    sync_db = FrameSession()
+    text = "".join(chr(ord("a") + i % 26) for i in range(57))
+    save_text(sync_db, uuid.uuid4(), text, [0, 20, 33])
+    db = AsyncFrameSession()
+    db.frames = sync_db.frames
+
+    assert asyncio.run(read_range(db, uuid.uuid4(), 15, 12)) == text[15:27]
+    assert asyncio.run(read_range(db, uuid.uuid4(), 50, 100)) == text[50:]
+    assert asyncio.run(read_range(db, uuid.uuid4(), 57, 5)) == ""
+    assert read_range_sync(sync_db, uuid.uuid4(), 9, 2) == text[9:11]
+
+
+def test_page_range():
+    offsets = [0, 10, 10, 25]
+
+    assert page_range(offsets, 40, 1) == (0, 10)
+    assert page_range(offsets, 40, 2) == (10, 0)
+    assert page_range(offsets, 40, 4) == (25, 15)
+    assert page_range(offsets, 40, 0) is None
+    assert page_range(offsets, 40, 5) is None
+    assert page_range([], 40, 1) is None
+
+
+def test_slice_cached_frames_spans_frames():
+    frames = [(0, 5, "abcde"), (5, 10, "fghij"), (10, 12, "kl")]
+
+    assert text_store._slice_cached_frames(frames, 3, 11) == "defghijk"
+    assert text_store._slice_cached_frames(frames, 5, 10) == "fghij"
+    assert text_store._slice_cached_frames(frames, 12, 20) == ""
+
+
+class MaterializeSession:
+    """Returns every stored frame for the one query materialize_chunks makes"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        return FakeResult([
+            (f.document_id, f.start_char, f.end_char, f.data)
+            for f in sorted(self.frames, key=lambda f: (str(f.document_id), f.frame_index))
+        ])
+
+
+def test_materialize_chunks_reads_offset_referenced_text(small_frames, monkeypatch):
+    monkeypatch.setattr(text_store, "chunk_text_cache", ChunkTextCache(10))
+    first, second = uuid.uuid4(), uuid.uuid4()
+    texts = {first: "Specific aims of the renewal application", second: "Budget justification"}
+    frames = []
+    for document_id, text in texts.items():
+        sync_db = FrameSession()
+        save_text(sync_db, document_id, text, [0])
+        frames.extend(sync_db.frames)
+    db = MaterializeSession(frames)
+    chunks = [
+        (uuid.uuid4(), first, 0, 14),  # Spans two frames
+        (uuid.uuid4(), first, 22, 40),
+        (uuid.uuid4(), second, 7, 20),
+        (uuid.uuid4(), second, 20, 20),
+    ]
+
+    materialized = asyncio.run(materialize_chunks(db, chunks))
+
+    assert materialized == {
+        chunk_id: texts[document_id][start:end] for chunk_id, document_id, start, end in chunks
+    }
+    assert db.queries == 1
+
+    # Served from the cache the second time
+    assert asyncio.run(materialize_chunks(db, chunks[:2])) == {
+        chunks[0][0]: "Specific aims ", chunks[1][0]: "enewal application",
+    }
+    assert db.queries == 1
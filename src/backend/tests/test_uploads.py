@@ -0,0 +1,149 @@
+"""
+Tests for streaming uploads and the request body size limit
+"""
+
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+
+from app.services import uploads
+from app.services.storage import LocalBlobStore
+from app.services.uploads import UploadError, UploadSizeLimitMiddleware, store_upload
+
+LIMIT = 4096
+BOUNDARY = b"form-boundary"
+
+
+def multipart(data: bytes) -> bytes:
+    return (
+        b"--" + BOUNDARY + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="aims.txt"\r\n'
+        b"Content-Type: text/plain\r\n\r\n" + data + b"\r\n--" + BOUNDARY + b"--\r\n"
+    )
+
+
+@pytest.fixture
+def app():
+    api = FastAPI()
+    api.state.received = []
+
+    @api.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        api.state.received.append(await file.read())
+        return {"size": len(api.state.received[-1])}
+
+    api.add_middleware(UploadSizeLimitMiddleware, limits={"/upload": LIMIT})
+    return api
+
+
+def post(app, pieces, path="/upload", content_length=True):
+    """Send a multipart body in pieces; returns (status, body) of the response"""
+    body = b"".join(pieces)
+    headers = [(b"content-type", b"multipart/form-data; boundary=" + BOUNDARY)]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    messages = [
+        {"type": "http.request", "body": piece, "more_body": i < len(pieces) - 1}
+        for i, piece in enumerate(pieces)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    starts = [m for m in sent if m["type"] == "http.response.start"]
+    assert len(starts) == 1
+    return starts[0]["status"], b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_content_length_over_the_limit_is_rejected_up_front(app):
+    status, body = post(app, [multipart(b"x" * LIMIT)])
+
+    assert status == 413
+    assert b"Request too large" in body
+    assert app.state.received == []
+
+
+def test_streamed_body_over_the_limit_gets_413_not_400(app):
+    body = multipart(b"x" * 3 * LIMIT)
+    pieces = [body[i:i + 1024] for i in range(0, len(body), 1024)]
+
+    status, response = post(app, pieces, content_length=False)
+
+    assert status == 413
+    assert b"Request too large" in response
+    assert app.state.received == []
+
+
+def test_bodies_within_the_limit_pass_through(app):
+    body = multipart(b"x" * 1000)
+
+    assert post(app, [body[:500], body[500:]], content_length=False) == (200, b'{"size":1000}')
+    assert post(app, [body]) == (200, b'{"size":1000}')
+
+
+def test_other_paths_are_not_limited(app):
+    status, _ = post(app, [multipart(b"x" * 2 * LIMIT)], path="/elsewhere")
+
+    assert status == 404
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch, settings):
+    settings.upload_dir = str(tmp_path)
+    blob_store = LocalBlobStore(str(tmp_path / "blobs"))
+    monkeypatch.setattr(uploads, "get_blob_store", lambda: blob_store)
+    return blob_store.temp_dir()
+
+
+async def pieces(*items):
+    for item in items:
+        yield item
+
+
+def store(*items, ext=".txt", max_size=None):
+    return asyncio.run(store_upload(pieces(*items), ext, max_size=max_size))
+
+
+def test_store_upload_hashes_and_sniffs(temp_dir):
+    content = [b"Specific aims. " * 400, b"Approach. " * 400]
+
+    stored = store(*content)
+
+    data = b"".join(content)
+    assert stored.file_size == len(data)
+    assert stored.file_hash == hashlib.sha256(data).hexdigest()
+    assert stored.filename == stored.file_hash + ".txt"
+    assert stored.sniffed_mime_type == "text/plain"
+    with open(stored.temp_path, "rb") as f:
+        assert f.read() == data
+
+
+def test_store_upload_stops_past_max_size(temp_dir):
+    with pytest.raises(UploadError) as error:
+        store(b"a" * 600, b"b" * 600, max_size=1000)
+
+    assert error.value.status_code == 413
+    assert os.listdir(temp_dir) == []
+
+
+def test_store_upload_rejects_content_not_matching_the_extension(temp_dir):
+    with pytest.raises(UploadError) as error:
+        store(b"plain text pretending to be a PDF", ext=".pdf")
+
+    assert error.value.status_code == 415
+    assert "text/plain" in error.value.detail
+    assert os.listdir(temp_dir) == []
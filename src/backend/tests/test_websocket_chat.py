@@ -0,0 +1,116 @@
+"""
+Tests for chat streaming over the WebSocket
+"""
+
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.api import websocket
+from app.services import streaming
+from app.services.streaming import coalesce_tokens
+from app.websocket.events import EventType
+from app.websocket.manager import manager
+
+
+async def collect(frames):
+    return [frame async for frame in frames]
+
+
+async def tokens(*items):
+    for item in items:
+        yield item
+
+
+def test_coalesce_flushes_on_size_and_at_the_end():
+    frames = asyncio.run(collect(coalesce_tokens(
+        tokens("ab", "cd", "", "ef", "g"), max_chars=4, max_interval_ms=60_000
+    )))
+
+    assert frames == ["abcd", "efg"]
+
+
+def test_coalesce_flushes_on_interval(monkeypatch):
+    # Start, then one reading per token
+    clock = iter([0.0, 0.01, 0.05, 0.06, 0.2])
+    monkeypatch.setattr(streaming, "time", SimpleNamespace(monotonic=lambda: next(clock)))
+
+    frames = asyncio.run(collect(coalesce_tokens(
+        tokens("a", "b", "c", "d"), max_chars=100, max_interval_ms=30
+    )))
+
+    assert frames == ["ab", "cd"]
+
+
+class FakeChatService:
+    """Streams canned tokens, optionally failing part way through"""
+
+    fail_after = None
+
+    def __init__(self, db):
+        pass
+
+    def is_available(self):
+        return True
+
+    async def retrieve(self, text, project_id=None):
+        return []
+
+    async def chat_stream(self, text, usage=None, **kwargs):
+        for i, token in enumerate(["Hel", "lo ", "wor", "ld"]):
+            if self.fail_after is not None and i == self.fail_after:
+                raise RuntimeError("provider disconnected")
+            yield token
+        usage["output_tokens"] = 4
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    events = []
+
+    async def send_to_client(client_id, event):
+        events.append(event)
+        return True
+
+    @asynccontextmanager
+    async def session():
+        yield None
+
+    monkeypatch.setattr(manager, "send_to_client", send_to_client)
+    monkeypatch.setattr(websocket, "async_session_maker", session)
+    monkeypatch.setattr(websocket, "ChatService", FakeChatService)
+    return events
+
+
+def chat(conversation_id):
+    return {"message": "hi", "conversation_id": str(conversation_id)}
+
+
+def test_chat_streams_frames_then_completes(sent):
+    conversation_id = uuid.uuid4()
+    asyncio.run(websocket.handle_chat_message("client", chat(conversation_id)))
+
+    assert [e.type for e in sent[:-1]] == [EventType.CHAT_STREAM] * (len(sent) - 1)
+    assert "".join(e.payload["chunk"] for e in sent[:-1]) == "Hello world"
+    final = sent[-1]
+    assert final.type == EventType.CHAT_COMPLETE
+    assert final.payload["is_final"] and final.payload["error"] is None
+    assert final.payload["usage"] == {"output_tokens": 4}
+    assert final.payload["conversation_id"] == str(conversation_id)
+
+
+def test_chat_error_still_completes_the_stream(sent, monkeypatch):
+    monkeypatch.setattr(FakeChatService, "fail_after", 2)
+    conversation_id = uuid.uuid4()
+    asyncio.run(websocket.handle_chat_message("client", chat(conversation_id)))
+
+    notification, final = sent[-2:]
+    assert notification.type == EventType.NOTIFICATION
+    assert notification.payload["level"] == "error"
+    assert final.type == EventType.CHAT_COMPLETE
+    assert final.payload["is_final"]
+    assert final.payload["error"] == "provider disconnected"
+    assert final.payload["conversation_id"] == str(conversation_id)
@@ -72,6 +72,12 @@ export interface ChatStreamPayload {
   chunk: string;
   is_final: boolean;
   sources: Array<{ document_id: string; chunk_id: string; score: number }>;
+  usage?: {
+    model: string;
+    prompt_tokens: number;
+    completion_tokens: number;
+    cost: number;
+  };
 }
 
 export interface DocumentProcessingPayload {